@@ -1,12 +1,23 @@
+import asyncio
+import copy
 import os
 import datetime
 import json
 import base64
 import pickle
+import threading
+import time
+import weakref
+
+import httpx
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from utils.gbp_review_store import get_gbp_review_store, star_value
+from utils.gbp_store import day_range, get_gbp_metrics_store
+from utils.single_flight import SingleFlight
+
 # Scopes required for GBP
 SCOPES = [
     "https://www.googleapis.com/auth/business.manage"
@@ -19,22 +30,23 @@ CREDENTIALS_FILE = 'gbp-service-account-key.json'
 TOKEN_PICKLE = 'token.pickle'
 TOKEN_PICKLE_PATH = os.path.join(_project_root, TOKEN_PICKLE)
 
-def get_creds():
-    """Gets credentials from pickle (OAuth) or service account file."""
+# Identical insights / reviews calls already in flight are shared (see utils.single_flight)
+gbp_flight = SingleFlight("gbp")
+
+def _load_creds():
+    """
+    (credentials, pickle path to persist refreshed tokens to or None, source label) from
+    token.pickle (OAuth), GOOGLE_OAUTH_TOKEN_B64, GOOGLE_BUSINESS_PROFILE_CREDENTIALS_B64 or the
+    service account file, in that order. Tokens are not refreshed here (see GBPCredentials).
+    """
     # 1. OAuth: prefer local token.pickle when it exists (so local dev always uses fresh token)
     for pickle_path in [TOKEN_PICKLE_PATH, TOKEN_PICKLE]:
         if os.path.exists(pickle_path):
             try:
                 with open(pickle_path, 'rb') as token:
                     creds = pickle.load(token)
-                if creds and creds.valid:
-                    return creds
-                if creds and creds.expired and creds.refresh_token:
-                    from google.auth.transport.requests import Request
-                    creds.refresh(Request())
-                    with open(pickle_path, 'wb') as token:
-                        pickle.dump(creds, token)
-                    return creds
+                if creds and (creds.valid or (creds.expired and creds.refresh_token)):
+                    return creds, pickle_path, "token.pickle"
             except Exception as e:
                 print(f"Error loading pickle token from {pickle_path}: {e}")
 
@@ -44,12 +56,8 @@ def get_creds():
         try:
             token_bytes = base64.b64decode(oauth_token_b64)
             creds = pickle.loads(token_bytes)
-            if creds and creds.valid:
-                return creds
-            if creds and creds.expired and creds.refresh_token:
-                from google.auth.transport.requests import Request
-                creds.refresh(Request())
-                return creds
+            if creds and (creds.valid or (creds.expired and creds.refresh_token)):
+                return creds, None, "GOOGLE_OAUTH_TOKEN_B64"
         except Exception as e:
             print(f"Error loading OAuth token from env var: {e}")
 
@@ -61,7 +69,7 @@ def get_creds():
             creds_dict = json.loads(creds_json)
             return service_account.Credentials.from_service_account_info(
                 creds_dict, scopes=SCOPES
-            )
+            ), None, "GOOGLE_BUSINESS_PROFILE_CREDENTIALS_B64"
         except Exception as e:
             print(f"Error loading credentials from env var: {e}")
     
@@ -75,9 +83,168 @@ def get_creds():
     if os.path.exists(final_creds_file):
         return service_account.Credentials.from_service_account_file(
             final_creds_file, scopes=SCOPES
-        )
+        ), None, CREDENTIALS_FILE
     
-    return None
+    return None, None, None
+
+
+# Refresh tokens this long before they expire, in the background
+GBP_TOKEN_REFRESH_AHEAD = float(os.environ.get('GBP_TOKEN_REFRESH_AHEAD', '300'))
+# Longest a caller waits for a refresh when the token it holds has already expired
+GBP_TOKEN_REFRESH_WAIT = float(os.environ.get('GBP_TOKEN_REFRESH_WAIT', '20'))
+# After a failed refresh, wait this long before trying again
+GBP_TOKEN_RETRY_AFTER = 30.0
+
+
+class GBPCredentialsUnavailable(Exception):
+    """The configured credentials hold no usable token and a refresh failed (or cannot help)."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _utcnow():
+    # google-auth keeps `expiry` as naive UTC
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class GBPCredentials:
+    """
+    Process-wide GBP credentials: loaded once, refreshed ahead of expiry on a background
+    thread (one at a time), and written back to token.pickle atomically (temp file + rename)
+    when they came from it. Callers get the shared object without any disk read or token
+    refresh on their path; only a token that has already expired (first load of a stale
+    pickle, or the process slept past expiry) makes a caller wait for the in-flight refresh.
+    """
+
+    def __init__(self, refresh_ahead: float = GBP_TOKEN_REFRESH_AHEAD):
+        self.refresh_ahead = refresh_ahead
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._creds = None
+        self._pickle_path = None
+        self.source = None
+        self._refresh_thread = None
+        self._retry_at = 0.0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_error = None
+
+    def _load(self):
+        with self._lock:
+            if not self._loaded:
+                self._creds, self._pickle_path, self.source = _load_creds()
+                self._loaded = True
+
+    def _refreshable(self, creds):
+        return bool(getattr(creds, 'refresh_token', None)) or isinstance(creds, service_account.Credentials)
+
+    def _due(self, creds):
+        """Token missing or within refresh_ahead seconds of expiry (and refreshing can help)."""
+        if not self._refreshable(creds) or time.monotonic() < self._retry_at:
+            return False
+        if not creds.token or creds.expiry is None:
+            return not creds.token
+        return (creds.expiry - _utcnow()).total_seconds() < self.refresh_ahead
+
+    def _start_refresh(self):
+        with self._lock:
+            thread = self._refresh_thread
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=self._refresh, name="gbp-token-refresh", daemon=True)
+                self._refresh_thread = thread
+                thread.start()
+            return thread
+
+    def _refresh(self):
+        from google.auth.transport.requests import Request
+        creds = self._creds
+        try:
+            creds.refresh(Request())
+            self.refreshes += 1
+            self.last_error = None
+            if self._pickle_path:
+                self._persist(creds, self._pickle_path)
+        except Exception as e:
+            self.refresh_errors += 1
+            self.last_error = str(e)
+            self._retry_at = time.monotonic() + GBP_TOKEN_RETRY_AFTER
+            print(f"GBP token refresh failed: {e}")
+
+    @staticmethod
+    def _persist(creds, path):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'wb') as token:
+                pickle.dump(creds, token)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Could not save refreshed token to {path}: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _unavailable(self, creds):
+        if not self._refreshable(creds):
+            message = "GBP credentials have expired and cannot be refreshed (run gbp_oauth_login.py)"
+        elif self.last_error:
+            message = f"GBP token refresh failed: {self.last_error}"
+        else:
+            message = f"GBP token refresh did not finish within {GBP_TOKEN_REFRESH_WAIT:.0f}s"
+        retry_in = self._retry_at - time.monotonic()
+        return GBPCredentialsUnavailable(message, retry_after=max(1.0, retry_in) if retry_in > 0 else None)
+
+    def get(self):
+        """
+        Shared credentials (None if none are configured); schedules a refresh when one is due.
+        Raises GBPCredentialsUnavailable instead of handing out a token that is missing or expired.
+        """
+        if not self._loaded:
+            self._load()
+        creds = self._creds
+        if creds is not None and self._due(creds):
+            thread = self._start_refresh()
+            if not creds.valid:
+                thread.join(GBP_TOKEN_REFRESH_WAIT)
+        if creds is not None and not creds.valid:
+            raise self._unavailable(creds)
+        return creds
+
+    async def get_async(self):
+        """get() without blocking the event loop (first load and expired-token waits run in a thread)."""
+        creds = self._creds
+        if not self._loaded or (creds is not None and not creds.valid and self._due(creds)):
+            return await asyncio.to_thread(self.get)
+        return self.get()
+
+    def reload(self):
+        """Read the credentials again (e.g. after gbp_oauth_login.py wrote a new token.pickle)."""
+        with self._lock:
+            self._loaded = False
+            self._creds = None
+            self._retry_at = 0.0
+        self._load()
+
+    def stats(self):
+        creds = self._creds
+        expiry = getattr(creds, 'expiry', None) if creds is not None else None
+        return {
+            "source": self.source,
+            "valid": bool(creds is not None and creds.valid),
+            "expiresInSeconds": round((expiry - _utcnow()).total_seconds()) if expiry else None,
+            "refreshes": self.refreshes,
+            "refreshErrors": self.refresh_errors,
+            "lastError": self.last_error,
+        }
+
+
+# Process-wide credentials shared by every GBP call
+gbp_credentials = GBPCredentials()
+
+
+def get_creds():
+    """Gets credentials from pickle (OAuth) or service account file (shared, refreshed ahead of expiry)."""
+    return gbp_credentials.get()
 
 def get_account_id(service):
     """Fetches the first account ID associated with the service account."""
@@ -100,41 +267,442 @@ def get_location_id(service, account_name):
     return None
 
 
-def _aggregate_insights_timeseries(series_list):
+def _summary_from_totals(totals):
     """
-    Sum multiDailyMetricTimeSeries into a simple summary for the dashboard.
-    Returns { views: { search, maps }, customerActions: { websiteClicks, directionRequests } }.
+    Dashboard summary from per-metric totals ({dailyMetric: sum}):
+    { views: { search, maps }, customerActions: { websiteClicks, directionRequests } }.
     """
     summary = {
         "views": {"search": 0, "maps": 0},
         "customerActions": {"websiteClicks": 0, "directionRequests": 0}
     }
-    if not series_list:
-        return summary
-    if not series_list:
-        return summary
-    
-    for item in series_list:
+    for metric, total in totals.items():
+        if "SEARCH" in metric:
+            summary["views"]["search"] += total
+        elif "MAPS" in metric:
+            summary["views"]["maps"] += total
+        elif metric == "WEBSITE_CLICKS":
+            summary["customerActions"]["websiteClicks"] += total
+        elif metric == "BUSINESS_DIRECTION_REQUESTS":
+            summary["customerActions"]["directionRequests"] += total
+    return summary
+
+
+def _aggregate_insights_timeseries(series_list):
+    """Sum multiDailyMetricTimeSeries into the dashboard summary (see _summary_from_totals)."""
+    totals = {}
+    for day, metric, value in _dated_values(series_list):
+        totals[metric] = totals.get(metric, 0) + value
+    return _summary_from_totals(totals)
+
+
+def _dated_values(series_list):
+    """(date 'YYYY-MM-DD', dailyMetric, int value) for every point of a multiDailyMetricTimeSeries list."""
+    out = []
+    for item in series_list or []:
         # Each item corresponds to a location and contains a list of metrics
-        metrics_list = item.get("dailyMetricTimeSeries", [])
-        for series in metrics_list:
+        for series in item.get("dailyMetricTimeSeries", []):
             metric = series.get("dailyMetric") or ""
-            total = 0
             for pt in series.get("timeSeries", {}).get("datedValues", []):
-                total += int(pt.get("value", 0))
-            
-            if "SEARCH" in metric:
-                summary["views"]["search"] += total
-            elif "MAPS" in metric:
-                summary["views"]["maps"] += total
-            elif metric == "WEBSITE_CLICKS":
-                summary["customerActions"]["websiteClicks"] += total
-            elif metric == "BUSINESS_DIRECTION_REQUESTS":
-                summary["customerActions"]["directionRequests"] += total
-    return summary
+                day = _dated_value_date(pt)
+                if day is not None:
+                    out.append((day.isoformat(), metric, int(pt.get("value", 0))))
+    return out
+
+
+def _dated_value_date(point):
+    d = point.get("date") or {}
+    try:
+        return datetime.date(d["year"], d["month"], d["day"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+# Daily metrics requested from the Performance API
+INSIGHT_METRICS = [
+    "BUSINESS_IMPRESSIONS_DESKTOP_MAPS",
+    "BUSINESS_IMPRESSIONS_DESKTOP_SEARCH",
+    "BUSINESS_IMPRESSIONS_MOBILE_MAPS",
+    "BUSINESS_IMPRESSIONS_MOBILE_SEARCH",
+    "BUSINESS_CONVERSATIONS",
+    "BUSINESS_DIRECTION_REQUESTS",
+    "CALL_CLICKS",
+    "WEBSITE_CLICKS",
+    "BUSINESS_BOOKINGS",
+    "BUSINESS_FOOD_ORDERS",
+    "BUSINESS_FOOD_MENU_CLICKS"
+]
+
+PERFORMANCE_API = "https://businessprofileperformance.googleapis.com/v1"
+REVIEWS_API = "https://mybusiness.googleapis.com/v4"
+
+# Cap on concurrent GBP HTTP calls per event loop (async path)
+GBP_MAX_CONCURRENCY = int(os.environ.get('GBP_MAX_CONCURRENCY', '4'))
+
+
+# How long a resolved account / location is reused before it is looked up again
+GBP_LOCATION_TTL = float(os.environ.get('GBP_LOCATION_TTL', '3600'))
+
+
+class GBPSession:
+    """
+    Discovery services and the resolved account / location, shared by insights, reviews and
+    ratings (sync and async). Services are built once from the discovery documents bundled
+    with google-api-python-client (static discovery, no fetch). The account / location pair is
+    cached for GBP_LOCATION_TTL seconds; refresh() drops it (and the services) so the next call
+    looks everything up again. Lookups run under one lock: concurrent callers share a single
+    lookup, and the services' httplib2 connection is never used from two threads at once.
+    """
+
+    def __init__(self, ttl: float = GBP_LOCATION_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._services = {}
+        self._location = None  # (account_name, location_name)
+        self._resolved_at = 0.0
+        self.lookups = 0
+        self.hits = 0
+
+    def _service(self, name, creds):
+        service = self._services.get(name)
+        if service is None:
+            service = build(name, 'v1', credentials=creds, static_discovery=True, cache_discovery=False)
+            self._services[name] = service
+        return service
+
+    def cached_location(self):
+        """(account_name, location_name) if resolved less than `ttl` seconds ago, else None."""
+        location = self._location
+        if location is not None and time.monotonic() - self._resolved_at < self.ttl:
+            self.hits += 1
+            return location
+        return None
+
+    def location(self, creds):
+        """
+        Returns (account_name, location_name, error). Account via Account Management API,
+        first location via Business Information API (read_mask is required). Errors are not cached.
+        """
+        cached = self.cached_location()
+        if cached is not None:
+            return cached + (None,)
+        with self._lock:
+            cached = self.cached_location()
+            if cached is not None:
+                return cached + (None,)
+            self.lookups += 1
+            accounts = self._service('mybusinessaccountmanagement', creds).accounts().list().execute()
+            if not accounts.get('accounts'):
+                return None, None, "No accounts found (or API not enabled/quota exceeded)"
+            account_name = accounts['accounts'][0]['name']
+
+            locations = self._service('mybusinessbusinessinformation', creds).accounts().locations().list(
+                parent=account_name,
+                readMask="name",
+                pageSize=100
+            ).execute()
+            locs = locations.get('locations') or []
+            if not locs:
+                return account_name, None, (
+                    "No locations found. The Google account has no Business Profile locations. "
+                    "Use OAuth (token.pickle) from the account that owns the business, claim a business at business.google.com, "
+                    "or invite this account as a manager. See GBP_README.md."
+                )
+            self._location = (account_name, locs[0]['name'])  # Format: locations/{locationId}
+            self._resolved_at = time.monotonic()
+            return self._location + (None,)
+
+    def refresh(self):
+        """Forget the resolved location and the services (e.g. after new credentials or a 404)."""
+        with self._lock:
+            self._location = None
+            self._resolved_at = 0.0
+            self._services = {}
+
+    def stats(self):
+        location = self._location
+        return {
+            "account": location[0] if location else None,
+            "location": location[1] if location else None,
+            "ageSeconds": round(time.monotonic() - self._resolved_at, 1) if location else None,
+            "ttlSeconds": self.ttl,
+            "lookups": self.lookups,
+            "hits": self.hits,
+        }
+
+
+# Process-wide session shared by every GBP call
+gbp_session = GBPSession()
+
+
+def _resolve_location(creds):
+    """(account_name, location_name, error) through the shared session (cached for GBP_LOCATION_TTL)."""
+    return gbp_session.location(creds)
+
+
+def _on_location_error(response):
+    """A 404 means the cached location no longer exists (or moved): resolve it again next call."""
+    if response.status_code == 404:
+        gbp_session.refresh()
+
+
+def _insights_date_range(start_date=None, end_date=None):
+    """(start date, end date) objects; default / fallback is the last 30 days."""
+    if start_date and end_date:
+        try:
+            return (
+                datetime.datetime.strptime(start_date, '%Y-%m-%d').date(),
+                datetime.datetime.strptime(end_date, '%Y-%m-%d').date(),
+            )
+        except ValueError:
+            pass
+    today = datetime.date.today()
+    return today - datetime.timedelta(days=30), today
+
+
+def _insights_params(start_date_obj, end_date_obj):
+    """Flattened dailyRange params (the client library has issues with the dailyRange object)."""
+    return {
+        "dailyMetrics": INSIGHT_METRICS,
+        "dailyRange.startDate.year": start_date_obj.year,
+        "dailyRange.startDate.month": start_date_obj.month,
+        "dailyRange.startDate.day": start_date_obj.day,
+        "dailyRange.endDate.year": end_date_obj.year,
+        "dailyRange.endDate.month": end_date_obj.month,
+        "dailyRange.endDate.day": end_date_obj.day
+    }
+
+
+def _api_error(response):
+    """{"error": ...} from a non-200 Google API response (requests or httpx)."""
+    try:
+        err_json = response.json()
+        msg = err_json.get("error", {}).get("message", response.text)
+    except Exception:
+        msg = response.text
+    return {"error": f"API Error ({response.status_code}): {msg}"}
+
+
+def _insights_result(data, location_name):
+    series_list = data.get('multiDailyMetricTimeSeries', [])
+    return {
+        "success": True,
+        "data": series_list,
+        "summary": _aggregate_insights_timeseries(series_list),
+        "location": location_name
+    }
+
+
+def _stored_series(daily, start_date_obj, end_date_obj):
+    """multiDailyMetricTimeSeries shape rebuilt from the store (zero days carry no value, as from the API)."""
+    days = day_range(start_date_obj, end_date_obj)
+    metrics_list = []
+    for metric in INSIGHT_METRICS:
+        values = dict(daily.get(metric, []))
+        points = []
+        for d in days:
+            point = {"date": {"year": d.year, "month": d.month, "day": d.day}}
+            if values.get(d.isoformat()):
+                point["value"] = str(values[d.isoformat()])
+            points.append(point)
+        metrics_list.append({"dailyMetric": metric, "timeSeries": {"datedValues": points}})
+    return [{"dailyMetricTimeSeries": metrics_list}]
+
+
+def _stored_insights_result(store, location_name, start_date_obj, end_date_obj):
+    """Insights result for [start, end] summed by the metrics store (no upstream call)."""
+    return {
+        "success": True,
+        "data": _stored_series(store.daily(location_name, start_date_obj, end_date_obj), start_date_obj, end_date_obj),
+        "summary": _summary_from_totals(store.totals(location_name, start_date_obj, end_date_obj)),
+        "location": location_name,
+    }
+
+
+def _insights_sync_range(store, location_name, start_date_obj, end_date_obj):
+    """(first, last) day to fetch so the store covers [start, end], or None when it already does."""
+    missing = store.days_to_sync(location_name, start_date_obj, end_date_obj)
+    if not missing:
+        store.count_local_answer()
+        return None
+    return missing[0], missing[-1]
+
+
+def _store_insights(store, location_name, sync_range, data):
+    store.write_days(location_name, day_range(*sync_range), _dated_values(data.get('multiDailyMetricTimeSeries', [])))
+
+
+def _full_location_name(account_name, location_name):
+    # v4 format: accounts/{accountId}/locations/{locationId}
+    if 'accounts/' in location_name:
+        return location_name
+    return f"{account_name}/{location_name}"
+
+
+# v4 reviews.list returns at most 50 reviews per page
+GBP_REVIEWS_PAGE_SIZE = 50
+# Reviews returned by get_reviews (newest update first); ratings always cover every review
+GBP_REVIEWS_LIMIT = int(os.environ.get('GBP_REVIEWS_LIMIT', '50'))
+
+
+class _ReviewPages:
+    """
+    Collects reviews.list pages for one sync. A full sync keeps every page; an incremental one
+    stops at the first page that reaches the stored watermark (pages are newest update first).
+    """
+
+    def __init__(self, full, watermark):
+        self.full = full
+        self.watermark = watermark
+        self.reviews = []
+        self.average_rating = None
+        self.total_review_count = None
+
+    def params(self, page_token=None):
+        params = {"pageSize": GBP_REVIEWS_PAGE_SIZE, "orderBy": "updateTime desc"}
+        if page_token:
+            params["pageToken"] = page_token
+        return params
+
+    def add(self, data):
+        """Takes one page; returns the next page token, or None when the sync has what it needs."""
+        if self.average_rating is None:
+            self.average_rating = data.get('averageRating', 0)
+            self.total_review_count = data.get('totalReviewCount', 0)
+        page = data.get('reviews', [])
+        if self.full or not self.watermark:
+            self.reviews.extend(page)
+            return data.get('nextPageToken')
+        fresh = [r for r in page if (r.get('updateTime') or '') >= self.watermark]
+        self.reviews.extend(fresh)
+        if len(fresh) < len(page):
+            return None
+        return data.get('nextPageToken')
+
+    def commit(self, store, location):
+        store.apply(location, self.reviews, self.average_rating, self.total_review_count, full=self.full)
+
+
+def _reviews_result(store, location, limit=GBP_REVIEWS_LIMIT):
+    state = store.sync_state(location) or {}
+    reviews_list = store.recent(location, limit)
+    return {
+        "success": True,
+        "reviews": reviews_list,
+        "data": reviews_list,
+        "averageRating": state.get('averageRating', 0),
+        "totalReviewCount": state.get('totalReviewCount', 0)
+    }
+
+
+def _ratings_result(store, location):
+    """Ratings summary (averageRating, totalReviews, ratingDistribution) from the review index."""
+    state = store.sync_state(location) or {}
+    return {
+        "success": True,
+        "data": {
+            "averageRating": float(state.get('averageRating', 0)),
+            "totalReviews": int(state.get('totalReviewCount', 0)),
+            "ratingDistribution": store.distribution(location)
+        }
+    }
+
+
+# User opted not to enable the v4 Reviews API: empty list keeps the dashboard clean instead of an error
+_REVIEWS_DISABLED_RESULT = {
+    "success": True,
+    "reviews": [],
+    "data": [],
+    "averageRating": 0,
+    "totalReviewCount": 0
+}
+
+
+# Current and compare periods at most this many days apart are fetched as one time series
+GBP_COMPARE_MAX_GAP_DAYS = int(os.environ.get('GBP_COMPARE_MAX_GAP_DAYS', '31'))
+
+
+def _insights_slice(result, start_date_obj, end_date_obj):
+    """An insights result restricted to [start, end] (datedValues filtered, summary recomputed)."""
+    series_list = []
+    for item in result.get("data", []):
+        metrics_list = []
+        for series in item.get("dailyMetricTimeSeries", []):
+            points = [
+                pt for pt in series.get("timeSeries", {}).get("datedValues", [])
+                if (day := _dated_value_date(pt)) is not None and start_date_obj <= day <= end_date_obj
+            ]
+            metrics_list.append({**series, "timeSeries": {**series.get("timeSeries", {}), "datedValues": points}})
+        series_list.append({**item, "dailyMetricTimeSeries": metrics_list})
+    return {
+        "success": True,
+        "data": series_list,
+        "summary": _aggregate_insights_timeseries(series_list),
+        "location": result.get("location"),
+    }
+
+
+def _insights_pair_plan(start_date, end_date, compare_start_date, compare_end_date):
+    """
+    (span, current, compare) date ranges when both periods are close enough to come from one
+    time series (gap of at most GBP_COMPARE_MAX_GAP_DAYS days), else None.
+    """
+    if not (start_date and end_date and compare_start_date and compare_end_date):
+        return None
+    try:
+        current = (
+            datetime.datetime.strptime(start_date, '%Y-%m-%d').date(),
+            datetime.datetime.strptime(end_date, '%Y-%m-%d').date(),
+        )
+        compare = (
+            datetime.datetime.strptime(compare_start_date, '%Y-%m-%d').date(),
+            datetime.datetime.strptime(compare_end_date, '%Y-%m-%d').date(),
+        )
+    except ValueError:
+        return None
+    if current[0] > current[1] or compare[0] > compare[1]:
+        return None
+    span = (min(current[0], compare[0]), max(current[1], compare[1]))
+    covered = (current[1] - current[0]).days + (compare[1] - compare[0]).days + 2
+    if (span[1] - span[0]).days + 1 - covered > GBP_COMPARE_MAX_GAP_DAYS:
+        return None
+    return span, current, compare
+
+
+def _split_insights(result, plan):
+    if "error" in result:
+        return result, result
+    _, current, compare = plan
+    return _insights_slice(result, *current), _insights_slice(result, *compare)
+
+
+def get_insights_pair(start_date, end_date, compare_start_date, compare_end_date):
+    """
+    (current, compare) insights results. Nearby periods (the usual previous-period compare) come
+    from one fetchMultiDailyMetricsTimeSeries over both, split by day locally; others are two calls.
+    """
+    plan = _insights_pair_plan(start_date, end_date, compare_start_date, compare_end_date)
+    if plan is None:
+        return get_insights(start_date, end_date), get_insights(compare_start_date, compare_end_date)
+    span = plan[0]
+    return _split_insights(get_insights(span[0].isoformat(), span[1].isoformat()), plan)
+
+
+def _insights_flight_key(start_date=None, end_date=None):
+    return ("insights",) + tuple(d.isoformat() for d in _insights_date_range(start_date, end_date))
 
 
 def get_insights(start_date=None, end_date=None):
+    """
+    Fetches daily metrics for the location. Concurrent identical calls share one upstream fetch;
+    each caller gets its own copy (the insights route mutates the summary).
+    """
+    return copy.deepcopy(
+        gbp_flight.do(_insights_flight_key(start_date, end_date), lambda: _fetch_insights(start_date, end_date))
+    )
+
+
+def _fetch_insights(start_date=None, end_date=None):
     """
     Fetches daily metrics using AuthorizedSession to avoid client library issues with dailyRange.
     """
@@ -145,107 +713,38 @@ def get_insights(start_date=None, end_date=None):
         return {"error": "Credentials not found"}
 
     try:
-        # 1. Get Account (Account Management API)
-        account_service = build('mybusinessaccountmanagement', 'v1', credentials=creds)
-        accounts = account_service.accounts().list().execute()
-        if not accounts.get('accounts'):
-            return {"error": "No accounts found (or API not enabled/quota exceeded)"}
-        account_name = accounts['accounts'][0]['name']
-        
-        # 2. Get Location (Business Information API) – read_mask is required
-        info_service = build('mybusinessbusinessinformation', 'v1', credentials=creds)
-        locations = info_service.accounts().locations().list(
-            parent=account_name,
-            readMask="name",
-            pageSize=100
-        ).execute()
-        locs = locations.get('locations') or []
-        if not locs:
-            return {
-                "error": "No locations found. The Google account has no Business Profile locations. "
-                "Use OAuth (token.pickle) from the account that owns the business, claim a business at business.google.com, "
-                "or invite this account as a manager. See GBP_README.md."
-            }
-        location_name = locs[0]['name']  # Format: locations/{locationId}
-        
-        # 3. Fetch Daily Metrics (Performance API) via AuthorizedSession
-        # The client library has issues with the dailyRange object in some versions,
-        # so we standardise on a direct HTTP call with flattened parameters.
-        
-        metrics = [
-            "BUSINESS_IMPRESSIONS_DESKTOP_MAPS",
-            "BUSINESS_IMPRESSIONS_DESKTOP_SEARCH",
-            "BUSINESS_IMPRESSIONS_MOBILE_MAPS",
-            "BUSINESS_IMPRESSIONS_MOBILE_SEARCH",
-            "BUSINESS_CONVERSATIONS",
-            "BUSINESS_DIRECTION_REQUESTS",
-            "CALL_CLICKS",
-            "WEBSITE_CLICKS",
-            "BUSINESS_BOOKINGS",
-            "BUSINESS_FOOD_ORDERS",
-            "BUSINESS_FOOD_MENU_CLICKS"
-        ]
-        
-        # Default to last 30 days if not specified
-        if not start_date or not end_date:
-            today = datetime.date.today()
-            end_date_obj = today
-            start_date_obj = today - datetime.timedelta(days=30)
-        else:
-            try:
-                start_date_obj = datetime.datetime.strptime(start_date, '%Y-%m-%d').date()
-                end_date_obj = datetime.datetime.strptime(end_date, '%Y-%m-%d').date()
-            except ValueError:
-                # Fallback
-                today = datetime.date.today()
-                end_date_obj = today
-                start_date_obj = today - datetime.timedelta(days=30)
-
-        # Prepare manual request
+        account_name, location_name, err = _resolve_location(creds)
+        if err:
+            return {"error": err}
+
+        # Fetch Daily Metrics (Performance API) via AuthorizedSession; with the metrics store
+        # only the days it is missing, then sum the range locally
+        start_date_obj, end_date_obj = _insights_date_range(start_date, end_date)
+        store = get_gbp_metrics_store()
+        fetch_range = (start_date_obj, end_date_obj)
+        if store is not None:
+            fetch_range = _insights_sync_range(store, location_name, start_date_obj, end_date_obj)
+            if fetch_range is None:
+                return _stored_insights_result(store, location_name, start_date_obj, end_date_obj)
+
         authed_session = AuthorizedSession(creds)
-        url = f"https://businessprofileperformance.googleapis.com/v1/{location_name}:fetchMultiDailyMetricsTimeSeries"
-        
-        params = {
-            "dailyMetrics": metrics,
-            "dailyRange.startDate.year": start_date_obj.year,
-            "dailyRange.startDate.month": start_date_obj.month,
-            "dailyRange.startDate.day": start_date_obj.day,
-            "dailyRange.endDate.year": end_date_obj.year,
-            "dailyRange.endDate.month": end_date_obj.month,
-            "dailyRange.endDate.day": end_date_obj.day
-        }
-        
-        response = authed_session.get(url, params=params)
-        
+        url = f"{PERFORMANCE_API}/{location_name}:fetchMultiDailyMetricsTimeSeries"
+        response = authed_session.get(url, params=_insights_params(*fetch_range))
+
         if response.status_code != 200:
-             # Try to parse error
-            try:
-                err_json = response.json()
-                msg = err_json.get("error", {}).get("message", response.text)
-            except:
-                msg = response.text
-            return {"error": f"API Error ({response.status_code}): {msg}"}
-
-        data = response.json()
-        series_list = data.get('multiDailyMetricTimeSeries', [])
-        summary = _aggregate_insights_timeseries(series_list)
-        return {
-            "success": True,
-            "data": series_list,
-            "summary": summary,
-            "location": location_name
-        }
+            _on_location_error(response)
+            return _api_error(response)
+        if store is not None:
+            _store_insights(store, location_name, fetch_range, response.json())
+            return _stored_insights_result(store, location_name, start_date_obj, end_date_obj)
+        return _insights_result(response.json(), location_name)
 
     except Exception as e:
         return {"error": f"Unexpected Error: {str(e)}"}
 
 
-def get_ratings():
-    """
-    Returns ratings summary for the dashboard: averageRating, totalReviews, ratingDistribution.
-    Derived from get_reviews().
-    """
-    result = get_reviews()
+def _ratings_from_reviews(result):
+    """Ratings summary (averageRating, totalReviews, ratingDistribution) from a get_reviews() result."""
     if "error" in result:
         return result
     reviews = result.get("reviews", [])
@@ -253,11 +752,9 @@ def get_ratings():
     avg = result.get("averageRating", 0)
     dist = {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
     for r in reviews:
-        star = r.get("starRating") or r.get("rating")
+        star = star_value(r)
         if star is not None:
-            key = str(int(star))
-            if key in dist:
-                dist[key] += 1
+            dist[str(star)] += 1
     return {
         "success": True,
         "data": {
@@ -268,78 +765,202 @@ def get_ratings():
     }
 
 
-def get_reviews():
-    """Fetches recent reviews using AuthorizedSession v4 endpoint."""
+def get_ratings():
+    """
+    Returns ratings summary for the dashboard: averageRating, totalReviews, ratingDistribution.
+    Served from the review index (running per-star counts over every review).
+    """
+    location, result = gbp_flight.do(("reviews",), _sync_reviews)
+    if location is None:
+        return _ratings_from_reviews(copy.deepcopy(result))
+    return _ratings_result(get_gbp_review_store(), location)
+
+
+def get_reviews(limit=GBP_REVIEWS_LIMIT):
+    """
+    Most recently updated reviews, from the review index after an incremental sync; concurrent
+    calls (e.g. /reviews and /ratings together) share one sync.
+    """
+    location, result = gbp_flight.do(("reviews",), _sync_reviews)
+    if location is None:
+        return copy.deepcopy(result)
+    return _reviews_result(get_gbp_review_store(), location, limit)
+
+
+def _sync_reviews():
+    """
+    Brings the review index up to date using AuthorizedSession v4 endpoint (every page on a full
+    sync, only new / updated reviews otherwise). Returns (location, None), or (None, result) when
+    there is nothing to index (error, or the Reviews API is not enabled).
+    """
     from google.auth.transport.requests import AuthorizedSession
     creds = get_creds()
     if not creds:
-        return {"error": "Credentials not found"}
+        return None, {"error": "Credentials not found"}
 
     try:
-        # 1. Get Account
-        account_service = build('mybusinessaccountmanagement', 'v1', credentials=creds)
-        accounts = account_service.accounts().list().execute()
-        if not accounts.get('accounts'):
-            return {"error": "No accounts found"}
-        account_name = accounts['accounts'][0]['name']
-        
-        # 2. Get Location
-        info_service = build('mybusinessbusinessinformation', 'v1', credentials=creds)
-        locations = info_service.accounts().locations().list(
-            parent=account_name,
-            readMask="name",
-            pageSize=100
-        ).execute()
-        locs = locations.get('locations') or []
-        if not locs:
-            return {
-                "error": "No locations found. See GBP_README.md."
-            }
-        location_name = locs[0]['name']
-        
-        # 3. Fetch Reviews (v4 API) via AuthorizedSession
-        # Format: accounts/{accountId}/locations/{locationId}
-        
-        if 'accounts/' in location_name:
-             full_location_name = location_name
-        else:
-             full_location_name = f"{account_name}/{location_name}"
+        account_name, location_name, err = _resolve_location(creds)
+        if err:
+            return None, {"error": err}
 
+        location = _full_location_name(account_name, location_name)
+        store = get_gbp_review_store()
+        sync, full, watermark = store.sync_plan(location)
+        if not sync:
+            store.count_local_answer()
+            return location, None
+
+        # Fetch Reviews (v4 API) via AuthorizedSession, page by page
         authed_session = AuthorizedSession(creds)
-        url = f"https://mybusiness.googleapis.com/v4/{full_location_name}/reviews"
-        
-        response = authed_session.get(url)
-        
-        if response.status_code == 403:
-            # User opted not to enable the API for now. 
-            # Return empty list to keep dashboard clean instead of showing an error.
-            print("GBP Reviews API (v4) not enabled. returning empty list.")
-            return {
-                "success": True,
-                "reviews": [],
-                "data": [],
-                "averageRating": 0,
-                "totalReviewCount": 0
-            }
-            
-        if response.status_code != 200:
-             # Try to parse error
-            try:
-                err_json = response.json()
-                msg = err_json.get("error", {}).get("message", response.text)
-            except:
-                msg = response.text
-            return {"error": f"API Error ({response.status_code}): {msg}"}
-
-        data = response.json()
-        reviews_list = data.get('reviews', [])
-        return {
-            "success": True,
-            "reviews": reviews_list,
-            "data": reviews_list,
-            "averageRating": data.get('averageRating', 0),
-            "totalReviewCount": data.get('totalReviewCount', 0)
-        }
+        url = f"{REVIEWS_API}/{location}/reviews"
+        pages = _ReviewPages(full, watermark)
+        page_token = None
+        while True:
+            response = authed_session.get(url, params=pages.params(page_token))
+            if response.status_code == 403:
+                print("GBP Reviews API (v4) not enabled. returning empty list.")
+                return None, dict(_REVIEWS_DISABLED_RESULT)
+            if response.status_code != 200:
+                _on_location_error(response)
+                return None, _api_error(response)
+            page_token = pages.add(response.json())
+            if not page_token:
+                break
+        pages.commit(store, location)
+        return location, None
 
+    except Exception as e:
+        return None, {"error": f"Unexpected Error: {str(e)}"}
+
+
+# --- Async path (httpx) for async FastAPI routes -------------------------------------------
+# Location lookups stay on the sync client libraries (run in a worker thread) and credentials come
+# from gbp_credentials (refreshed in the background); the data calls themselves are non-blocking
+# and share one connection pool per event loop.
+
+_async_state = weakref.WeakKeyDictionary()
+
+
+def _async_http():
+    """(httpx.AsyncClient, semaphore) for the running loop."""
+    loop = asyncio.get_running_loop()
+    st = _async_state.get(loop)
+    if st is None:
+        st = (httpx.AsyncClient(timeout=30.0), asyncio.Semaphore(GBP_MAX_CONCURRENCY))
+        _async_state[loop] = st
+    return st
+
+
+async def _async_get(creds, url, params=None):
+    client, sem = _async_http()
+    headers = {"Authorization": f"Bearer {creds.token}"}
+    async with sem:
+        return await client.get(url, params=params, headers=headers)
+
+
+async def _resolve_location_async(creds):
+    """Cached location without leaving the loop; a lookup (blocking client library) runs in a thread."""
+    cached = gbp_session.cached_location()
+    if cached is not None:
+        return cached + (None,)
+    return await asyncio.to_thread(_resolve_location, creds)
+
+
+async def get_insights_async(start_date=None, end_date=None):
+    """Async get_insights (same result shape, same single-flight coalescing)."""
+    result = await gbp_flight.do_async(
+        _insights_flight_key(start_date, end_date), lambda: _fetch_insights_async(start_date, end_date)
+    )
+    return copy.deepcopy(result)
+
+
+async def get_insights_pair_async(start_date, end_date, compare_start_date, compare_end_date):
+    """Async get_insights_pair (far-apart periods are fetched concurrently)."""
+    plan = _insights_pair_plan(start_date, end_date, compare_start_date, compare_end_date)
+    if plan is None:
+        return tuple(await asyncio.gather(
+            get_insights_async(start_date, end_date),
+            get_insights_async(compare_start_date, compare_end_date),
+        ))
+    span = plan[0]
+    return _split_insights(await get_insights_async(span[0].isoformat(), span[1].isoformat()), plan)
+
+
+async def _fetch_insights_async(start_date=None, end_date=None):
+    creds = await gbp_credentials.get_async()
+    if not creds:
+        return {"error": "Credentials not found"}
+    try:
+        account_name, location_name, err = await _resolve_location_async(creds)
+        if err:
+            return {"error": err}
+        start_date_obj, end_date_obj = _insights_date_range(start_date, end_date)
+        # SQLite reads and writes run in a worker thread so a busy store never stalls the loop
+        store = await asyncio.to_thread(get_gbp_metrics_store)
+        fetch_range = (start_date_obj, end_date_obj)
+        if store is not None:
+            fetch_range = await asyncio.to_thread(_insights_sync_range, store, location_name, start_date_obj, end_date_obj)
+            if fetch_range is None:
+                return await asyncio.to_thread(_stored_insights_result, store, location_name, start_date_obj, end_date_obj)
+        url = f"{PERFORMANCE_API}/{location_name}:fetchMultiDailyMetricsTimeSeries"
+        response = await _async_get(creds, url, _insights_params(*fetch_range))
+        if response.status_code != 200:
+            _on_location_error(response)
+            return _api_error(response)
+        if store is not None:
+            await asyncio.to_thread(_store_insights, store, location_name, fetch_range, response.json())
+            return await asyncio.to_thread(_stored_insights_result, store, location_name, start_date_obj, end_date_obj)
+        return _insights_result(response.json(), location_name)
     except Exception as e:
         return {"error": f"Unexpected Error: {str(e)}"}
+
+
+async def get_reviews_async(limit=GBP_REVIEWS_LIMIT):
+    """Async get_reviews (same result shape, same single-flight coalescing)."""
+    location, result = await gbp_flight.do_async(("reviews",), _sync_reviews_async)
+    if location is None:
+        return copy.deepcopy(result)
+    return await asyncio.to_thread(lambda: _reviews_result(get_gbp_review_store(), location, limit))
+
+
+async def _sync_reviews_async():
+    creds = await gbp_credentials.get_async()
+    if not creds:
+        return None, {"error": "Credentials not found"}
+    try:
+        account_name, location_name, err = await _resolve_location_async(creds)
+        if err:
+            return None, {"error": err}
+        location = _full_location_name(account_name, location_name)
+        # Review index reads and writes (a full sync upserts every review) run in a worker thread
+        store = await asyncio.to_thread(get_gbp_review_store)
+        sync, full, watermark = await asyncio.to_thread(store.sync_plan, location)
+        if not sync:
+            store.count_local_answer()
+            return location, None
+        url = f"{REVIEWS_API}/{location}/reviews"
+        pages = _ReviewPages(full, watermark)
+        page_token = None
+        while True:
+            response = await _async_get(creds, url, pages.params(page_token))
+            if response.status_code == 403:
+                print("GBP Reviews API (v4) not enabled. returning empty list.")
+                return None, dict(_REVIEWS_DISABLED_RESULT)
+            if response.status_code != 200:
+                _on_location_error(response)
+                return None, _api_error(response)
+            page_token = pages.add(response.json())
+            if not page_token:
+                break
+        await asyncio.to_thread(pages.commit, store, location)
+        return location, None
+    except Exception as e:
+        return None, {"error": f"Unexpected Error: {str(e)}"}
+
+
+async def get_ratings_async():
+    """Async get_ratings."""
+    location, result = await gbp_flight.do_async(("reviews",), _sync_reviews_async)
+    if location is None:
+        return _ratings_from_reviews(copy.deepcopy(result))
+    return await asyncio.to_thread(lambda: _ratings_result(get_gbp_review_store(), location))
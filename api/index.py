@@ -5,24 +5,37 @@ Handles both GA4 Analytics and Google Business Profile requests
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import json
 import os
 import sys
+import time
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import GA4 utilities
 try:
-    from utils.ga4_utils import (
-        get_client,
-        fetch_analytics_data,
-        fetch_blog_screen_page_views_total,
-        fetch_generate_lead_by_form_context,
-        fetch_path_screen_page_views_total,
+    from utils.ga4_async import (
+        fetch_analytics_data_async,
+        fetch_blog_screen_page_views_total_async,
+        fetch_event_counts_async,
+        fetch_ga4_batch_async,
+        fetch_generate_lead_by_form_context_async,
+        fetch_path_screen_page_views_total_async,
+        fetch_paths_screen_page_views_totals_async,
+        fetch_top_pages_matrix_async,
     )
+    from utils.ga4_utils import TOP_PAGES_MAX_K, australia_country_filter_expression, check_scopes, ga4_flight, iter_ga4_rows
+    from utils.ga4_quota import QuotaExhaustedError, quota_scheduler
+    from utils.ga4_columnar import ColumnarReport, check_format
+    from utils.report_cache import report_cache
+    from utils.simple_stats import build_simple_range_bundles
+    from utils.report_store import get_report_store, report_store_stats
+    from utils.fact_store import fact_store_stats
     GA4_AVAILABLE = True
 except ImportError:
     GA4_AVAILABLE = False
@@ -36,6 +49,8 @@ try:
     except ImportError:
         # Fall back to absolute import
         import gbp
+    from utils.gbp_review_store import gbp_review_store_stats
+    from utils.gbp_store import gbp_metrics_store_stats
     GBP_AVAILABLE = True
 except ImportError as e:
     GBP_AVAILABLE = False
@@ -71,6 +86,29 @@ app.add_middleware(
 
 # Configuration
 PROPERTY_ID = os.environ.get('PROPERTY_ID', '368035934')
+# Optional shared secret for /api/admin/* (sent as X-Admin-Token); unset = open, as for local dev
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+
+def _require_admin(request: Request):
+    if ADMIN_TOKEN and request.headers.get('x-admin-token') != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+def _ga4_error(e: Exception) -> HTTPException:
+    """429 (with Retry-After) when the GA4 quota scheduler refused the report, else 500."""
+    if GA4_AVAILABLE and isinstance(e, QuotaExhaustedError):
+        headers = {"Retry-After": str(int(e.retry_after))} if e.retry_after else None
+        return HTTPException(status_code=429, detail=str(e), headers=headers)
+    return HTTPException(status_code=500, detail=str(e))
+
+
+def _gbp_error(e: Exception) -> HTTPException:
+    """503 (with Retry-After while a token refresh backs off) when the GBP credentials are unusable, else 500."""
+    if GBP_AVAILABLE and isinstance(e, gbp.GBPCredentialsUnavailable):
+        headers = {"Retry-After": str(int(e.retry_after))} if e.retry_after else None
+        return HTTPException(status_code=503, detail=str(e), headers=headers)
+    return HTTPException(status_code=500, detail=f"GBP Error: {str(e)}")
 
 # Request/Response Models
 class AnalyticsRequest(BaseModel):
@@ -79,6 +117,52 @@ class AnalyticsRequest(BaseModel):
     dimensions: List[str] = []
     metrics: List[str]
     limit: int = 10000
+    compare_start_date: Optional[str] = None
+    compare_end_date: Optional[str] = None
+    au_only: bool = False
+    format: str = "rows"  # rows | columnar
+
+
+class BatchAnalyticsRequest(BaseModel):
+    reports: List[AnalyticsRequest]
+
+
+# Upper bound on reports per /api/analytics/batch call (each chunk of 5 is one GA4 RPC)
+MAX_BATCH_REPORTS = 50
+# Row cap for /api/analytics/cities with a `cities` filter (rows are bounded by the filter)
+CITY_FILTER_LIMIT = 10000
+
+
+def _csv_param(value: Optional[str]) -> List[str]:
+    return [x.strip() for x in (value or "").split(",") if x.strip()]
+
+
+def _format_param(format: Optional[str]) -> str:
+    """`format` query param (rows | columnar); 400 for anything else."""
+    try:
+        return check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _scopes_param(scopes: Optional[str]) -> Optional[List[str]]:
+    """`scopes` query param (e.g. au,all); None when absent, 400 for unknown scopes."""
+    values = _csv_param(scopes)
+    if not values:
+        return None
+    try:
+        return check_scopes(values)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _report_data(data):
+    """Row list as-is; ColumnarReport as its JSON shape; {scope: …} (scopes mode) per scope."""
+    if isinstance(data, dict):
+        return {scope: _report_data(d) for scope, d in data.items()}
+    if isinstance(data, ColumnarReport):
+        return data.to_json()
+    return data
 
 # Root endpoint (API info only - dashboard served by StaticFiles)
 @app.get("/api")
@@ -98,12 +182,26 @@ def root():
 # Health check
 @app.get("/api/health")
 def health_check():
+    single_flight = {}
+    if GA4_AVAILABLE:
+        single_flight["ga4"] = ga4_flight.stats()
+    if GBP_AVAILABLE:
+        single_flight["gbp"] = gbp.gbp_flight.stats()
     return {
         "status": "healthy",
         "property_id": PROPERTY_ID,
         "ga4_available": GA4_AVAILABLE,
         "gbp_available": GBP_AVAILABLE,
         "sales_stats_charts_pdf": SALES_STATS_PDF_AVAILABLE,
+        # Upstream calls collapsed into an identical in-flight call
+        "single_flight": single_flight,
+        # Latest GA4 property quota balances and scheduler counters
+        "ga4_quota": quota_scheduler.stats() if GA4_AVAILABLE else None,
+        # Cached GBP account / location resolution and token state
+        "gbp_session": gbp.gbp_session.stats() if GBP_AVAILABLE else None,
+        "gbp_credentials": gbp.gbp_credentials.stats() if GBP_AVAILABLE else None,
+        "gbp_metrics_store": gbp_metrics_store_stats() if GBP_AVAILABLE else None,
+        "gbp_review_store": gbp_review_store_stats() if GBP_AVAILABLE else None,
     }
 
 
@@ -170,7 +268,7 @@ def _get_sales_stats_charts_pdf_impl(year: int, months: str, au_only: bool = Fal
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _ga4_error(e)
     fname = f"tenacious_sales_stats_charts_{year}.pdf"
     return Response(
         content=pdf_bytes,
@@ -189,40 +287,65 @@ def get_sales_stats_charts_pdf(year: int, months: str, au_only: bool = False):
 # GA4 Analytics Endpoints
 if GA4_AVAILABLE:
     @app.get("/api/analytics/overview")
-    def get_overview(start_date: str, end_date: str, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False):
-        """Get overview metrics."""
+    async def get_overview(start_date: str, end_date: str, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False, format: str = "rows", scopes: Optional[str] = None):
+        """Get overview metrics. scopes=au,all returns {scope: overview} from one call (au_only is ignored)."""
+        fmt = _format_param(format)
+        scope_list = _scopes_param(scopes)
         try:
             dimensions = []
             metrics = ['sessions', 'totalUsers', 'screenPageViews', 'bounceRate', 'averageSessionDuration', 'engagementRate']
-            data = fetch_analytics_data(start_date, end_date, dimensions, metrics, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only)
+            data = await fetch_analytics_data_async(start_date, end_date, dimensions, metrics, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only, format=fmt, scopes=scope_list)
+            if fmt == "columnar":
+                return {"success": True, "data": _report_data(data)}
+            if scope_list:
+                return {"success": True, "data": {scope: rows[0] if rows else {} for scope, rows in data.items()}}
             return {"success": True, "data": data[0] if data else {}}
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            raise _ga4_error(e)
 
     @app.get("/api/analytics/sources")
-    def get_sources(start_date: str, end_date: str, limit: int = 10, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False):
-        """Get traffic sources."""
+    async def get_sources(start_date: str, end_date: str, limit: int = 10, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False, format: str = "rows", scopes: Optional[str] = None):
+        """Get traffic sources; scopes=au,all returns {scope: rows} from one call."""
+        fmt = _format_param(format)
+        scope_list = _scopes_param(scopes)
         try:
             dimensions = ['sessionSourceMedium']
             metrics = ['sessions']
-            data = fetch_analytics_data(start_date, end_date, dimensions, metrics, limit, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only)
-            return {"success": True, "data": data}
+            data = await fetch_analytics_data_async(start_date, end_date, dimensions, metrics, limit, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only, format=fmt, scopes=scope_list)
+            return {"success": True, "data": _report_data(data)}
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            raise _ga4_error(e)
 
     @app.get("/api/analytics/pages")
-    def get_pages(start_date: str, end_date: str, limit: int = 15, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False):
-        """Get top pages."""
+    async def get_pages(start_date: str, end_date: str, limit: int = 15, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False, format: str = "rows", scopes: Optional[str] = None):
+        """Get top pages; scopes=au,all returns {scope: rows} from one call."""
+        fmt = _format_param(format)
+        scope_list = _scopes_param(scopes)
         try:
             dimensions = ['pagePath', 'pageTitle']
             metrics = ['screenPageViews', 'activeUsers']
-            data = fetch_analytics_data(start_date, end_date, dimensions, metrics, limit, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only)
+            data = await fetch_analytics_data_async(start_date, end_date, dimensions, metrics, limit, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only, format=fmt, scopes=scope_list)
+            return {"success": True, "data": _report_data(data)}
+        except Exception as e:
+            raise _ga4_error(e)
+
+    @app.get("/api/analytics/top-pages-matrix")
+    async def get_top_pages_matrix(start_date: str, end_date: str, k: int = 5, au_only: bool = False):
+        """
+        Top k pages by screenPageViews for each month of the range, from one GA4 report
+        (yearMonth x pagePath x pageTitle, ranked server-side).
+        data: [{"yearMonth": "YYYYMM", "pages": [{"pagePath", "pageTitle", "screenPageViews"}], "complete"}]
+        """
+        if not 1 <= k <= TOP_PAGES_MAX_K:
+            raise HTTPException(status_code=400, detail=f"k must be between 1 and {TOP_PAGES_MAX_K}")
+        try:
+            data = await fetch_top_pages_matrix_async(start_date, end_date, k=k, au_only=au_only)
             return {"success": True, "data": data}
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            raise _ga4_error(e)
 
     @app.get("/api/analytics/blog-path-views")
-    def get_blog_path_views(
+    async def get_blog_path_views(
         start_date: str,
         end_date: str,
         path_contains: str = "blog",
@@ -233,7 +356,7 @@ if GA4_AVAILABLE:
         Uses GA4 dimension filter — not limited to top-N landing pages.
         """
         try:
-            total = fetch_blog_screen_page_views_total(
+            total = await fetch_blog_screen_page_views_total_async(
                 start_date, end_date, path_contains=path_contains, au_only=au_only
             )
             return {
@@ -244,10 +367,10 @@ if GA4_AVAILABLE:
                 },
             }
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            raise _ga4_error(e)
 
     @app.get("/api/analytics/path-views-total")
-    def get_path_views_total(
+    async def get_path_views_total(
         start_date: str,
         end_date: str,
         path: str,
@@ -263,7 +386,7 @@ if GA4_AVAILABLE:
             m = (match or "contains").strip().lower()
             if m not in ("contains", "exact"):
                 m = "contains"
-            total = fetch_path_screen_page_views_total(
+            total = await fetch_path_screen_page_views_total_async(
                 start_date, end_date, path, match_type=m, au_only=au_only
             )
             return {
@@ -275,79 +398,329 @@ if GA4_AVAILABLE:
                 },
             }
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            raise _ga4_error(e)
+
+    @app.get("/api/analytics/path-views-totals")
+    async def get_path_views_totals(
+        start_date: str,
+        end_date: str,
+        paths: str,
+        match: str = "contains",
+        au_only: bool = False,
+        group: Optional[str] = None,
+    ):
+        """
+        screenPageViews for many pagePath patterns from one GA4 report.
+        paths: comma-separated values (slugs or exact paths); match: contains | exact (for all).
+        group=yearMonth adds byMonth ({"YYYYMM": views}) per path.
+        data: [{"path", "match", "screenPageViews"[, "byMonth"]}] in the order given.
+        """
+        m = (match or "contains").strip().lower()
+        if m not in ("contains", "exact"):
+            m = "contains"
+        if group not in (None, "", "yearMonth"):
+            raise HTTPException(status_code=400, detail="group must be yearMonth")
+        path_list = _csv_param(paths)
+        if not path_list:
+            raise HTTPException(status_code=400, detail="paths is required")
+        try:
+            data = await fetch_paths_screen_page_views_totals_async(
+                start_date, end_date, path_list, match_type=m, au_only=au_only, by_month=group == "yearMonth"
+            )
+            return {"success": True, "data": data}
+        except Exception as e:
+            raise _ga4_error(e)
 
     @app.get("/api/analytics/cities")
-    def get_cities(start_date: str, end_date: str, limit: int = 10, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False):
-        """Get top cities."""
+    async def get_cities(start_date: str, end_date: str, limit: int = 10, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False, format: str = "rows", cities: Optional[str] = None, group: Optional[str] = None, scopes: Optional[str] = None):
+        """
+        Get top cities.
+        cities=Sydney,Melbourne,... returns only those cities, filtered by GA4 (not cut to the top
+        `limit` first); the filter bounds the rows, so `limit` is not applied then.
+        group=yearMonth adds a yearMonth column so one call covers every month of the range.
+        scopes=au,all returns {scope: rows} from one call (not combinable with cities).
+        """
+        fmt = _format_param(format)
+        if group not in (None, "", "yearMonth"):
+            raise HTTPException(status_code=400, detail="group must be yearMonth")
+        city_list = _csv_param(cities)
+        scope_list = _scopes_param(scopes)
+        if city_list and scope_list:
+            raise HTTPException(status_code=400, detail="cities cannot be combined with scopes")
         try:
-            dimensions = ['city']
+            dimensions = ['city'] + (['yearMonth'] if group == "yearMonth" else [])
             metrics = ['sessions']
-            data = fetch_analytics_data(start_date, end_date, dimensions, metrics, limit, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only)
-            return {"success": True, "data": data}
+            if city_list:
+                limit = CITY_FILTER_LIMIT
+            data = await fetch_analytics_data_async(start_date, end_date, dimensions, metrics, limit, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only, format=fmt, cities=city_list or None, scopes=scope_list)
+            return {"success": True, "data": _report_data(data)}
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            raise _ga4_error(e)
 
     @app.get("/api/analytics/retention")
-    def get_retention(start_date: str, end_date: str, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False):
-        """Get new vs returning users."""
+    async def get_retention(start_date: str, end_date: str, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False, format: str = "rows", scopes: Optional[str] = None):
+        """Get new vs returning users; scopes=au,all returns {scope: rows} from one call."""
+        fmt = _format_param(format)
+        scope_list = _scopes_param(scopes)
         try:
             dimensions = ['newVsReturning']
             metrics = ['sessions']
-            data = fetch_analytics_data(start_date, end_date, dimensions, metrics, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only)
-            return {"success": True, "data": data}
+            data = await fetch_analytics_data_async(start_date, end_date, dimensions, metrics, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only, format=fmt, scopes=scope_list)
+            return {"success": True, "data": _report_data(data)}
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            raise _ga4_error(e)
 
     @app.get("/api/analytics/countries")
-    def get_countries(start_date: str, end_date: str, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False):
-        """Get sessions by country."""
+    async def get_countries(start_date: str, end_date: str, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False, format: str = "rows", scopes: Optional[str] = None):
+        """Get sessions by country; scopes=au,all returns {scope: rows} from one call."""
+        fmt = _format_param(format)
+        scope_list = _scopes_param(scopes)
         try:
             dimensions = ['country']
             metrics = ['sessions']
-            data = fetch_analytics_data(start_date, end_date, dimensions, metrics, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only)
-            return {"success": True, "data": data}
+            data = await fetch_analytics_data_async(start_date, end_date, dimensions, metrics, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only, format=fmt, scopes=scope_list)
+            return {"success": True, "data": _report_data(data)}
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            raise _ga4_error(e)
 
     @app.get("/api/analytics/devices")
-    def get_devices(start_date: str, end_date: str, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False):
-        """Get sessions by device category."""
+    async def get_devices(start_date: str, end_date: str, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False, format: str = "rows", scopes: Optional[str] = None):
+        """Get sessions by device category; scopes=au,all returns {scope: rows} from one call."""
+        fmt = _format_param(format)
+        scope_list = _scopes_param(scopes)
         try:
             dimensions = ['deviceCategory']
             metrics = ['sessions']
-            data = fetch_analytics_data(start_date, end_date, dimensions, metrics, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only)
-            return {"success": True, "data": data}
+            data = await fetch_analytics_data_async(start_date, end_date, dimensions, metrics, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only, format=fmt, scopes=scope_list)
+            return {"success": True, "data": _report_data(data)}
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            raise _ga4_error(e)
 
     @app.get("/api/analytics/events")
-    def get_events(start_date: str, end_date: str, limit: int = 20, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False):
-        """Get top events plus generate_lead breakdown by form_context (CF7)."""
+    async def get_events(start_date: str, end_date: str, limit: int = 20, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None, au_only: bool = False, format: str = "rows", lead_breakdown: bool = False):
+        """
+        Get top events. lead_breakdown=true also returns the generate_lead breakdown by form_context (CF7);
+        both reports then run concurrently.
+        """
+        fmt = _format_param(format)
         try:
             dimensions = ['eventName']
             metrics = ['eventCount']
-            data = fetch_analytics_data(start_date, end_date, dimensions, metrics, limit, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only)
-            payload = {
-                "success": True,
-                "data": data,
-                "generate_lead_by_context": None,
-                "generate_lead_breakdown_error": None,
-            }
+            data, leads = await asyncio.gather(
+                fetch_analytics_data_async(start_date, end_date, dimensions, metrics, limit, compare_start_date=compare_start_date, compare_end_date=compare_end_date, au_only=au_only, format=fmt),
+                _lead_breakdown(start_date, end_date, compare_start_date, compare_end_date, au_only, lead_breakdown),
+                return_exceptions=True,
+            )
+            if isinstance(data, Exception):
+                raise data
+            return {"success": True, "data": _report_data(data), **_lead_breakdown_fields(leads)}
+        except Exception as e:
+            raise _ga4_error(e)
+
+    async def _lead_breakdown(start_date, end_date, compare_start_date, compare_end_date, au_only, wanted):
+        if not wanted:
+            return None
+        return await fetch_generate_lead_by_form_context_async(
+            start_date,
+            end_date,
+            limit=25,
+            compare_start_date=compare_start_date,
+            compare_end_date=compare_end_date,
+            au_only=au_only,
+        )
+
+    def _lead_breakdown_fields(leads) -> dict:
+        if isinstance(leads, Exception):
+            return {"generate_lead_by_context": None, "generate_lead_breakdown_error": str(leads)}
+        return {"generate_lead_by_context": leads, "generate_lead_breakdown_error": None}
+
+    @app.get("/api/analytics/event-counts")
+    async def get_event_counts(
+        start_date: str,
+        end_date: str,
+        names: str,
+        au_only: bool = False,
+        group: Optional[str] = None,
+        lead_breakdown: bool = False,
+    ):
+        """
+        eventCount for specific events (names=click_buy_online,generate_lead) from one report
+        filtered server-side. group=yearMonth adds byMonth ({"YYYYMM": count}) so many months
+        cost one report. lead_breakdown=true adds the generate_lead breakdown by form_context.
+        """
+        if group not in (None, "", "yearMonth"):
+            raise HTTPException(status_code=400, detail="group must be yearMonth")
+        name_list = _csv_param(names)
+        if not name_list:
+            raise HTTPException(status_code=400, detail="names is required")
+        try:
+            data, leads = await asyncio.gather(
+                fetch_event_counts_async(start_date, end_date, name_list, au_only=au_only, by_month=group == "yearMonth"),
+                _lead_breakdown(start_date, end_date, None, None, au_only, lead_breakdown),
+                return_exceptions=True,
+            )
+            if isinstance(data, Exception):
+                raise data
+            return {"success": True, "data": data, **_lead_breakdown_fields(leads)}
+        except Exception as e:
+            raise _ga4_error(e)
+
+    @app.get("/api/analytics/simple-range")
+    async def get_simple_range(
+        year: int,
+        months: str,
+        au_only: bool = False,
+        featured: Optional[str] = None,
+        feed_url: Optional[str] = None,
+    ):
+        """
+        Whole Sales stats (Jan–Apr tab) bundle for many months in one request.
+        months=comma-separated 1–12. data.bundles[i] has the shape of fetchSimpleMonthBundle.
+        featured (optional): On a Roll slugs, comma-separated, aligned with the sorted months
+        (empty = none). Without it the slugs come from the On a Roll RSS feed.
+        """
+        try:
+            month_list = sorted({int(x.strip()) for x in months.split(",") if x.strip()})
+        except ValueError:
+            raise HTTPException(status_code=400, detail="months must be comma-separated integers (1–12)")
+        if not month_list or any(m < 1 or m > 12 for m in month_list):
+            raise HTTPException(status_code=400, detail="months must be comma-separated integers (1–12)")
+
+        featured_map = None
+        oar_paths, oar_titles = {}, {}
+        if featured is not None:
+            slugs = featured.split(",")
+            featured_map = {m: (slugs[i] if i < len(slugs) else "") for i, m in enumerate(month_list)}
+        elif OAR_RSS_AVAILABLE:
             try:
-                payload["generate_lead_by_context"] = fetch_generate_lead_by_form_context(
-                    start_date,
-                    end_date,
-                    limit=25,
-                    compare_start_date=compare_start_date,
-                    compare_end_date=compare_end_date,
-                    au_only=au_only,
+                oar_paths, oar_titles = await asyncio.to_thread(
+                    fetch_on_a_roll_meta_by_month, (feed_url or "").strip() or DEFAULT_ON_A_ROLL_FEED
                 )
-            except Exception as lead_err:
-                payload["generate_lead_breakdown_error"] = str(lead_err)
-            return payload
+            except Exception as e:
+                print(f"On a Roll RSS unavailable for simple-range: {e}")
+        try:
+            bundles = await build_simple_range_bundles(
+                year,
+                month_list,
+                au_only=au_only,
+                featured=featured_map,
+                oar_paths=oar_paths,
+                oar_titles=oar_titles,
+            )
+            return {"success": True, "data": {"year": year, "monthIndices": month_list, "bundles": bundles}}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise _ga4_error(e)
+
+    @app.post("/api/analytics/batch")
+    async def post_analytics_batch(body: BatchAnalyticsRequest):
+        """
+        Run many report specs in one HTTP call; GA4 BatchRunReports packs up to 5 per RPC.
+        data[i] matches reports[i]: {"success": true, "data": rows} or {"success": false, "error": ...}.
+        """
+        if not body.reports:
+            return {"success": True, "data": []}
+        if len(body.reports) > MAX_BATCH_REPORTS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_REPORTS} reports per batch")
+        if any(not r.metrics for r in body.reports):
+            raise HTTPException(status_code=400, detail="Every report needs at least one metric")
+        for r in body.reports:
+            r.format = _format_param(r.format)
+        try:
+            data = await fetch_ga4_batch_async([r.model_dump() for r in body.reports])
+            for result in data:
+                if result.get("success"):
+                    result["data"] = _report_data(result["data"])
+            return {"success": True, "data": data}
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            raise _ga4_error(e)
+
+    @app.get("/api/analytics/report.ndjson")
+    def get_report_ndjson(
+        start_date: str,
+        end_date: str,
+        metrics: str,
+        dimensions: Optional[str] = None,
+        au_only: bool = False,
+        page_size: int = 10000,
+        max_rows: Optional[int] = None,
+    ):
+        """
+        Full report as newline-delimited JSON (one row object per line), paged from GA4 with
+        offset so nothing is truncated at `limit` and the function never buffers the whole export.
+        dimensions / metrics: comma-separated GA4 names. A failure after streaming has started is
+        reported as a final {"error": ...} line.
+        """
+        metric_list = _csv_param(metrics)
+        if not metric_list:
+            raise HTTPException(status_code=400, detail="metrics is required")
+        if not 1 <= page_size <= 250000:
+            raise HTTPException(status_code=400, detail="page_size must be between 1 and 250000")
+        rows = iter_ga4_rows(
+            start_date,
+            end_date,
+            _csv_param(dimensions),
+            metric_list,
+            dimension_filter=australia_country_filter_expression() if au_only else None,
+            page_size=page_size,
+            max_rows=max_rows,
+        )
+        # Pull the first page up front so request/quota errors still get a proper status code
+        try:
+            first = next(rows, None)
+        except Exception as e:
+            raise _ga4_error(e)
+
+        def lines():
+            if first is None:
+                return
+            yield json.dumps(first) + "\n"
+            try:
+                for row in rows:
+                    yield json.dumps(row) + "\n"
+            except Exception as e:
+                yield json.dumps({"error": str(e)}) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    # Report cache admin (keyed on the canonical GA4 request, so `_t` and other query noise never matter)
+    @app.get("/api/admin/cache")
+    def get_report_cache(request: Request):
+        """Report cache stats (hits, misses, evictions), live entries and the SQLite stores (if enabled)."""
+        _require_admin(request)
+        return {
+            "success": True,
+            "data": {
+                "stats": report_cache.stats(),
+                "entries": report_cache.entries(),
+                "store": report_store_stats(),
+                "factStore": fact_store_stats(),
+            },
+        }
+
+    @app.delete("/api/admin/cache")
+    def invalidate_report_cache(request: Request, key: Optional[str] = None, open_only: bool = False, include_store: bool = False):
+        """
+        Invalidate cached reports.
+        key: drop one entry; open_only=true: drop entries whose range is still settling; neither: clear all.
+        include_store=true: also delete from the SQLite store (key, or everything).
+        """
+        _require_admin(request)
+        removed = report_cache.invalidate(key=key, open_only=open_only)
+        store_removed = 0
+        store = get_report_store()
+        if include_store and store is not None:
+            store_removed = store.invalidate(key=key)
+        return {
+            "success": True,
+            "data": {
+                "removed": removed,
+                "storeRemoved": store_removed,
+                "stats": report_cache.stats(),
+                "store": report_store_stats(),
+            },
+        }
 else:
     # Register same routes when GA4 not available so frontend gets JSON instead of 404
     _GA4_UNAVAILABLE = {"success": False, "data": None, "error": "GA4 not available. Check credentials.json and utils path."}
@@ -364,6 +737,10 @@ else:
     def get_pages_unavailable(start_date: str, end_date: str, limit: int = 15, au_only: bool = False):
         return {**_GA4_UNAVAILABLE, "data": []}
 
+    @app.get("/api/analytics/top-pages-matrix")
+    def get_top_pages_matrix_unavailable(start_date: str, end_date: str, k: int = 5, au_only: bool = False):
+        return {**_GA4_UNAVAILABLE, "data": []}
+
     @app.get("/api/analytics/blog-path-views")
     def get_blog_path_views_unavailable(start_date: str, end_date: str, path_contains: str = "blog", au_only: bool = False):
         return {**_GA4_UNAVAILABLE, "data": {"screenPageViews": 0, "pathContains": path_contains}}
@@ -372,8 +749,12 @@ else:
     def get_path_views_total_unavailable(start_date: str, end_date: str, path: str, match: str = "contains", au_only: bool = False):
         return {**_GA4_UNAVAILABLE, "data": {"screenPageViews": 0, "path": path, "match": match}}
 
+    @app.get("/api/analytics/path-views-totals")
+    def get_path_views_totals_unavailable(start_date: str, end_date: str, paths: str, match: str = "contains", au_only: bool = False):
+        return {**_GA4_UNAVAILABLE, "data": []}
+
     @app.get("/api/analytics/cities")
-    def get_cities_unavailable(start_date: str, end_date: str, limit: int = 10, au_only: bool = False):
+    def get_cities_unavailable(start_date: str, end_date: str, limit: int = 10, au_only: bool = False, cities: Optional[str] = None):
         return {**_GA4_UNAVAILABLE, "data": []}
 
     @app.get("/api/analytics/retention")
@@ -388,6 +769,22 @@ else:
     def get_devices_unavailable(start_date: str, end_date: str, au_only: bool = False):
         return {**_GA4_UNAVAILABLE, "data": []}
 
+    @app.get("/api/analytics/simple-range")
+    def get_simple_range_unavailable(year: int, months: str, au_only: bool = False):
+        return {**_GA4_UNAVAILABLE, "data": {"year": year, "monthIndices": [], "bundles": []}}
+
+    @app.post("/api/analytics/batch")
+    def post_analytics_batch_unavailable(body: BatchAnalyticsRequest):
+        return {**_GA4_UNAVAILABLE, "data": []}
+
+    @app.get("/api/analytics/report.ndjson")
+    def get_report_ndjson_unavailable(start_date: str, end_date: str, metrics: str):
+        raise HTTPException(status_code=503, detail=_GA4_UNAVAILABLE["error"])
+
+    @app.get("/api/analytics/event-counts")
+    def get_event_counts_unavailable(start_date: str, end_date: str, names: str, au_only: bool = False):
+        return {**_GA4_UNAVAILABLE, "data": [], "generate_lead_by_context": None, "generate_lead_breakdown_error": None}
+
     @app.get("/api/analytics/events")
     def get_events_unavailable(start_date: str, end_date: str, limit: int = 20, au_only: bool = False):
         return {
@@ -400,17 +797,26 @@ else:
 # Google Business Profile Endpoints
 if GBP_AVAILABLE:
     @app.get("/api/gbp/insights")
-    def get_gbp_insights(start_date: Optional[str] = None, end_date: Optional[str] = None, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None):
-        """Get Google Business Profile Insights."""
+    async def get_gbp_insights(start_date: Optional[str] = None, end_date: Optional[str] = None, compare_start_date: Optional[str] = None, compare_end_date: Optional[str] = None):
+        """
+        Get Google Business Profile Insights. With a compare period both come from one time series
+        spanning the two periods, split by day (or two concurrent fetches when they are far apart).
+        """
         try:
+            want_compare = bool(compare_start_date and compare_end_date)
+            if want_compare:
+                results = await gbp.get_insights_pair_async(start_date, end_date, compare_start_date, compare_end_date)
+            else:
+                results = [await gbp.get_insights_async(start_date, end_date)]
+
             # Current period
-            result = gbp.get_insights(start_date, end_date)
+            result = results[0]
             if "error" in result:
                 raise HTTPException(status_code=500, detail=result["error"])
             
             # Comparison period
-            if compare_start_date and compare_end_date:
-                comp_result = gbp.get_insights(compare_start_date, compare_end_date)
+            if want_compare:
+                comp_result = results[1]
                 if not "error" in comp_result:
                     # Merge summaries
                     curr_summary = result.get("summary", {})
@@ -429,33 +835,47 @@ if GBP_AVAILABLE:
         except HTTPException:
             raise
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"GBP Error: {str(e)}")
+            raise _gbp_error(e)
 
     @app.get("/api/gbp/reviews")
-    def get_gbp_reviews():
-        """Get Google Business Profile Reviews."""
+    async def get_gbp_reviews(limit: int = gbp.GBP_REVIEWS_LIMIT):
+        """Get Google Business Profile Reviews (most recently updated first)."""
+        if limit < 1:
+            raise HTTPException(status_code=400, detail="limit must be at least 1")
         try:
-            result = gbp.get_reviews()
+            result = await gbp.get_reviews_async(limit)
             if "error" in result:
                 raise HTTPException(status_code=500, detail=result["error"])
             return result
         except HTTPException:
             raise
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"GBP Error: {str(e)}")
+            raise _gbp_error(e)
 
     @app.get("/api/gbp/ratings")
-    def get_gbp_ratings():
-        """Get Google Business Profile ratings summary (from reviews)."""
+    async def get_gbp_ratings():
+        """Get Google Business Profile ratings summary (from the review index)."""
         try:
-            result = gbp.get_ratings()
+            result = await gbp.get_ratings_async()
             if "error" in result:
                 raise HTTPException(status_code=500, detail=result["error"])
             return result
         except HTTPException:
             raise
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"GBP Error: {str(e)}")
+            raise _gbp_error(e)
+
+    @app.post("/api/admin/gbp/refresh")
+    def refresh_gbp_session(request: Request, reload_credentials: bool = False):
+        """
+        Drop the cached GBP account / location (and discovery services); the next GBP call looks them up.
+        reload_credentials=true also re-reads the credentials (e.g. after a new token.pickle).
+        """
+        _require_admin(request)
+        if reload_credentials:
+            gbp.gbp_credentials.reload()
+        gbp.gbp_session.refresh()
+        return {"success": True, "data": {**gbp.gbp_session.stats(), "credentials": gbp.gbp_credentials.stats()}}
 else:
     @app.get("/api/gbp/insights")
     def get_gbp_insights_unavailable():
@@ -469,6 +889,178 @@ else:
     def get_gbp_ratings_unavailable():
         raise HTTPException(status_code=503, detail="GBP module not available")
 
+# Composite dashboard: the report loader's sections in one request, each with its own deadline
+DASHBOARD_GA4_TIMEOUT = float(os.environ.get('DASHBOARD_GA4_TIMEOUT', '20'))
+DASHBOARD_GBP_TIMEOUT = float(os.environ.get('DASHBOARD_GBP_TIMEOUT', '30'))
+DASHBOARD_MAX_TIMEOUT = 60.0
+
+
+def _ga4_section_kwargs(q: dict) -> dict:
+    return {
+        "start_date": q["start_date"],
+        "end_date": q["end_date"],
+        "compare_start_date": q["compare_start_date"],
+        "compare_end_date": q["compare_end_date"],
+        "au_only": q["au_only"],
+        "format": "rows",
+    }
+
+
+# name -> (call(query) returning the section's endpoint response, deadline in seconds);
+# arguments match what the dashboard's report loader sends to each endpoint
+DASHBOARD_SECTIONS: dict = {}
+if GA4_AVAILABLE:
+    DASHBOARD_SECTIONS.update({
+        "overview": (lambda q: get_overview(**_ga4_section_kwargs(q)), DASHBOARD_GA4_TIMEOUT),
+        "sources": (lambda q: get_sources(limit=10, **_ga4_section_kwargs(q)), DASHBOARD_GA4_TIMEOUT),
+        "pages": (lambda q: get_pages(limit=20, **_ga4_section_kwargs(q)), DASHBOARD_GA4_TIMEOUT),
+        "retention": (lambda q: get_retention(**_ga4_section_kwargs(q)), DASHBOARD_GA4_TIMEOUT),
+        "cities": (lambda q: get_cities(limit=10, **_ga4_section_kwargs(q)), DASHBOARD_GA4_TIMEOUT),
+        "countries": (lambda q: get_countries(**_ga4_section_kwargs(q)), DASHBOARD_GA4_TIMEOUT),
+        "devices": (lambda q: get_devices(**_ga4_section_kwargs(q)), DASHBOARD_GA4_TIMEOUT),
+        "events": (lambda q: get_events(limit=20, lead_breakdown=True, **_ga4_section_kwargs(q)), DASHBOARD_GA4_TIMEOUT),
+    })
+if GBP_AVAILABLE:
+    DASHBOARD_SECTIONS["gbpInsights"] = (
+        lambda q: get_gbp_insights(q["start_date"], q["end_date"], q["compare_start_date"], q["compare_end_date"]),
+        DASHBOARD_GBP_TIMEOUT,
+    )
+DASHBOARD_SECTION_NAMES = ("overview", "sources", "pages", "retention", "cities", "countries", "devices", "events", "gbpInsights")
+
+
+def _dashboard_sections(sections: Optional[str]) -> List[str]:
+    """Requested section names (all by default); 400 for unknown names."""
+    names = _csv_param(sections) or list(DASHBOARD_SECTION_NAMES)
+    unknown = [n for n in names if n not in DASHBOARD_SECTION_NAMES]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown sections: {', '.join(unknown)} (allowed: {', '.join(DASHBOARD_SECTION_NAMES)})",
+        )
+    return list(dict.fromkeys(names))
+
+
+def _consume_result(task: asyncio.Task) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+async def _run_dashboard_section(name: str, query: dict, timeout: Optional[float]):
+    """
+    (name, response or None, {"status", "ms", "error"}) for one section; never raises.
+    status: ok | error | timeout | unavailable. A section past its deadline keeps running in the
+    background (shielded), so its report still lands in the cache for the next load.
+    """
+    started = time.perf_counter()
+    entry = DASHBOARD_SECTIONS.get(name)
+    if entry is None:
+        return name, None, {"status": "unavailable", "ms": 0, "error": f"{name} is not available on this deployment"}
+    call, default_timeout = entry
+    deadline = min(timeout or default_timeout, DASHBOARD_MAX_TIMEOUT)
+    task = asyncio.ensure_future(call(query))
+    data, status, error = None, "ok", None
+    try:
+        data = await asyncio.wait_for(asyncio.shield(task), deadline)
+    except asyncio.TimeoutError:
+        task.add_done_callback(_consume_result)
+        status, error = "timeout", f"no response within {deadline:g}s"
+    except HTTPException as e:
+        status, error = "error", str(e.detail)
+    except Exception as e:
+        status, error = "error", str(e)
+    ms = round((time.perf_counter() - started) * 1000, 1)
+    return name, data, {"status": status, "ms": ms, "error": error}
+
+
+@app.get("/api/dashboard")
+async def get_dashboard(
+    start_date: str,
+    end_date: str,
+    sections: Optional[str] = None,
+    compare_start_date: Optional[str] = None,
+    compare_end_date: Optional[str] = None,
+    au_only: bool = False,
+    timeout: Optional[float] = None,
+):
+    """
+    Several dashboard sections in one request, run concurrently server-side.
+    sections: comma-separated (default all): overview, sources, pages, retention, cities,
+    countries, devices, events, gbpInsights. Each returns what its own endpoint returns.
+    Every section has its own deadline (timeout= seconds overrides the defaults, max 60), so a
+    slow upstream only costs its own section: data[name] is null for sections that timed out,
+    failed or are unavailable, and status[name] = {"status", "ms", "error"} says which.
+    """
+    names = _dashboard_sections(sections)
+    if timeout is not None and timeout <= 0:
+        raise HTTPException(status_code=400, detail="timeout must be positive")
+    query = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "compare_start_date": compare_start_date,
+        "compare_end_date": compare_end_date,
+        "au_only": au_only,
+    }
+    started = time.perf_counter()
+    results = await asyncio.gather(*(_run_dashboard_section(name, query, timeout) for name in names))
+    return {
+        "success": True,
+        "complete": all(info["status"] == "ok" for _, _, info in results),
+        "data": {name: data for name, data, _ in results},
+        "status": {name: info for name, _, info in results},
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+@app.get("/api/dashboard/stream")
+async def get_dashboard_stream(
+    start_date: str,
+    end_date: str,
+    sections: Optional[str] = None,
+    compare_start_date: Optional[str] = None,
+    compare_end_date: Optional[str] = None,
+    au_only: bool = False,
+    timeout: Optional[float] = None,
+):
+    """
+    Server-Sent Events version of /api/dashboard: one `section` event per section the moment it
+    finishes ({"name", "data", "status", "ms", "error"}, in completion order), then a `complete`
+    event ({"complete", "status", "ms"}). The page can render the fastest section first.
+    """
+    names = _dashboard_sections(sections)
+    if timeout is not None and timeout <= 0:
+        raise HTTPException(status_code=400, detail="timeout must be positive")
+    query = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "compare_start_date": compare_start_date,
+        "compare_end_date": compare_end_date,
+        "au_only": au_only,
+    }
+
+    async def events():
+        started = time.perf_counter()
+        status = {}
+        for next_done in asyncio.as_completed([_run_dashboard_section(name, query, timeout) for name in names]):
+            name, data, info = await next_done
+            status[name] = info
+            yield _sse("section", {"name": name, "data": data, **info})
+        yield _sse("complete", {
+            "complete": all(info["status"] == "ok" for info in status.values()),
+            "status": {name: status[name] for name in names},
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # Vercel serverless function handler
 # Vercel will automatically detect the FastAPI app
 # For local development
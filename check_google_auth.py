@@ -91,7 +91,10 @@ def check_gbp():
         import api.gbp as gbp
     except ImportError:
         return False, "GBP: cannot import api.gbp (run from project root)"
-    creds = gbp.get_creds()
+    try:
+        creds = gbp.get_creds()
+    except gbp.GBPCredentialsUnavailable as e:
+        return False, f"GBP: {e}"
     if not creds:
         return False, "GBP: no credentials (token.pickle, gbp-service-account-key.json, or GOOGLE_BUSINESS_PROFILE_CREDENTIALS_B64)"
     try:
@@ -0,0 +1,113 @@
+"""
+Benchmark: monthly sessions / users / engagement as one yearMonth report vs one report per month.
+
+Hits the live GA4 property (needs the same credentials as the dashboard), or with --simulate-ms
+a fake client that sleeps that long per RPC (offline, no credentials). The report cache is
+cleared before every run and the SQLite stores are disabled, so both variants pay full latency.
+
+Run from project root:
+  python scripts/bench_monthly_series.py                      # last full year, 12 months
+  python scripts/bench_monthly_series.py --year 2025 --months 1,2,3,4 --repeat 5 --au-only
+  python scripts/bench_monthly_series.py --months 1,2,3,4,5,6 --simulate-ms 50
+"""
+from __future__ import annotations
+
+import argparse
+import calendar
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _root)
+
+os.environ.pop("GA4_REPORT_STORE_PATH", None)
+os.environ.pop("GA4_FACT_STORE_PATH", None)
+
+from google.analytics.data_v1beta.types import DimensionHeader, MetricHeader, RunReportResponse
+
+from utils import ga4_utils
+from utils.ga4_utils import fetch_analytics_data, fetch_monthly_series, get_ga4_client
+from utils.report_cache import report_cache
+
+METRICS = ["sessions", "totalUsers", "engagementRate"]
+
+
+def per_month(year: int, months: list[int], au_only: bool) -> list[dict]:
+    """The old path: one report per month, run sequentially."""
+    out = []
+    for m in months:
+        _, last = calendar.monthrange(year, m)
+        rows = fetch_analytics_data(
+            f"{year}-{m:02d}-01", f"{year}-{m:02d}-{last:02d}", [], METRICS, limit=1, au_only=au_only
+        )
+        out.append(rows[0] if rows else {})
+    return out
+
+
+class SimulatedClient:
+    """Stands in for BetaAnalyticsDataClient: sleeps `latency` seconds, then answers with 1s."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def run_report(self, request):
+        time.sleep(self.latency)
+        dims = [d.name for d in request.dimensions]
+        metrics = [m.name for m in request.metrics]
+        pb = RunReportResponse.pb(RunReportResponse(
+            dimension_headers=[DimensionHeader(name=d) for d in dims],
+            metric_headers=[MetricHeader(name=m) for m in metrics],
+        ))
+        dr = request.date_ranges[0]
+        start, end = date.fromisoformat(dr.start_date), date.fromisoformat(dr.end_date)
+        keys = [[f"{start.year}{m:02d}"] for m in range(start.month, end.month + 1)] if dims == ["yearMonth"] else [[]]
+        for key in keys:
+            row = pb.rows.add()
+            for value in key:
+                row.dimension_values.add().value = value
+            for _ in metrics:
+                row.metric_values.add().value = "1"
+        pb.row_count = len(keys)
+        return RunReportResponse.wrap(pb)
+
+
+def timed(fn, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        report_cache.invalidate()
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark single-report monthly series vs per-month reports.")
+    parser.add_argument("--year", type=int, default=date.today().year - 1)
+    parser.add_argument("--months", default="1,2,3,4,5,6,7,8,9,10,11,12")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--au-only", action="store_true")
+    parser.add_argument("--simulate-ms", type=float, help="use a fake client with this much latency per RPC")
+    args = parser.parse_args()
+    months = sorted({int(x) for x in args.months.split(",") if x.strip()})
+
+    if args.simulate_ms is not None:
+        ga4_utils._client = SimulatedClient(args.simulate_ms / 1000)
+    get_ga4_client()  # channel setup is not part of either variant
+    old = timed(lambda: per_month(args.year, months, args.au_only), args.repeat)
+    new = timed(lambda: fetch_monthly_series(args.year, months, METRICS, au_only=args.au_only), args.repeat)
+
+    source = f"simulated {args.simulate_ms:g} ms RPC" if args.simulate_ms is not None else "live property"
+    print(f"{len(months)} months of {args.year}, {args.repeat} runs each "
+          f"({'au_only' if args.au_only else 'all locations'}, {source})")
+    print(f"  per-month reports  ({len(months)} RPCs): median {statistics.median(old) * 1000:8.1f} ms  min {min(old) * 1000:8.1f} ms")
+    print(f"  yearMonth report   (1 RPC):  median {statistics.median(new) * 1000:8.1f} ms  min {min(new) * 1000:8.1f} ms")
+    print(f"  speedup (median): {statistics.median(old) / statistics.median(new):.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,123 @@
+"""
+Microbenchmark: RunReportResponse -> row dicts, old proto-plus loop vs rows_from_response.
+
+Runs offline on synthetic responses (no credentials needed). The old loop is inlined below as
+it was before rows_from_response read the raw protobuf.
+
+Run from project root:
+  python scripts/bench_row_conversion.py                    # 10k and 100k rows
+  python scripts/bench_row_conversion.py --rows 50000 --repeat 5
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _root)
+
+from google.analytics.data_v1beta.types import (
+    DimensionHeader,
+    MetricHeader,
+    MetricType,
+    RunReportResponse,
+)
+
+from utils.ga4_utils import rows_from_response
+
+DIMENSIONS = ["pagePath", "pageTitle"]
+METRICS = ["screenPageViews", "activeUsers", "averageSessionDuration"]
+METRIC_TYPES = [MetricType.TYPE_INTEGER, MetricType.TYPE_INTEGER, MetricType.TYPE_SECONDS]
+
+
+def synthetic_response(n: int, compare: bool) -> RunReportResponse:
+    ranges = ["date_range_0", "date_range_1"] if compare else [None]
+    pb = RunReportResponse.pb(RunReportResponse(
+        dimension_headers=[DimensionHeader(name=d) for d in DIMENSIONS + (["dateRange"] if compare else [])],
+        metric_headers=[MetricHeader(name=m, type_=t) for m, t in zip(METRICS, METRIC_TYPES)],
+        row_count=n * len(ranges),
+    ))
+    # Build on the raw protobuf: constructing 100k proto-plus rows would dominate the setup time
+    for i in range(n):
+        for dr in ranges:
+            row = pb.rows.add()
+            for value in (f"/blog/post-{i}", f"Post {i} title") + ((dr,) if dr else ()):
+                row.dimension_values.add().value = value
+            for value in (str(i * 7 % 5000), str(i % 900), f"{(i % 300) / 3.7:.6f}"):
+                row.metric_values.add().value = value
+    return RunReportResponse.wrap(pb)
+
+
+def legacy_rows_from_response(response, dimensions: list, metrics: list, is_compare: bool = False) -> list:
+    """The previous conversion loop (proto-plus access per cell, `_is_done` sentinel)."""
+    num_dimensions = len(dimensions)
+    has_auto_date_dim = False
+    actual_num_dims = len(response.dimension_headers)
+    if is_compare and actual_num_dims > num_dimensions:
+        has_auto_date_dim = True
+    grouped_data = {}
+    for row in response.rows:
+        row_dims = tuple(row.dimension_values[i].value for i in range(num_dimensions))
+        is_current = True
+        if has_auto_date_dim:
+            is_current = row.dimension_values[actual_num_dims - 1].value == 'date_range_0'
+        elif num_dimensions == 0:
+            is_current = (len(grouped_data) == 0 or row_dims not in grouped_data or "_is_done" not in grouped_data[row_dims])
+        if row_dims not in grouped_data:
+            grouped_data[row_dims] = {}
+            for i, dim in enumerate(dimensions):
+                grouped_data[row_dims][dim] = row.dimension_values[i].value
+        if is_current:
+            for i, met in enumerate(metrics):
+                grouped_data[row_dims][met] = row.metric_values[i].value
+            if num_dimensions == 0:
+                grouped_data[row_dims]["_is_done"] = True
+        else:
+            for i, met in enumerate(metrics):
+                grouped_data[row_dims][f"{met}_compare"] = row.metric_values[i].value
+    return list(grouped_data.values())
+
+
+def best_of(fn, repeat: int) -> tuple[float, float]:
+    """(best, median) wall time over `repeat` runs."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times), statistics.median(times)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark GA4 row conversion.")
+    parser.add_argument("--rows", type=int, action="append", help="rows per response (repeatable; default 10000 and 100000)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for n in args.rows or [10_000, 100_000]:
+        for compare in (False, True):
+            response = synthetic_response(n, compare)
+            expected = legacy_rows_from_response(response, DIMENSIONS, METRICS, compare)
+            if rows_from_response(response, DIMENSIONS, METRICS, compare) != expected:
+                print(f"MISMATCH for {n} rows (compare={compare})")
+                return 1
+
+            variants = [
+                ("legacy proto-plus", lambda: legacy_rows_from_response(response, DIMENSIONS, METRICS, compare)),
+                ("raw protobuf", lambda: rows_from_response(response, DIMENSIONS, METRICS, compare)),
+                ("raw protobuf, typed", lambda: rows_from_response(response, DIMENSIONS, METRICS, compare, typed=True)),
+            ]
+            label = f"{n:,} rows{' + compare' if compare else ''}"
+            baseline = None
+            for name, fn in variants:
+                best, median = best_of(fn, args.repeat)
+                baseline = baseline or best
+                print(f"{label:<22} {name:<20} best {best * 1000:8.1f} ms  median {median * 1000:8.1f} ms  x{baseline / best:4.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
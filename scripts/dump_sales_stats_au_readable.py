@@ -4,6 +4,10 @@ Dump Sales-stats-equivalent GA4 data to a UTF-8 text file.
 Run from project root:
   python scripts/dump_sales_stats_au_readable.py              # Australia only (default)
   python scripts/dump_sales_stats_au_readable.py --all-locations   # no country filter
+  python scripts/dump_sales_stats_au_readable.py --both-scopes     # both files from one run
+
+With --both-scopes, sources, pages and cities are fetched once per month with scopes=au,all
+(one country-split report serves both files) instead of re-running every section.
 """
 from __future__ import annotations
 
@@ -18,9 +22,24 @@ sys.path.insert(0, _root)
 
 from fastapi.testclient import TestClient
 from api.index import app
+from utils.ga4_utils import fetch_monthly_series
 
 YEAR = 2026
 MONTHS = [1, 2, 3, 4]
+OUT_NAMES = {
+    "au": "sales_stats_au_jan_apr_2026_readable.txt",
+    "all": "sales_stats_all_jan_apr_2026_readable.txt",
+}
+CAPITALS = [
+    "Sydney",
+    "Melbourne",
+    "Brisbane",
+    "Adelaide",
+    "Perth",
+    "Hobart",
+    "Canberra",
+    "Darwin",
+]
 
 
 def month_range(y: int, m: int) -> tuple[str, str]:
@@ -54,6 +73,17 @@ def fnum(x: Any) -> float:
         return 0.0
 
 
+def scope_params(scope: str) -> dict:
+    return {"au_only": "true"} if scope == "au" else {}
+
+
+def scoped(res: dict, scope: str) -> dict:
+    """One scope's slice of a scopes=… response, in the single-scope response shape."""
+    if not res.get("success"):
+        return res
+    return {"success": True, "data": (res.get("data") or {}).get(scope)}
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Dump Sales-stats-equivalent GA4 data.")
     parser.add_argument(
@@ -61,12 +91,17 @@ def main() -> None:
         action="store_true",
         help="All locations (do not pass au_only; matches Sales stats with Australia only OFF).",
     )
+    parser.add_argument(
+        "--both-scopes",
+        action="store_true",
+        help="Write the Australia-only and all-locations files from one run.",
+    )
     args = parser.parse_args()
-    au_only = not args.all_locations
-    scope_params = {"au_only": "true"} if au_only else {}
-    scope_tag = "au_only=true" if au_only else "all_locations (au_only off)"
-    out_name = "sales_stats_au_jan_apr_2026_readable.txt" if au_only else "sales_stats_all_jan_apr_2026_readable.txt"
-    out_path = os.path.join(_root, out_name)
+    if args.both_scopes:
+        scopes = ["au", "all"]
+    else:
+        scopes = ["all"] if args.all_locations else ["au"]
+    scopes_param = {"scopes": ",".join(scopes)}
 
     c = TestClient(app)
 
@@ -75,114 +110,141 @@ def main() -> None:
     paths = oar_data.get("featuredPathContains") or {}
     titles = oar_data.get("featuredTitles") or {}
 
-    lines: list[str] = []
-    title_scope = "Australia only (GA4)" if au_only else "All locations (GA4, no country filter)"
-    lines.append(f"Tenacious Stats — Sales stats dump ({title_scope})")
-    lines.append(f"Year {YEAR}, months: {', '.join(calendar.month_name[m] for m in MONTHS)}")
-    tab_note = "Australia only ON" if au_only else "Australia only OFF"
-    lines.append(f"Generated via API (same endpoints as Sales stats tab; {tab_note}).")
-    lines.append("")
+    lines: dict[str, list[str]] = {}
+    for scope in scopes:
+        au_only = scope == "au"
+        title_scope = "Australia only (GA4)" if au_only else "All locations (GA4, no country filter)"
+        tab_note = "Australia only ON" if au_only else "Australia only OFF"
+        lines[scope] = [
+            f"Tenacious Stats — Sales stats dump ({title_scope})",
+            f"Year {YEAR}, months: {', '.join(calendar.month_name[m] for m in MONTHS)}",
+            f"Generated via API (same endpoints as Sales stats tab; {tab_note}).",
+            "",
+        ]
+
+    # At-a-glance metrics for every month from one yearMonth report (not one overview call per month)
+    overview_by_month: dict[str, dict] = {}
+    for scope in scopes:
+        try:
+            series = fetch_monthly_series(
+                YEAR, MONTHS, ["sessions", "totalUsers", "screenPageViews", "engagementRate"], au_only=scope == "au"
+            )
+            overview_by_month[scope] = {row["month"]: {"success": True, "data": row} for row in series}
+        except Exception as e:
+            overview_by_month[scope] = {m: {"success": False, "error": str(e)} for m in MONTHS}
+
+    # Buy-online clicks for every month from one eventName x yearMonth report (not a top-50 scan per month)
+    first_sd, _ = month_range(YEAR, MONTHS[0])
+    _, last_ed = month_range(YEAR, MONTHS[-1])
+    buy_by_month: dict[str, dict] = {}
+    for scope in scopes:
+        buy_res = c.get(
+            "/api/analytics/event-counts",
+            params={"start_date": first_sd, "end_date": last_ed, "names": "click_buy_online", "group": "yearMonth",
+                    **scope_params(scope)},
+        ).json()
+        buy_by_month[scope] = (
+            (buy_res["data"][0].get("byMonth") or {}) if buy_res.get("success") and buy_res.get("data") else {}
+        )
 
     for m in MONTHS:
         sd, ed = month_range(YEAR, m)
         slug, title = resolve_oar_slug(paths, titles, YEAR, m)
-        params = {"start_date": sd, "end_date": ed, **scope_params}
-
-        ov = c.get("/api/analytics/overview", params=params).json()
-        src = c.get("/api/analytics/sources", params={**params, "limit": 15}).json()
-        pgs = c.get("/api/analytics/pages", params={**params, "limit": 100}).json()
-        cts = c.get("/api/analytics/cities", params={**params, "limit": 50}).json()
-        evs = c.get("/api/analytics/events", params={**params, "limit": 50}).json()
+        params = {"start_date": sd, "end_date": ed}
+
+        # One call per section covers every scope (additive sections share one country-split report)
+        src_all = c.get("/api/analytics/sources", params={**params, **scopes_param, "limit": 15}).json()
+        pgs_all = c.get("/api/analytics/pages", params={**params, **scopes_param, "limit": 100}).json()
+        cts_all = c.get("/api/analytics/cities", params={**params, **scopes_param, "limit": 50}).json()
+
+        for scope in scopes:
+            out = lines[scope]
+            scope_tag = "au_only=true" if scope == "au" else "all_locations (au_only off)"
+            ov = overview_by_month[scope].get(m) or {}
+            src = scoped(src_all, scope)
+            pgs = scoped(pgs_all, scope)
+            cts = scoped(cts_all, scope)
+
+            path_views = {}
+            if slug:
+                path_views = c.get(
+                    "/api/analytics/path-views-total",
+                    params={**params, **scope_params(scope), "path": slug, "match": "contains"},
+                ).json()
+
+            render_month(out, m, sd, ed, scope_tag, ov, slug, title, path_views,
+                         int(buy_by_month[scope].get(f"{YEAR}{m:02d}", 0)), src, pgs, cts)
+
+    for scope in scopes:
+        out_path = os.path.join(_root, OUT_NAMES[scope])
+        text = "\n".join(lines[scope]) + "\n"
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+        print(text)
+        print(f"Wrote: {out_path}")
+
+
+def render_month(lines: list, m: int, sd: str, ed: str, scope_tag: str, ov: dict, slug: str, title: str,
+                 path_views: dict, buy: int, src: dict, pgs: dict, cts: dict) -> None:
+    name = calendar.month_name[m]
+    lines.append("=" * 72)
+    lines.append(f"{name} {YEAR}  ({sd} .. {ed})  [{scope_tag}]")
+    lines.append("=" * 72)
+
+    if ov.get("success") and ov.get("data"):
+        d = ov["data"]
+        er = fnum(d.get("engagementRate"))
+        er_pct = er * 100 if 0 <= er <= 1 else er
+        lines.append("At a glance:")
+        lines.append(f"  Sessions:        {int(fnum(d.get('sessions'))):,}")
+        lines.append(f"  Users:           {int(fnum(d.get('totalUsers'))):,}")
+        lines.append(f"  Page views:      {int(fnum(d.get('screenPageViews'))):,}")
+        lines.append(f"  Engagement rate: {er_pct:.1f}%")
+        lines.append("")
+    else:
+        lines.append(f"Overview error: {ov}")
+        lines.append("")
 
-        path_views = {}
-        if slug:
-            pv = c.get(
-                "/api/analytics/path-views-total",
-                params={**params, "path": slug, "match": "contains"},
-            ).json()
-            path_views = pv
-
-        name = calendar.month_name[m]
-        lines.append("=" * 72)
-        lines.append(f"{name} {YEAR}  ({sd} .. {ed})  [{scope_tag}]")
-        lines.append("=" * 72)
-
-        if ov.get("success") and ov.get("data"):
-            d = ov["data"]
-            er = fnum(d.get("engagementRate"))
-            er_pct = er * 100 if 0 <= er <= 1 else er
-            lines.append("At a glance:")
-            lines.append(f"  Sessions:        {int(fnum(d.get('sessions'))):,}")
-            lines.append(f"  Users:           {int(fnum(d.get('totalUsers'))):,}")
-            lines.append(f"  Page views:      {int(fnum(d.get('screenPageViews'))):,}")
-            lines.append(f"  Engagement rate: {er_pct:.1f}%")
-            lines.append("")
+    lines.append(f"On a Roll (RSS slug for month, path-views contains '{slug or '(none)'}'):")
+    if slug:
+        lines.append(f"  Title: {title or '—'}")
+        if path_views.get("success"):
+            lines.append(f"  Screen page views (contains): {path_views.get('data', {}).get('screenPageViews', '—')}")
         else:
-            lines.append(f"Overview error: {ov}")
-            lines.append("")
+            lines.append(f"  path-views response: {path_views}")
+    else:
+        lines.append("  (no slug from RSS for this month after lookback)")
+    lines.append("")
 
-        lines.append(f"On a Roll (RSS slug for month, path-views contains '{slug or '(none)'}'):")
-        if slug:
-            lines.append(f"  Title: {title or '—'}")
-            if path_views.get("success"):
-                lines.append(f"  Screen page views (contains): {path_views.get('data', {}).get('screenPageViews', '—')}")
-            else:
-                lines.append(f"  path-views response: {path_views}")
-        else:
-            lines.append("  (no slug from RSS for this month after lookback)")
+    lines.append(f"Buy online clicks (event click_buy_online): {buy}")
+    lines.append("")
+
+    if src.get("success") and src.get("data"):
+        total = sum(fnum(r.get("sessions")) for r in src["data"])
+        lines.append("Top channels (share of month sessions in this top-15 list):")
+        for r in src["data"][:8]:
+            s = fnum(r.get("sessions"))
+            pct = (100.0 * s / total) if total else 0.0
+            ch = r.get("sessionSourceMedium") or "(not set)"
+            lines.append(f"  {s:,.0f}  ({pct:4.1f}%)  {ch}")
         lines.append("")
 
-        buy = 0
-        if evs.get("success") and evs.get("data"):
-            for row in evs["data"]:
-                if (row.get("eventName") or "") == "click_buy_online":
-                    buy = int(fnum(row.get("eventCount")))
-                    break
-        lines.append(f"Buy online clicks (event click_buy_online): {buy}")
+    if pgs.get("success") and pgs.get("data"):
+        lines.append("Top pages by screen views (up to 10):")
+        for i, r in enumerate(pgs["data"][:10], 1):
+            v = int(fnum(r.get("screenPageViews")))
+            pt = (r.get("pageTitle") or "")[:60]
+            pp = r.get("pagePath") or ""
+            lines.append(f"  {i:2}. {v:5d}  {pt}  |  {pp}")
         lines.append("")
 
-        if src.get("success") and src.get("data"):
-            total = sum(fnum(r.get("sessions")) for r in src["data"])
-            lines.append("Top channels (share of month sessions in this top-15 list):")
-            for r in src["data"][:8]:
-                s = fnum(r.get("sessions"))
-                pct = (100.0 * s / total) if total else 0.0
-                ch = r.get("sessionSourceMedium") or "(not set)"
-                lines.append(f"  {s:,.0f}  ({pct:4.1f}%)  {ch}")
-            lines.append("")
-
-        if pgs.get("success") and pgs.get("data"):
-            lines.append("Top pages by screen views (up to 10):")
-            for i, r in enumerate(pgs["data"][:10], 1):
-                v = int(fnum(r.get("screenPageViews")))
-                pt = (r.get("pageTitle") or "")[:60]
-                pp = r.get("pagePath") or ""
-                lines.append(f"  {i:2}. {v:5d}  {pt}  |  {pp}")
-            lines.append("")
-
-        capitals = [
-            "Sydney",
-            "Melbourne",
-            "Brisbane",
-            "Adelaide",
-            "Perth",
-            "Hobart",
-            "Canberra",
-            "Darwin",
-        ]
-        if cts.get("success") and cts.get("data"):
-            by_city = {r.get("city"): int(fnum(r.get("sessions"))) for r in cts["data"]}
-            lines.append("Australian capitals (sessions, if present in city breakdown):")
-            for city in capitals:
-                lines.append(f"  {city}: {by_city.get(city, 0):,}")
-            lines.append("")
-
-    text = "\n".join(lines) + "\n"
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(text)
-
-    print(text)
-    print(f"Wrote: {out_path}")
+    if cts.get("success") and cts.get("data"):
+        by_city = {r.get("city"): int(fnum(r.get("sessions"))) for r in cts["data"]}
+        lines.append("Australian capitals (sessions, if present in city breakdown):")
+        for city in CAPITALS:
+            lines.append(f"  {city}: {by_city.get(city, 0):,}")
+        lines.append("")
 
 
 if __name__ == "__main__":
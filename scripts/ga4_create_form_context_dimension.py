@@ -32,17 +32,22 @@ from google.analytics.admin_v1beta import AnalyticsAdminServiceClient
 from google.analytics.admin_v1beta.types import CustomDimension
 from google.api_core import exceptions as gexc
 
-from utils.ga4_utils import PROPERTY_ID, setup_credentials
+from utils.ga4_utils import PROPERTY_ID, get_ga4_credentials
 
 PARAM_NAME = "form_context"
 DISPLAY_NAME = "Form context"
 DESCRIPTION = "CF7 generate_lead: contact page vs product enquire."
+# Creating custom dimensions needs edit scope (the shared Data API credentials are read-only).
+ADMIN_SCOPES = ["https://www.googleapis.com/auth/analytics.edit"]
 
 
 def main() -> int:
-    setup_credentials()
+    creds = get_ga4_credentials()
     parent = f"properties/{PROPERTY_ID}"
-    client = AnalyticsAdminServiceClient()
+    if creds is not None:
+        client = AnalyticsAdminServiceClient(credentials=creds.with_scopes(ADMIN_SCOPES))
+    else:
+        client = AnalyticsAdminServiceClient()
 
     for dim in client.list_custom_dimensions(parent=parent):
         if getattr(dim, "parameter_name", None) == PARAM_NAME:
@@ -0,0 +1,122 @@
+"""
+Prewarm the SQLite GA4 report store with the Sales stats (Jan–Apr tab) queries for a year.
+
+Each month selection is loaded the way the tab loads it: one GET /api/analytics/simple-range
+with the same months and featured On a Roll slugs (RSS plus public/data/on_a_roll.json
+overrides), through the API app in-process, so the stored keys are the ones the dashboard
+will ask for. Selections whose range is not closed yet are skipped (open ranges are never
+persisted). The default selections are the tab's month presets.
+
+Run from project root:
+  python scripts/prewarm_report_store.py --year 2025
+  python scripts/prewarm_report_store.py --year 2026 --months 1-3 --store .cache/ga4_reports.sqlite
+  python scripts/prewarm_report_store.py --year 2025 --months 1,2,3,4 --months 7-12 --scope au   # au | all | both
+"""
+from __future__ import annotations
+
+import argparse
+import calendar
+import json
+import os
+import sys
+import time
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _root)
+
+from fastapi.testclient import TestClient
+from google.analytics.data_v1beta.types import DateRange
+
+from api.index import app
+from utils.report_cache import is_closed_range
+from utils.report_store import report_store_stats
+from utils.simple_stats import resolve_oar_featured
+
+DEFAULT_STORE = os.path.join(_root, ".cache", "ga4_reports.sqlite")
+OAR_OVERRIDES = os.path.join(_root, "public", "data", "on_a_roll.json")
+# The tab's month presets (Jan–Apr, H1, H2, full year)
+DEFAULT_SELECTIONS = ["1-4", "1-6", "7-12", "1-12"]
+
+
+def parse_months(raw: str) -> list[int]:
+    """'1,2,3' or '1-4' (or a mix) -> sorted unique months."""
+    months = set()
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        months.update(range(int(lo), int(hi or lo) + 1))
+    bad = sorted(m for m in months if not 1 <= m <= 12)
+    if bad or not months:
+        raise argparse.ArgumentTypeError(f"months must be 1–12, got {raw!r}")
+    return sorted(months)
+
+
+def oar_config(c: TestClient) -> tuple[dict, dict]:
+    """(featuredPathContains, featuredTitles) as the tab builds them: RSS, then on_a_roll.json overrides."""
+    overrides = {}
+    if os.path.exists(OAR_OVERRIDES):
+        with open(OAR_OVERRIDES, encoding="utf-8") as f:
+            overrides = json.load(f) or {}
+    paths = dict(overrides.get("featuredPathContains") or {})
+    titles = dict(overrides.get("featuredTitles") or {})
+    if overrides.get("useRss") is not False:
+        params = {"feed_url": overrides["rssFeedUrl"]} if overrides.get("rssFeedUrl") else {}
+        rss = c.get("/api/on-a-roll-slugs", params=params).json()
+        if rss.get("success"):
+            data = rss.get("data") or {}
+            paths = {**(data.get("featuredPathContains") or {}), **paths}
+            titles = {**(data.get("featuredTitles") or {}), **titles}
+    return paths, titles
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Prewarm the GA4 report store for closed month selections.")
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument(
+        "--months", type=parse_months, action="append",
+        help=f"a month selection, e.g. 1,2,3 or 1-4; repeatable (default: {' '.join(DEFAULT_SELECTIONS)})",
+    )
+    parser.add_argument("--scope", choices=("au", "all", "both"), default="both")
+    parser.add_argument(
+        "--store",
+        default=os.environ.get("GA4_REPORT_STORE_PATH") or DEFAULT_STORE,
+        help=f"SQLite path (default: GA4_REPORT_STORE_PATH or {DEFAULT_STORE})",
+    )
+    args = parser.parse_args()
+    selections = args.months or [parse_months(s) for s in DEFAULT_SELECTIONS]
+
+    os.environ["GA4_REPORT_STORE_PATH"] = args.store
+
+    c = TestClient(app)
+    paths, titles = oar_config(c)
+
+    scopes = {"au": [True], "all": [False], "both": [True, False]}[args.scope]
+    started = time.perf_counter()
+    failures = 0
+    for months in selections:
+        sd = f"{args.year}-{months[0]:02d}-01"
+        ed = f"{args.year}-{months[-1]:02d}-{calendar.monthrange(args.year, months[-1])[1]:02d}"
+        if not is_closed_range([DateRange(start_date=sd, end_date=ed)]):
+            print(f"skip {sd}..{ed}: range not closed yet")
+            continue
+        featured = ",".join(resolve_oar_featured(paths, titles, args.year, m)["slug"] for m in months)
+        for au_only in scopes:
+            params = {"year": args.year, "months": ",".join(map(str, months)), "featured": featured}
+            if au_only:
+                params["au_only"] = "true"
+            resp = c.get("/api/analytics/simple-range", params=params)
+            if resp.status_code != 200:
+                failures += 1
+                print(f"  FAIL {params}: HTTP {resp.status_code} {resp.text[:200]}")
+                continue
+            print(f"ok {sd}..{ed} ({'au_only' if au_only else 'all locations'})")
+
+    stats = report_store_stats()
+    print(f"Store: {stats.get('path')} · {stats.get('entries')} entries · {time.perf_counter() - started:.1f}s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,70 @@
+"""
+Incrementally sync the local GA4 fact store (daily-grain facts for the dashboard dimensions).
+
+Only days that are missing, or were synced while GA4 was still settling them, are fetched,
+so a nightly run costs a handful of small reports. With GA4_FACT_STORE_PATH set on the API,
+additive reports (sources, cities, countries, devices, top events, page views) over synced
+days are answered from the store instead of GA4.
+
+Run from project root:
+  python scripts/sync_fact_store.py                                 # last 400 days, all facts, au + all
+  python scripts/sync_fact_store.py --start 2025-01-01 --end 2025-12-31 --facts city,eventName
+  python scripts/sync_fact_store.py --scope au --store .cache/ga4_facts.sqlite
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _root)
+
+from utils.fact_store import FACT_SETS, fact_store_stats
+from utils.ga4_utils import sync_fact_store
+from utils.report_cache import property_today
+
+DEFAULT_STORE = os.path.join(_root, ".cache", "ga4_facts.sqlite")
+
+
+def parse_facts(raw: str) -> list[str]:
+    facts = [x.strip() for x in raw.split(",") if x.strip()]
+    bad = [f for f in facts if f not in FACT_SETS]
+    if bad:
+        raise argparse.ArgumentTypeError(f"unknown facts {bad}; choose from {', '.join(FACT_SETS)}")
+    return facts
+
+
+def main() -> int:
+    yesterday = property_today() - timedelta(days=1)
+    parser = argparse.ArgumentParser(description="Sync daily GA4 facts into the local fact store.")
+    parser.add_argument("--start", type=date.fromisoformat, default=yesterday - timedelta(days=399))
+    parser.add_argument("--end", type=date.fromisoformat, default=yesterday)
+    parser.add_argument("--facts", type=parse_facts, default=list(FACT_SETS), help=f"comma-separated: {', '.join(FACT_SETS)}")
+    parser.add_argument("--scope", choices=("au", "all", "both"), default="both")
+    parser.add_argument(
+        "--store",
+        default=os.environ.get("GA4_FACT_STORE_PATH") or DEFAULT_STORE,
+        help=f"SQLite path (default: GA4_FACT_STORE_PATH or {DEFAULT_STORE})",
+    )
+    args = parser.parse_args()
+    if args.start > args.end:
+        parser.error("--start must not be after --end")
+
+    os.environ["GA4_FACT_STORE_PATH"] = args.store
+    scopes = {"au": ("au",), "all": ("all",), "both": ("all", "au")}[args.scope]
+
+    started = time.perf_counter()
+    for item in sync_fact_store(args.start, args.end, facts=args.facts, scopes=scopes):
+        status = f"{item['days']} days, {item['rows']} rows" if item["days"] else "up to date"
+        print(f"{item['fact']:<20} {item['scope']:<4} {status}")
+
+    stats = fact_store_stats()
+    print(f"Store: {stats.get('path')} · {stats.get('facts')} facts · {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
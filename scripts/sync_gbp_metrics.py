@@ -0,0 +1,62 @@
+"""
+Incrementally sync the local GBP daily metrics store (Performance API, per location and day).
+
+Only days that are missing, or still settling and not synced recently, are fetched (one
+fetchMultiDailyMetricsTimeSeries call). With GBP_METRICS_STORE_PATH set on the API, insights
+for synced days (any range, any compare) are summed from the store.
+
+Run from project root:
+  python scripts/sync_gbp_metrics.py                                # last 540 days
+  python scripts/sync_gbp_metrics.py --start 2025-01-01 --end 2025-12-31
+  python scripts/sync_gbp_metrics.py --store .cache/gbp_metrics.sqlite
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _root)
+
+from utils.gbp_store import location_today
+
+DEFAULT_STORE = os.path.join(_root, ".cache", "gbp_metrics.sqlite")
+
+
+def main() -> int:
+    yesterday = location_today() - timedelta(days=1)
+    parser = argparse.ArgumentParser(description="Sync daily GBP performance metrics into the local store.")
+    parser.add_argument("--start", type=date.fromisoformat, default=yesterday - timedelta(days=539))
+    parser.add_argument("--end", type=date.fromisoformat, default=yesterday)
+    parser.add_argument(
+        "--store",
+        default=os.environ.get("GBP_METRICS_STORE_PATH") or DEFAULT_STORE,
+        help=f"SQLite path (default: GBP_METRICS_STORE_PATH or {DEFAULT_STORE})",
+    )
+    args = parser.parse_args()
+    if args.start > args.end:
+        parser.error("--start must not be after --end")
+
+    os.environ["GBP_METRICS_STORE_PATH"] = args.store
+    import api.gbp as gbp
+    from utils.gbp_store import gbp_metrics_store_stats
+
+    started = time.perf_counter()
+    result = gbp.get_insights(args.start.isoformat(), args.end.isoformat())
+    if "error" in result:
+        print(f"GBP error: {result['error']}")
+        return 1
+
+    stats = gbp_metrics_store_stats()
+    for item in stats.get("synced", []):
+        print(f"{item['location']}: {item['days']} days ({item['from']} – {item['to']}), {item['finalDays']} final")
+    print(f"Store: {stats.get('path')} · {stats.get('values')} values · "
+          f"{stats.get('daysFetched')} days fetched · {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,9 @@
+"""
+Run from project root:
+  python -m pytest -q
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,77 @@
+import copy
+
+import pytest
+from fastapi.testclient import TestClient
+from google.analytics.data_v1beta.types import MetricType, RunReportResponse
+
+from api.index import CITY_FILTER_LIMIT, app
+from utils import ga4_async, ga4_utils
+from utils.ga4_utils import analytics_dimension_filter
+from utils.report_cache import report_cache
+
+
+class _GA4:
+    """city (× yearMonth) rows for the cities in the request's in-list filter (Sydney otherwise)."""
+
+    def __init__(self):
+        self.requests = []
+
+    def run_report(self, request):
+        self.requests.append(copy.deepcopy(request))
+        dims = [d.name for d in request.dimensions]
+        expr = request.dimension_filter
+        in_list = next((e.filter for e in [expr, *expr.and_group.expressions] if e.filter.field_name == "city"), None)
+        cities = list(in_list.in_list_filter.values) if in_list else ["Sydney"]
+        rows = [([city, "202501"][:len(dims)], str(i + 1)) for i, city in enumerate(cities)]
+        return RunReportResponse(
+            dimension_headers=[{"name": d} for d in dims],
+            metric_headers=[{"name": "sessions", "type_": MetricType.TYPE_INTEGER}],
+            rows=[{"dimension_values": [{"value": v} for v in values], "metric_values": [{"value": value}]}
+                  for values, value in rows],
+            row_count=len(rows),
+        )
+
+
+class _AsyncGA4:
+    def __init__(self, fake):
+        self._fake = fake
+
+    async def run_report(self, request):
+        return self._fake.run_report(request)
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    monkeypatch.setattr(ga4_utils, "_credentials", None)
+    monkeypatch.setattr(ga4_utils, "_credentials_source", "test")
+    monkeypatch.setattr(ga4_async, "BetaAnalyticsDataAsyncClient", lambda **kwargs: _AsyncGA4(fake))
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def test_city_filter_combines_with_the_au_filter():
+    assert analytics_dimension_filter() is None
+    only = analytics_dimension_filter(cities=["Sydney", " "])
+    assert (only.filter.field_name, list(only.filter.in_list_filter.values)) == ("city", ["Sydney"])
+    both = analytics_dimension_filter(au_only=True, cities=["Perth"])
+    assert [e.filter.field_name for e in both.and_group.expressions] == ["country", "city"]
+
+
+def test_cities_route_filters_server_side_without_the_limit(ga4):
+    client = TestClient(app)
+    params = {"start_date": "2025-01-01", "end_date": "2025-01-31", "limit": 1}
+    data = client.get("/api/analytics/cities", params={**params, "cities": "Hobart, Darwin", "au_only": "true"}).json()["data"]
+    assert data == [{"city": "Hobart", "sessions": "1"}, {"city": "Darwin", "sessions": "2"}]
+    assert ga4.requests[0].limit == CITY_FILTER_LIMIT
+
+    data = client.get("/api/analytics/cities", params={**params, "cities": "Hobart", "group": "yearMonth"}).json()["data"]
+    assert data == [{"city": "Hobart", "yearMonth": "202501", "sessions": "1"}]
+
+    data = client.get("/api/analytics/cities", params=params).json()["data"]
+    assert data == [{"city": "Sydney", "sessions": "1"}] and ga4.requests[-1].limit == 1
+
+    assert client.get("/api/analytics/cities", params={**params, "group": "month"}).status_code == 400
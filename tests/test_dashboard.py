@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from api import index
+from api.index import app
+
+PARAMS = {"start_date": "2025-01-01", "end_date": "2025-01-31"}
+
+
+async def _fast(q):
+    return {"success": True, "data": [q["start_date"]]}
+
+
+async def _slow(q):
+    await asyncio.sleep(1)
+    return {"success": True, "data": []}
+
+
+async def _broken(q):
+    raise HTTPException(status_code=500, detail="GA4 Error: boom")
+
+
+@pytest.fixture
+def sections(monkeypatch):
+    """overview is fast, sources fails, pages is slow (0.05 s deadline); gbpInsights is not deployed."""
+    table = {"overview": (_fast, 5), "sources": (_broken, 5), "pages": (_slow, 0.05)}
+    monkeypatch.setattr(index, "DASHBOARD_SECTIONS", table)
+    return table
+
+
+def test_each_section_has_its_own_deadline(sections):
+    body = TestClient(app).get("/api/dashboard", params={**PARAMS, "sections": "overview,sources,pages,gbpInsights"}).json()
+    assert body["success"] is True and body["complete"] is False
+    assert body["data"] == {"overview": {"success": True, "data": ["2025-01-01"]}, "sources": None, "pages": None, "gbpInsights": None}
+    status = {name: info["status"] for name, info in body["status"].items()}
+    assert status == {"overview": "ok", "sources": "error", "pages": "timeout", "gbpInsights": "unavailable"}
+    assert body["status"]["sources"]["error"] == "GA4 Error: boom"
+    assert body["status"]["pages"]["ms"] < 1000
+
+
+def test_timeout_param_overrides_the_section_deadline(sections):
+    body = TestClient(app).get("/api/dashboard", params={**PARAMS, "sections": "overview", "timeout": 0.5}).json()
+    assert body["complete"] is True and body["status"]["overview"]["status"] == "ok"
+    body = TestClient(app).get("/api/dashboard", params={**PARAMS, "sections": "pages", "timeout": 0.01}).json()
+    assert body["status"]["pages"]["error"] == "no response within 0.01s"
+
+
+def test_a_timed_out_section_keeps_running(monkeypatch):
+    finished = []
+
+    async def slow(q):
+        await asyncio.sleep(0.05)
+        finished.append(q["start_date"])
+
+    monkeypatch.setattr(index, "DASHBOARD_SECTIONS", {"pages": (slow, 0.01)})
+
+    async def run():
+        result = await index._run_dashboard_section("pages", {"start_date": "2025-01-01"}, None)
+        await asyncio.sleep(0.1)
+        return result
+
+    name, data, info = asyncio.run(run())
+    assert (name, data, info["status"]) == ("pages", None, "timeout")
+    assert finished == ["2025-01-01"]
+
+
+def test_dashboard_rejects_unknown_sections_and_bad_timeouts(sections):
+    client = TestClient(app)
+    assert client.get("/api/dashboard", params={**PARAMS, "sections": "overview,weather"}).status_code == 400
+    assert client.get("/api/dashboard", params={**PARAMS, "timeout": 0}).status_code == 400
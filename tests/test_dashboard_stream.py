@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import index
+from api.index import app
+
+PARAMS = {"start_date": "2025-01-01", "end_date": "2025-01-31"}
+
+
+def _section(delay, payload=None):
+    async def call(q):
+        await asyncio.sleep(delay)
+        if payload is None:
+            raise ValueError("upstream failed")
+        return payload
+
+    return call
+
+
+@pytest.fixture
+def sections(monkeypatch):
+    """pages answers first, overview second, sources fails, devices misses its deadline."""
+    monkeypatch.setattr(index, "DASHBOARD_SECTIONS", {
+        "overview": (_section(0.05, {"success": True, "data": {"sessions": "1"}}), 5),
+        "pages": (_section(0, {"success": True, "data": []}), 5),
+        "sources": (_section(0.02), 5),
+        "devices": (_section(1, {}), 0.1),
+    })
+
+
+def _events(text):
+    out = []
+    for block in text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        out.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return out
+
+
+def test_sections_stream_in_completion_order_then_complete(sections):
+    res = TestClient(app).get("/api/dashboard/stream", params={**PARAMS, "sections": "overview,sources,pages,devices"})
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/event-stream")
+    assert res.headers["cache-control"] == "no-cache"
+
+    events = _events(res.text)
+    assert [e for e, _ in events] == ["section"] * 4 + ["complete"]
+    assert [(p["name"], p["status"]) for _, p in events[:4]] == [
+        ("pages", "ok"), ("sources", "error"), ("overview", "ok"), ("devices", "timeout"),
+    ]
+    assert events[2][1]["data"] == {"success": True, "data": {"sessions": "1"}}
+    assert events[1][1]["error"] == "upstream failed"
+
+    complete = events[-1][1]
+    assert complete["complete"] is False
+    assert list(complete["status"]) == ["overview", "sources", "pages", "devices"]
+
+
+def test_stream_validates_before_streaming(sections):
+    client = TestClient(app)
+    assert client.get("/api/dashboard/stream", params={**PARAMS, "sections": "weather"}).status_code == 400
+    assert client.get("/api/dashboard/stream", params={**PARAMS, "timeout": -1}).status_code == 400
@@ -0,0 +1,108 @@
+import copy
+
+import pytest
+from fastapi.testclient import TestClient
+from google.analytics.data_v1beta.types import MetricType, RunReportResponse
+
+from api.index import app
+from utils import ga4_async, ga4_utils
+from utils.ga4_utils import event_names, fetch_event_counts
+from utils.report_cache import report_cache
+
+# (eventName, yearMonth, eventCount)
+EVENTS = [("click_buy_online", "202501", 3), ("click_buy_online", "202502", 4), ("Generate_Lead", "202502", 2)]
+
+
+class _GA4:
+    """eventName (× yearMonth) rows from EVENTS; the form_context report has one row or fails when `lead_error` is set."""
+
+    def __init__(self):
+        self.requests = []
+        self.lead_error = None
+
+    def run_report(self, request):
+        self.requests.append(copy.deepcopy(request))
+        dims = [d.name for d in request.dimensions]
+        if dims == ["customEvent:form_context"]:
+            if self.lead_error:
+                raise self.lead_error
+            rows = [(["contact"], 5)]
+        else:
+            rows = [([name, ym][:len(dims)], count) for name, ym, count in EVENTS]
+        return RunReportResponse(
+            dimension_headers=[{"name": d} for d in dims],
+            metric_headers=[{"name": "eventCount", "type_": MetricType.TYPE_INTEGER}],
+            rows=[{"dimension_values": [{"value": v} for v in values], "metric_values": [{"value": str(count)}]}
+                  for values, count in rows],
+            row_count=len(rows),
+        )
+
+
+class _AsyncGA4:
+    def __init__(self, fake):
+        self._fake = fake
+
+    async def run_report(self, request):
+        return self._fake.run_report(request)
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    monkeypatch.setattr(ga4_utils, "_credentials", None)
+    monkeypatch.setattr(ga4_utils, "_credentials_source", "test")
+    monkeypatch.setattr(ga4_async, "BetaAnalyticsDataAsyncClient", lambda **kwargs: _AsyncGA4(fake))
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def test_event_names_drop_blanks_and_case_duplicates():
+    assert event_names([" click_buy_online ", "", "CLICK_BUY_ONLINE", "generate_lead"]) == ["click_buy_online", "generate_lead"]
+
+
+def test_named_events_come_from_one_filtered_report(ga4):
+    counts = fetch_event_counts("2025-01-01", "2025-02-28", ["generate_lead", "click_buy_online", "purchase"], by_month=True)
+    assert counts == [
+        {"eventName": "generate_lead", "eventCount": 2, "byMonth": {"202502": 2}},
+        {"eventName": "click_buy_online", "eventCount": 7, "byMonth": {"202501": 3, "202502": 4}},
+        {"eventName": "purchase", "eventCount": 0, "byMonth": {}},
+    ]
+    (request,) = ga4.requests
+    in_list = request.dimension_filter.filter
+    assert (in_list.field_name, list(in_list.in_list_filter.values)) == ("eventName", ["generate_lead", "click_buy_online", "purchase"])
+
+
+def test_event_counts_route_adds_the_lead_breakdown_only_on_request(ga4):
+    client = TestClient(app)
+    params = {"start_date": "2025-01-01", "end_date": "2025-02-28", "names": "click_buy_online"}
+
+    body = client.get("/api/analytics/event-counts", params=params).json()
+    assert body["data"] == [{"eventName": "click_buy_online", "eventCount": 7}]
+    assert (body["generate_lead_by_context"], body["generate_lead_breakdown_error"]) == (None, None)
+    assert len(ga4.requests) == 1
+
+    body = client.get("/api/analytics/event-counts", params={**params, "lead_breakdown": "true", "group": "yearMonth"}).json()
+    assert body["data"][0]["byMonth"] == {"202501": 3, "202502": 4}
+    assert body["generate_lead_by_context"] == [{"form_context": "contact", "eventCount": "5"}]
+    assert len(ga4.requests) == 3
+
+    assert client.get("/api/analytics/event-counts", params={**params, "names": " , "}).status_code == 400
+    assert client.get("/api/analytics/event-counts", params={**params, "group": "city"}).status_code == 400
+
+
+def test_events_route_keeps_working_when_the_breakdown_fails(ga4):
+    ga4.lead_error = ValueError("form_context is not registered")
+    client = TestClient(app)
+    params = {"start_date": "2025-01-01", "end_date": "2025-02-28"}
+
+    body = client.get("/api/analytics/events", params=params).json()
+    assert body["success"] is True and body["generate_lead_breakdown_error"] is None
+    assert len(ga4.requests) == 1
+
+    body = client.get("/api/analytics/events", params={**params, "lead_breakdown": "true"}).json()
+    assert body["success"] is True
+    assert body["generate_lead_by_context"] is None
+    assert body["generate_lead_breakdown_error"] == "form_context is not registered"
@@ -0,0 +1,140 @@
+import copy
+import threading
+from datetime import date, timedelta
+
+import pytest
+from google.analytics.data_v1beta.types import MetricType, RunReportResponse
+
+from utils import fact_store, ga4_utils
+from utils.fact_store import FactStore, fact_set_for
+from utils.ga4_utils import _ranked_rows, facts_answer, fetch_analytics_data, sync_fact_store
+from utils.report_cache import report_cache
+
+JAN = [date(2024, 1, 1) + timedelta(days=i) for i in range(31)]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = FactStore(str(tmp_path / "facts.sqlite"))
+    monkeypatch.setattr(ga4_utils, "get_fact_store", lambda: store)
+    return store
+
+
+def _country_days(days, au=2.0, nz=1.0):
+    rows = []
+    for d in days:
+        rows.append((d.isoformat(), ("Australia",), {"sessions": au}))
+        rows.append((d.isoformat(), ("New Zealand",), {"sessions": nz}))
+    return rows
+
+
+def test_fact_set_for_needs_matching_dimensions_and_additive_metrics():
+    assert fact_set_for(["country"], ["sessions"]) == "country"
+    assert fact_set_for(["pagePath", "pageTitle"], ["screenPageViews"]) == "pagePath"
+    assert fact_set_for(["country"], ["totalUsers"]) is None
+    assert fact_set_for(["country", "city"], ["sessions"]) is None
+    assert fact_set_for(["country"], []) is None
+
+
+def test_covers_and_totals(store, monkeypatch):
+    store.write_days("country", "all", JAN[:10], _country_days(JAN[:10]))
+    assert store.covers("country", "all", JAN[0], JAN[9])
+    assert not store.covers("country", "all", JAN[0], JAN[10])
+    assert not store.covers("country", "au", JAN[0], JAN[9])
+    assert store.totals("country", "all", JAN[0], JAN[4], ["sessions"]) == {
+        ("Australia",): {"sessions": 10.0}, ("New Zealand",): {"sessions": 5.0},
+    }
+
+    today = date.today()
+    store.write_days("country", "all", [today], [])
+    assert store.covers("country", "all", today, today)
+    assert store.days_to_sync("country", "all", today, today) == [today]
+    monkeypatch.setattr(fact_store, "FACT_STORE_OPEN_MAX_AGE", -1)
+    assert not store.covers("country", "all", today, today)
+
+
+def test_ranked_rows_order_by_first_metric_and_cut_to_limit():
+    current = {("a",): {"sessions": 2.0}, ("b",): {"sessions": 7.5}, ("c",): {"sessions": 2.0}}
+    previous = {("a",): {"sessions": 1.0}, ("d",): {"sessions": 4.0}}
+    assert _ranked_rows(current, previous, ["x"], ["sessions"], 3) == [
+        {"x": "b", "sessions": "7.5"},
+        {"x": "a", "sessions": "2", "sessions_compare": "1"},
+        {"x": "c", "sessions": "2"},
+    ]
+
+
+def test_facts_answer_sums_days_and_filters_values(store):
+    store.write_days("country", "all", JAN, _country_days(JAN))
+    assert facts_answer("2024-01-01", "2024-01-10", ["country"], ["sessions"]) == [
+        {"country": "Australia", "sessions": "20"},
+        {"country": "New Zealand", "sessions": "10"},
+    ]
+    assert facts_answer(
+        "2024-01-11", "2024-01-20", ["country"], ["sessions"], compare_start_date="2024-01-01",
+        compare_end_date="2024-01-05", dimension_values={"country": [" new zealand"]},
+    ) == [{"country": "New Zealand", "sessions": "10", "sessions_compare": "5"}]
+    assert store.local_answers == 2
+
+
+def test_facts_answer_declines_what_it_cannot_answer(store):
+    store.write_days("country", "all", JAN[:10], _country_days(JAN[:10]))
+    assert facts_answer("2024-01-01", "2024-01-11", ["country"], ["sessions"]) is None
+    assert facts_answer("2024-01-01", "2024-01-10", ["country"], ["sessions"], au_only=True) is None
+    assert facts_answer("2024-01-01", "2024-01-10", ["country"], ["totalUsers"]) is None
+    assert facts_answer("2024-01-10", "2024-01-01", ["country"], ["sessions"]) is None
+    assert facts_answer("2024-01-01", "2024-01-10", ["country"], ["sessions"], dimension_values={"city": ["x"]}) is None
+    assert store.local_answers == 0
+
+
+class _GA4:
+    """date × country report: 3 Australian sessions on every day of the requested range."""
+
+    def __init__(self):
+        self.requests = []
+
+    def run_report(self, request):
+        self.requests.append(copy.deepcopy(request))
+        start = date.fromisoformat(request.date_ranges[0].start_date)
+        end = date.fromisoformat(request.date_ranges[0].end_date)
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        return RunReportResponse(
+            dimension_headers=[{"name": d.name} for d in request.dimensions],
+            metric_headers=[{"name": "sessions", "type_": MetricType.TYPE_INTEGER}],
+            rows=[{"dimension_values": [{"value": d.strftime("%Y%m%d")}, {"value": "Australia"}],
+                   "metric_values": [{"value": "3"}]} for d in days],
+            row_count=len(days),
+        )
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def test_sync_fetches_only_missing_days_then_answers_locally(store, ga4):
+    first = sync_fact_store(date(2024, 1, 1), date(2024, 2, 1), facts=["country"], scopes=("all",))
+    assert first == [{"fact": "country", "scope": "all", "days": 32, "rows": 32}]
+    assert len(ga4.requests) == 2  # one 31-day chunk plus 1 Feb
+
+    again = sync_fact_store(date(2024, 1, 1), date(2024, 2, 1), facts=["country"], scopes=("all",))
+    assert again == [{"fact": "country", "scope": "all", "days": 0, "rows": 0}]
+    assert len(ga4.requests) == 2
+
+    assert fetch_analytics_data("2024-01-01", "2024-01-31", ["country"], ["sessions"]) == [
+        {"country": "Australia", "sessions": "93"},
+    ]
+    assert len(ga4.requests) == 2
+
+
+def test_local_answers_are_counted_from_many_threads(store):
+    threads = [threading.Thread(target=lambda: [store.count_local_answer() for _ in range(500)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.local_answers == 4000
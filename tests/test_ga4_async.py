@@ -0,0 +1,124 @@
+import asyncio
+import copy
+
+import pytest
+from google.analytics.data_v1beta.types import BatchRunReportsResponse, MetricType, RunReportResponse
+
+from utils import ga4_async, ga4_utils
+from utils.ga4_utils import fetch_ga4_batch, fetch_ga4_data
+from utils.report_cache import report_cache
+
+
+def _report(request):
+    """One Sydney row whose sessions value is the request's start month."""
+    return RunReportResponse(
+        dimension_headers=[{"name": "city"}],
+        metric_headers=[{"name": "sessions", "type_": MetricType.TYPE_INTEGER}],
+        rows=[{"dimension_values": [{"value": "Sydney"}], "metric_values": [{"value": request.date_ranges[0].start_date[5:7]}]}],
+        row_count=1,
+    )
+
+
+class _Transport:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class _AsyncGA4:
+    """Async client stand-in; every instance is kept in `clients`."""
+
+    def __init__(self, ga4):
+        self.ga4 = ga4
+        self.transport = _Transport()
+        ga4.clients.append(self)
+
+    async def run_report(self, request):
+        self.ga4.requests.append(copy.deepcopy(request))
+        return _report(request)
+
+    async def batch_run_reports(self, request):
+        self.ga4.batches.append(len(request.requests))
+        return BatchRunReportsResponse(reports=[_report(r) for r in request.requests])
+
+
+class _GA4:
+    def __init__(self):
+        self.requests = []
+        self.batches = []
+        self.clients = []
+
+    def run_report(self, request):
+        self.requests.append(copy.deepcopy(request))
+        return _report(request)
+
+    def batch_run_reports(self, request):
+        self.batches.append(len(request.requests))
+        return BatchRunReportsResponse(reports=[_report(r) for r in request.requests])
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    monkeypatch.setattr(ga4_utils, "_credentials", None)
+    monkeypatch.setattr(ga4_utils, "_credentials_source", "test")
+    monkeypatch.setattr(ga4_utils, "_client_generation", ga4_utils._client_generation)
+    monkeypatch.setattr(ga4_async, "BetaAnalyticsDataAsyncClient", lambda **kwargs: _AsyncGA4(fake))
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def _spec(month):
+    return {"start_date": f"2020-{month:02d}-01", "end_date": f"2020-{month:02d}-28",
+            "dimensions": ["city"], "metrics": ["sessions"]}
+
+
+def test_async_fetch_shares_the_sync_cache(ga4):
+    args = ("2020-01-01", "2020-01-31", ["city"], ["sessions"])
+    rows = asyncio.run(ga4_async.fetch_ga4_data_async(*args))
+    assert rows == fetch_ga4_data(*args) == [{"city": "Sydney", "sessions": "01"}]
+    assert len(ga4.requests) == 1
+
+
+def test_async_analytics_data_applies_the_au_filter(ga4):
+    asyncio.run(ga4_async.fetch_analytics_data_async("2020-01-01", "2020-01-31", ["city"], ["sessions"], au_only=True))
+    asyncio.run(ga4_async.fetch_analytics_data_async("2020-01-01", "2020-01-31", ["city"], ["sessions"]))
+    assert ["dimension_filter" in r for r in ga4.requests] == [True, False]
+
+
+def test_one_client_per_event_loop(ga4):
+    async def twice():
+        first = ga4_async.get_ga4_async_client()
+        assert ga4_async.get_ga4_async_client() is first
+        return first
+
+    first = asyncio.run(twice())
+    second = asyncio.run(twice())
+    assert first is not second and ga4.clients == [first, second]
+
+
+def test_reset_replaces_and_closes_the_loop_client(ga4, monkeypatch):
+    async def run():
+        old = ga4_async.get_ga4_async_client()
+        ga4_utils.reset_ga4_client()
+        monkeypatch.setattr(ga4_utils, "_credentials_source", "test")
+        new = ga4_async.get_ga4_async_client()
+        await asyncio.sleep(0)
+        return old, new
+
+    old, new = asyncio.run(run())
+    assert new is not old
+    assert old.transport.closed and not new.transport.closed
+
+
+def test_async_batch_matches_sync(ga4):
+    specs = [_spec(m) for m in range(1, 8)]
+    results = asyncio.run(ga4_async.fetch_ga4_batch_async(specs))
+    assert sorted(ga4.batches) == [2, 5]
+    assert results == fetch_ga4_batch(specs)
+    assert sorted(ga4.batches) == [2, 5]
@@ -0,0 +1,112 @@
+import copy
+
+import pytest
+from fastapi.testclient import TestClient
+from google.analytics.data_v1beta.types import BatchRunReportsResponse, MetricType, RunReportResponse
+
+from api.index import MAX_BATCH_REPORTS, app
+from utils import ga4_utils
+from utils.ga4_utils import _plan_batch, fetch_ga4_batch, fetch_ga4_data
+from utils.report_cache import report_cache
+
+
+def _report(request):
+    """One Sydney row whose sessions value is the request's start month."""
+    return RunReportResponse(
+        dimension_headers=[{"name": "city"}] + ([{"name": "dateRange"}] if len(request.date_ranges) > 1 else []),
+        metric_headers=[{"name": "sessions", "type_": MetricType.TYPE_INTEGER}],
+        rows=[{"dimension_values": [{"value": "Sydney"}], "metric_values": [{"value": request.date_ranges[0].start_date[5:7]}]}],
+        row_count=1,
+    )
+
+
+class _GA4:
+    """Fake client: `batches` holds the size of every BatchRunReports call; `errors` fail calls in turn."""
+
+    def __init__(self):
+        self.requests = []
+        self.batches = []
+        self.errors = []
+
+    def run_report(self, request):
+        self.requests.append(copy.deepcopy(request))
+        return _report(request)
+
+    def batch_run_reports(self, request):
+        self.batches.append(len(request.requests))
+        if self.errors:
+            error = self.errors.pop(0)
+            if error is not None:
+                raise error
+        return BatchRunReportsResponse(reports=[_report(r) for r in request.requests])
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def _spec(month, **extra):
+    return {"start_date": f"2020-{month:02d}-01", "end_date": f"2020-{month:02d}-28",
+            "dimensions": ["city"], "metrics": ["sessions"], **extra}
+
+
+def test_cached_specs_are_served_without_a_batch_slot(ga4):
+    fetch_ga4_data("2020-01-01", "2020-01-28", ["city"], ["sessions"])
+
+    results = fetch_ga4_batch([_spec(1), _spec(2), _spec(3, au_only=True)])
+    assert [r["data"][0]["sessions"] for r in results] == ["01", "02", "03"]
+    assert ga4.batches == [2] and len(ga4.requests) == 1
+
+
+def test_plan_batch_serves_cached_specs_and_queues_the_rest(ga4):
+    fetch_ga4_data("2020-01-01", "2020-01-28", ["city"], ["sessions"])
+    compare = _spec(2, compare_start_date="2019-02-01", compare_end_date="2019-02-28")
+
+    results, pending = _plan_batch([_spec(1), compare, _spec(3, au_only=True)])
+    assert results[0] == {"success": True, "data": [{"city": "Sydney", "sessions": "01"}]}
+    assert results[1:] == [None, None]
+    assert [(i, dims, metrics, is_compare) for i, _, _, dims, metrics, is_compare in pending] == [
+        (1, ["city"], ["sessions"], True), (2, ["city"], ["sessions"], False),
+    ]
+    assert "dimension_filter" in pending[1][1]
+
+    _, uncached = _plan_batch([_spec(1)], use_cache=False)
+    assert len(uncached) == 1 and uncached[0][2] is None
+
+
+def test_batch_packs_five_reports_per_call_in_order_and_caches(ga4):
+    specs = [_spec(m) for m in range(1, 8)]
+    results = fetch_ga4_batch(specs)
+    assert ga4.batches == [5, 2]
+    assert [r["data"][0]["sessions"] for r in results] == [f"{m:02d}" for m in range(1, 8)]
+
+    assert fetch_ga4_batch(specs) == results
+    assert ga4.batches == [5, 2]
+
+
+def test_a_failed_call_fails_only_its_chunk_and_is_not_cached(ga4):
+    ga4.errors = [ValueError("bad request"), None]
+    results = fetch_ga4_batch([_spec(m) for m in range(1, 8)])
+    assert results[:5] == [{"success": False, "error": "bad request"}] * 5
+    assert [r["data"][0]["sessions"] for r in results[5:]] == ["06", "07"]
+
+    retried = fetch_ga4_batch([_spec(1), _spec(6)])
+    assert [r["success"] for r in retried] == [True, True]
+    assert ga4.batches == [5, 2, 1]
+
+
+def test_batch_route_validates_reports(ga4):
+    client = TestClient(app)
+    assert client.post("/api/analytics/batch", json={"reports": []}).json() == {"success": True, "data": []}
+    too_many = [_spec(1)] * (MAX_BATCH_REPORTS + 1)
+    assert client.post("/api/analytics/batch", json={"reports": too_many}).status_code == 400
+    no_metrics = [_spec(1)] * (MAX_BATCH_REPORTS - 1) + [{**_spec(1), "metrics": []}]
+    assert client.post("/api/analytics/batch", json={"reports": no_metrics}).status_code == 400
+    assert client.post("/api/analytics/batch", json={"reports": [{"start_date": "2020-01-01"}]}).status_code == 422
+    assert ga4.batches == [] and ga4.requests == []
@@ -0,0 +1,78 @@
+import base64
+import json
+import threading
+
+import pytest
+
+from utils import ga4_utils
+
+
+class _Transport:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class _Client:
+    built = []
+
+    def __init__(self, credentials=None):
+        self.credentials = credentials
+        self.transport = _Transport()
+        _Client.built.append(self)
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    """No shared client or credentials yet; clients are _Client and no credentials.json."""
+    _Client.built = []
+    monkeypatch.setattr(ga4_utils, "_client", None)
+    monkeypatch.setattr(ga4_utils, "_credentials", None)
+    monkeypatch.setattr(ga4_utils, "_credentials_source", None)
+    monkeypatch.setattr(ga4_utils, "BetaAnalyticsDataClient", _Client)
+    monkeypatch.setattr(ga4_utils, "CREDENTIALS_FILE", "/nonexistent/credentials.json")
+    monkeypatch.delenv("GOOGLE_APPLICATION_CREDENTIALS_B64", raising=False)
+
+
+def test_one_client_is_shared_across_threads(fresh):
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(ga4_utils.get_ga4_client())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(_Client.built) == 1
+    assert all(c is _Client.built[0] for c in clients)
+    assert ga4_utils.get_ga4_client() is clients[0]
+    assert ga4_utils.setup_credentials() == "gcloud Application Default Credentials"
+
+
+def test_env_credentials_are_decoded_once_in_memory(fresh, monkeypatch):
+    infos = []
+
+    def from_info(info, scopes):
+        infos.append(info)
+        return "creds"
+
+    def from_file(*args, **kwargs):
+        raise AssertionError("no credentials file should be read")
+
+    monkeypatch.setattr(ga4_utils.service_account.Credentials, "from_service_account_info", from_info)
+    monkeypatch.setattr(ga4_utils.service_account.Credentials, "from_service_account_file", from_file)
+    monkeypatch.setenv("GOOGLE_APPLICATION_CREDENTIALS_B64", base64.b64encode(json.dumps({"type": "sa"}).encode()).decode())
+
+    assert ga4_utils.get_ga4_client().credentials == "creds"
+    ga4_utils.get_ga4_client()
+    assert ga4_utils.setup_credentials() == "Service Account (Env Var)"
+    assert infos == [{"type": "sa"}]
+
+
+def test_reset_closes_the_old_client_and_reloads_credentials(fresh):
+    first = ga4_utils.get_ga4_client()
+    ga4_utils.reset_ga4_client()
+    assert first.transport.closed
+    second = ga4_utils.get_ga4_client()
+    assert second is not first and not second.transport.closed
+    assert len(_Client.built) == 2
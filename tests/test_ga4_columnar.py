@@ -0,0 +1,109 @@
+import asyncio
+import copy
+
+import pytest
+from fastapi.testclient import TestClient
+from google.analytics.data_v1beta.types import BatchRunReportsResponse, MetricType, RunReportResponse
+
+from api.index import app
+from utils import ga4_async, ga4_utils
+from utils.ga4_columnar import ColumnarReport, check_format
+from utils.report_cache import report_cache
+
+ROWS = [
+    {"city": "Sydney", "sessions": "12", "bounceRate": "0.5", "sessions_compare": "3"},
+    {"city": "Perth", "sessions": "7", "bounceRate": "0.25"},
+    {"city": "Sydney", "sessions": "1", "bounceRate": "1", "sessions_compare": "2"},
+]
+
+
+def _report(request):
+    return RunReportResponse(
+        dimension_headers=[{"name": "city"}],
+        metric_headers=[{"name": "sessions", "type_": MetricType.TYPE_INTEGER}],
+        rows=[{"dimension_values": [{"value": city}], "metric_values": [{"value": value}]}
+              for city, value in (("Sydney", "12"), ("Perth", "7"))],
+        row_count=2,
+    )
+
+
+class _AsyncGA4:
+    def __init__(self, ga4):
+        self.ga4 = ga4
+
+    async def run_report(self, request):
+        self.ga4.requests.append(copy.deepcopy(request))
+        return _report(request)
+
+    async def batch_run_reports(self, request):
+        return BatchRunReportsResponse(reports=[_report(r) for r in request.requests])
+
+
+class _GA4:
+    def __init__(self):
+        self.requests = []
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_credentials", None)
+    monkeypatch.setattr(ga4_utils, "_credentials_source", "test")
+    monkeypatch.setattr(ga4_async, "BetaAnalyticsDataAsyncClient", lambda **kwargs: _AsyncGA4(fake))
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def test_dimensions_are_dictionary_encoded_and_metrics_typed():
+    report = ColumnarReport.from_rows(ROWS, ["city"], ["sessions", "bounceRate"], compare=True)
+    values, codes = report.dimensions["city"]
+    assert (values, list(codes), codes.typecode) == (["Sydney", "Perth"], [0, 1, 0], "B")
+    assert report.metrics["sessions"].typecode == "q" and list(report.metrics["sessions"]) == [12, 7, 1]
+    assert report.metrics["bounceRate"].typecode == "d" and list(report.metrics["bounceRate"]) == [0.5, 0.25, 1.0]
+    assert list(report.metrics["sessions_compare"]) == [3, 0, 2]
+
+
+def test_rows_round_trip_and_json_shape():
+    report = ColumnarReport.from_rows(ROWS, ["city"], ["sessions"])
+    assert report.rows() == [{"city": "Sydney", "sessions": 12}, {"city": "Perth", "sessions": 7}, {"city": "Sydney", "sessions": 1}]
+    assert report.to_json() == {
+        "format": "columnar",
+        "rowCount": 3,
+        "dimensions": {"city": {"values": ["Sydney", "Perth"], "codes": [0, 1, 0]}},
+        "metrics": {"sessions": [12, 7, 1]},
+    }
+
+
+def test_code_width_grows_with_the_dictionary():
+    rows = [{"page": f"/p{i}", "views": i} for i in range(300)]
+    assert ColumnarReport.from_rows(rows, ["page"], ["views"]).dimensions["page"][1].typecode == "H"
+
+
+def test_check_format():
+    assert check_format(None) == "rows"
+    assert check_format(" Columnar ") == "columnar"
+    with pytest.raises(ValueError):
+        check_format("xml")
+
+
+def test_routes_serve_columnar_on_request(ga4):
+    client = TestClient(app)
+    params = {"start_date": "2020-01-01", "end_date": "2020-01-31"}
+    data = client.get("/api/analytics/cities", params={**params, "format": "columnar"}).json()["data"]
+    assert data["dimensions"]["city"]["values"] == ["Sydney", "Perth"]
+    assert data["metrics"]["sessions"] == [12, 7]
+    assert client.get("/api/analytics/cities", params=params).json()["data"] == [
+        {"city": "Sydney", "sessions": "12"}, {"city": "Perth", "sessions": "7"},
+    ]
+    assert len(ga4.requests) == 1
+    assert client.get("/api/analytics/cities", params={**params, "format": "xml"}).status_code == 400
+
+
+def test_batch_specs_choose_their_format(ga4):
+    spec = {"start_date": "2020-01-01", "end_date": "2020-01-31", "dimensions": ["city"], "metrics": ["sessions"]}
+    rows, columnar = asyncio.run(ga4_async.fetch_ga4_batch_async([spec, {**spec, "end_date": "2020-01-30", "format": "columnar"}]))
+    assert rows["data"] == [{"city": "Sydney", "sessions": "12"}, {"city": "Perth", "sessions": "7"}]
+    assert list(columnar["data"].metrics["sessions"]) == [12, 7]
+    assert TestClient(app).post("/api/analytics/batch", json={"reports": [{**spec, "format": "xml"}]}).status_code == 400
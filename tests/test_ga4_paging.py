@@ -0,0 +1,79 @@
+import copy
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from google.analytics.data_v1beta.types import MetricType, RunReportResponse
+
+from api.index import app
+from utils import ga4_utils
+from utils.ga4_utils import iter_ga4_rows
+from utils.report_cache import report_cache
+
+
+class _GA4:
+    """A pagePath report of `total` rows, paged by the request's offset / limit like GA4."""
+
+    def __init__(self):
+        self.requests = []
+        self.total = 0
+
+    def run_report(self, request):
+        # iter_ga4_rows reuses one request object, so keep what was actually sent
+        self.requests.append(copy.deepcopy(request))
+        rows = range(self.total)[request.offset:request.offset + (request.limit or self.total)]
+        return RunReportResponse(
+            dimension_headers=[{"name": "pagePath"}],
+            metric_headers=[{"name": "screenPageViews", "type_": MetricType.TYPE_INTEGER}],
+            rows=[{"dimension_values": [{"value": f"/p{i}"}], "metric_values": [{"value": str(i)}]} for i in rows],
+            row_count=self.total,
+        )
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def test_iter_ga4_rows_pages_with_offset_until_row_count(ga4):
+    ga4.total = 7
+    rows = list(iter_ga4_rows("2025-01-01", "2025-01-31", ["pagePath"], ["screenPageViews"], page_size=3))
+    assert rows == [{"pagePath": f"/p{i}", "screenPageViews": str(i)} for i in range(7)]
+    assert [(r.offset, r.limit) for r in ga4.requests] == [(0, 3), (3, 3), (6, 3)]
+
+
+def test_iter_ga4_rows_stops_at_max_rows(ga4):
+    ga4.total = 7
+    rows = list(iter_ga4_rows("2025-01-01", "2025-01-31", ["pagePath"], ["screenPageViews"], page_size=3, max_rows=4))
+    assert len(rows) == 4
+    assert [(r.offset, r.limit) for r in ga4.requests] == [(0, 3), (3, 1)]
+
+
+def test_iter_ga4_rows_empty_report_is_one_request(ga4):
+    assert list(iter_ga4_rows("2025-01-01", "2025-01-31", ["pagePath"], ["screenPageViews"])) == []
+    assert len(ga4.requests) == 1
+
+
+def test_ndjson_route_streams_every_row(ga4):
+    ga4.total = 5
+    res = TestClient(app).get("/api/analytics/report.ndjson", params={
+        "start_date": "2025-01-01", "end_date": "2025-01-31",
+        "dimensions": "pagePath", "metrics": "screenPageViews", "page_size": 2,
+    })
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["pagePath"] for line in res.text.splitlines()] == [f"/p{i}" for i in range(5)]
+    assert len(ga4.requests) == 3
+
+
+def test_ndjson_route_validates_params(ga4):
+    client = TestClient(app)
+    params = {"start_date": "2025-01-01", "end_date": "2025-01-31"}
+    assert client.get("/api/analytics/report.ndjson", params={**params, "metrics": ""}).status_code == 400
+    assert client.get("/api/analytics/report.ndjson", params={**params, "metrics": "sessions", "page_size": 0}).status_code == 400
+    assert ga4.requests == []
@@ -0,0 +1,115 @@
+import asyncio
+import copy
+
+import pytest
+from google.analytics.data_v1beta.types import MetricType, RunReportResponse
+
+from utils import ga4_async, ga4_utils
+from utils.ga4_utils import fetch_paths_screen_page_views_totals, path_patterns
+from utils.report_cache import report_cache
+
+# (pagePath, yearMonth, screenPageViews)
+PAGES = [
+    ("/on-a-roll/oar-f701/", "202501", 10),
+    ("/on-a-roll/oar-f701/", "202502", 5),
+    ("/blog/oar-f701-recap/", "202501", 2),
+    ("/on-a-roll/oar-f702/", "202502", 7),
+]
+
+
+class _GA4:
+    """
+    Views report over PAGES: the multi-path report groups by pagePath (and yearMonth) and claims
+    one more row than it returns when `truncated`; single-path reports filter on their pattern.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.truncated = False
+
+    def run_report(self, request):
+        self.requests.append(copy.deepcopy(request))
+        dims = [d.name for d in request.dimensions]
+        if dims and dims[0] == "pagePath":
+            rows = [([path, ym][:len(dims)], views) for path, ym, views in PAGES]
+            row_count = len(rows) + self.truncated
+        else:
+            value = request.dimension_filter.filter.string_filter.value
+            matching = [(ym, views) for path, ym, views in PAGES if value in path]
+            if dims == ["yearMonth"]:
+                months = {}
+                for ym, views in matching:
+                    months[ym] = months.get(ym, 0) + views
+                rows = [([ym], views) for ym, views in sorted(months.items())]
+            else:
+                rows = [([], sum(views for _, views in matching))]
+            row_count = len(rows)
+        return RunReportResponse(
+            dimension_headers=[{"name": d} for d in dims],
+            metric_headers=[{"name": "screenPageViews", "type_": MetricType.TYPE_INTEGER}],
+            rows=[{"dimension_values": [{"value": v} for v in values], "metric_values": [{"value": str(views)}]}
+                  for values, views in rows],
+            row_count=row_count,
+        )
+
+
+class _AsyncGA4:
+    def __init__(self, fake):
+        self._fake = fake
+
+    async def run_report(self, request):
+        return self._fake.run_report(request)
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    monkeypatch.setattr(ga4_utils, "_credentials", None)
+    monkeypatch.setattr(ga4_utils, "_credentials_source", "test")
+    monkeypatch.setattr(ga4_async, "BetaAnalyticsDataAsyncClient", lambda **kwargs: _AsyncGA4(fake))
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def test_path_patterns_drop_blanks_and_duplicates():
+    assert path_patterns([" oar-f701 ", "", None, "oar-f701", "/shop/"], "exact") == [("oar-f701", "exact"), ("/shop/", "exact")]
+    assert path_patterns(["a"], "regex") == [("a", "contains")]
+
+
+def test_one_report_buckets_every_pattern(ga4):
+    totals = fetch_paths_screen_page_views_totals("2025-01-01", "2025-02-28", ["oar-f702", "oar-f701", "missing"])
+    assert totals == [
+        {"path": "oar-f702", "match": "contains", "screenPageViews": 7},
+        {"path": "oar-f701", "match": "contains", "screenPageViews": 17},
+        {"path": "missing", "match": "contains", "screenPageViews": 0},
+    ]
+    assert len(ga4.requests) == 1
+    assert len(ga4.requests[0].dimension_filter.or_group.expressions) == 3
+
+
+def test_by_month_splits_each_pattern(ga4):
+    (item,) = fetch_paths_screen_page_views_totals("2025-01-01", "2025-02-28", ["oar-f701"], by_month=True)
+    assert item["byMonth"] == {"202501": 12, "202502": 5}
+    assert item["screenPageViews"] == 17
+
+
+@pytest.mark.parametrize("by_month", [False, True])
+def test_a_truncated_report_falls_back_to_one_report_per_pattern(ga4, by_month):
+    ga4.truncated = True
+    result = fetch_paths_screen_page_views_totals("2025-01-01", "2025-02-28", ["oar-f701", "oar-f702"], by_month=by_month)
+    assert [r["screenPageViews"] for r in result] == [17, 7]
+    if by_month:
+        assert [r["byMonth"] for r in result] == [{"202501": 12, "202502": 5}, {"202502": 7}]
+    fallback = [[d.name for d in r.dimensions] for r in ga4.requests[1:]]
+    assert fallback == [["yearMonth"] if by_month else []] * 2
+
+
+@pytest.mark.parametrize("truncated", [False, True])
+def test_async_totals_match_sync(ga4, truncated):
+    ga4.truncated = truncated
+    args = ("2025-01-01", "2025-02-28", ["oar-f701", "oar-f702"])
+    result = asyncio.run(ga4_async.fetch_paths_screen_page_views_totals_async(*args, by_month=True))
+    assert result == fetch_paths_screen_page_views_totals(*args, by_month=True)
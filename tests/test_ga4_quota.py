@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.analytics.data_v1beta.types import PropertyQuota, QuotaStatus
+from google.api_core import exceptions as gexc
+
+from utils import ga4_quota
+from utils.ga4_quota import QuotaExhaustedError, QuotaScheduler
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch):
+    monkeypatch.setattr(ga4_quota, "BACKOFF_BASE", 0)
+
+
+def test_admit_rejects_below_the_reserve():
+    scheduler = QuotaScheduler()
+    scheduler.observe(PropertyQuota(tokens_per_day=QuotaStatus(consumed=10, remaining=ga4_quota.MIN_TOKENS_PER_DAY + 1)))
+    scheduler.admit()
+    scheduler.observe(PropertyQuota(tokens_per_day=QuotaStatus(consumed=10, remaining=ga4_quota.MIN_TOKENS_PER_DAY - 1)))
+    with pytest.raises(QuotaExhaustedError) as info:
+        scheduler.admit()
+    assert info.value.retry_after >= 1
+    assert (scheduler.admitted, scheduler.rejected) == (1, 1)
+
+
+def test_concurrency_errors_retry_and_count_the_report_once():
+    scheduler = QuotaScheduler()
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise gexc.ResourceExhausted("Exhausted concurrent requests quota.")
+        return "ok"
+
+    assert scheduler.call(fn) == "ok"
+    assert (scheduler.admitted, scheduler.retries, scheduler.quota_errors) == (1, 2, 2)
+
+
+def test_token_errors_block_until_the_window_resets():
+    scheduler = QuotaScheduler()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise gexc.ResourceExhausted("Exhausted property tokens per day.")
+
+    with pytest.raises(QuotaExhaustedError):
+        scheduler.call(fn)
+    with pytest.raises(QuotaExhaustedError, match="daily"):
+        scheduler.call(fn)
+    assert len(calls) == 1
+    assert scheduler.stats()["blocked"] is True
+
+
+def test_structured_quota_details_win_over_the_message():
+    violation = SimpleNamespace(subject="", description="Exhausted property tokens per hour")
+    err = gexc.ResourceExhausted("Resource exhausted", details=[SimpleNamespace(violations=[violation])])
+    scheduler = QuotaScheduler()
+    assert scheduler._on_quota_error(err) is False
+    assert scheduler.stats()["blockedReason"] == "GA4 hourly token quota exhausted"
+
+
+def test_sync_and_async_calls_share_one_concurrency_cap():
+    scheduler = QuotaScheduler(max_concurrent=3)
+    lock, in_flight, peak = threading.Lock(), [0], [0]
+
+    def enter():
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+
+    def leave():
+        with lock:
+            in_flight[0] -= 1
+
+    def sync_report():
+        enter()
+        time.sleep(0.02)
+        leave()
+
+    async def async_report():
+        enter()
+        await asyncio.sleep(0.02)
+        leave()
+
+    async def run_async():
+        await asyncio.gather(*(scheduler.call_async(async_report) for _ in range(5)))
+
+    threads = [threading.Thread(target=scheduler.call, args=(sync_report,)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    asyncio.run(run_async())
+    for t in threads:
+        t.join()
+    assert peak[0] <= 3
+    assert scheduler.admitted == 10
+
+
+def test_async_waiters_time_out_and_cancel_without_leaking_slots(monkeypatch):
+    monkeypatch.setattr(ga4_quota, "QUEUE_TIMEOUT", 0.05)
+    scheduler = QuotaScheduler(max_concurrent=1)
+    release = threading.Event()
+    holder = threading.Thread(target=scheduler.call, args=(release.wait,))
+    holder.start()
+    while scheduler.admitted == 0:
+        time.sleep(0.001)
+
+    async def noop():
+        return "ok"
+
+    async def waiters():
+        with pytest.raises(QuotaExhaustedError):
+            await scheduler.call_async(noop)
+        task = asyncio.ensure_future(scheduler.call_async(noop))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(waiters())
+    release.set()
+    holder.join()
+    assert asyncio.run(scheduler.call_async(noop)) == "ok"
+    assert scheduler.rejected == 1
+
+
+def test_slots_are_handed_out_in_arrival_order_across_threads_and_loops():
+    slots = ga4_quota._Slots(1)
+    assert slots.acquire(1)
+    order = []
+
+    def thread_waiter(name):
+        assert slots.acquire(5)
+        order.append(name)
+        slots.release()
+
+    async def loop_waiter():
+        first = threading.Thread(target=thread_waiter, args=("thread 1",))
+        first.start()
+        while slots.stats()["queued"] < 1:
+            await asyncio.sleep(0.001)
+        task = asyncio.ensure_future(slots.acquire_async(5))
+        while slots.stats()["queued"] < 2:
+            await asyncio.sleep(0.001)
+        second = threading.Thread(target=thread_waiter, args=("thread 2",))
+        second.start()
+        while slots.stats()["queued"] < 3:
+            await asyncio.sleep(0.001)
+        slots.release()
+        assert await task
+        order.append("loop")
+        slots.release()
+        await asyncio.to_thread(first.join)
+        await asyncio.to_thread(second.join)
+
+    asyncio.run(loop_waiter())
+    assert order == ["thread 1", "loop", "thread 2"]
+    assert slots.stats() == {"free": 1, "queued": 0}
+
+
+def test_a_slot_granted_to_a_cancelled_waiter_passes_on():
+    slots = ga4_quota._Slots(1)
+    assert slots.acquire(1)
+
+    async def run():
+        cancelled = asyncio.ensure_future(slots.acquire_async(5))
+        await asyncio.sleep(0)
+        waiting = asyncio.ensure_future(slots.acquire_async(5))
+        await asyncio.sleep(0)
+        slots.release()  # granted to `cancelled`, whose wakeup has not run yet
+        cancelled.cancel()
+        try:
+            if await cancelled:
+                slots.release()  # the wakeup won the race, so the waiter owned the slot
+        except asyncio.CancelledError:
+            pass
+        return await asyncio.wait_for(waiting, 1)
+
+    assert asyncio.run(run()) is True
+    slots.release()
+    assert slots.stats() == {"free": 1, "queued": 0}
@@ -0,0 +1,80 @@
+import pytest
+from google.analytics.data_v1beta.types import MetricType, RunReportResponse
+
+from utils import ga4_utils
+from utils.ga4_utils import fetch_ga4_data, rows_from_response
+from utils.report_cache import report_cache
+
+
+def _response(dimensions, metrics, rows, metric_types=None):
+    """RunReportResponse with `rows` given as (dimension values, metric values) pairs."""
+    types = metric_types or [MetricType.TYPE_INTEGER] * len(metrics)
+    return RunReportResponse(
+        dimension_headers=[{"name": d} for d in dimensions],
+        metric_headers=[{"name": m, "type_": t} for m, t in zip(metrics, types)],
+        rows=[{"dimension_values": [{"value": v} for v in dims], "metric_values": [{"value": v} for v in values]}
+              for dims, values in rows],
+        row_count=len(rows),
+    )
+
+
+class _GA4:
+    def __init__(self):
+        self.requests = []
+
+    def run_report(self, request):
+        self.requests.append(request)
+        return _response(["country"], ["sessions"], [(["Australia"], ["12"])])
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def test_rows_keep_ga4_strings_by_default():
+    response = _response(["country"], ["sessions"], [(["Australia"], ["12"])])
+    assert rows_from_response(response, ["country"], ["sessions"]) == [{"country": "Australia", "sessions": "12"}]
+
+
+def test_typed_rows_parse_by_metric_type():
+    response = _response(
+        ["country"], ["sessions", "bounceRate", "averageSessionDuration"],
+        [(["Australia"], ["12", "0.25", "oops"])],
+        metric_types=[MetricType.TYPE_INTEGER, MetricType.TYPE_FLOAT, MetricType.TYPE_SECONDS],
+    )
+    row = rows_from_response(response, ["country"], ["sessions", "bounceRate", "averageSessionDuration"], typed=True)[0]
+    assert row == {"country": "Australia", "sessions": 12, "bounceRate": 0.25, "averageSessionDuration": "oops"}
+    assert type(row["sessions"]) is int
+
+
+def test_compare_rows_merge_on_the_date_range_dimension():
+    response = _response(["country", "dateRange"], ["sessions"], [
+        (["Australia", "date_range_1"], ["8"]),
+        (["Australia", "date_range_0"], ["12"]),
+        (["Fiji", "date_range_1"], ["2"]),
+    ])
+    assert rows_from_response(response, ["country"], ["sessions"], is_compare=True) == [
+        {"country": "Australia", "sessions_compare": "8", "sessions": "12"},
+        {"country": "Fiji", "sessions_compare": "2"},
+    ]
+
+
+def test_compare_rows_without_a_date_range_dimension_take_current_first():
+    response = _response(["country"], ["sessions"], [(["Australia"], ["12"]), (["Australia"], ["8"])])
+    assert rows_from_response(response, ["country"], ["sessions"], is_compare=True) == [
+        {"country": "Australia", "sessions": "12", "sessions_compare": "8"},
+    ]
+
+
+def test_typed_and_string_rows_are_cached_apart(ga4):
+    args = ("2020-01-01", "2020-01-31", ["country"], ["sessions"])
+    assert fetch_ga4_data(*args) == [{"country": "Australia", "sessions": "12"}]
+    assert fetch_ga4_data(*args, typed_metrics=True) == [{"country": "Australia", "sessions": 12}]
+    assert fetch_ga4_data(*args, typed_metrics=True) == [{"country": "Australia", "sessions": 12}]
+    assert len(ga4.requests) == 2
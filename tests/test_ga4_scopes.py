@@ -0,0 +1,138 @@
+import asyncio
+import copy
+
+import pytest
+from fastapi.testclient import TestClient
+from google.analytics.data_v1beta.types import MetricType, RunReportResponse
+
+from api.index import app
+from utils import ga4_async, ga4_utils
+from utils.ga4_utils import fetch_analytics_data, split_scope_rows
+from utils.report_cache import report_cache
+
+
+class _GA4:
+    """Answers with `rows(request)` ((dims, values) pairs) and keeps every request, sync or async."""
+
+    def __init__(self):
+        self.requests = []
+        self.rows = lambda request: []
+
+    def run_report(self, request):
+        self.requests.append(copy.deepcopy(request))
+        rows = self.rows(request)
+        return RunReportResponse(
+            dimension_headers=[{"name": d.name} for d in request.dimensions],
+            metric_headers=[{"name": m.name, "type_": MetricType.TYPE_INTEGER} for m in request.metrics],
+            rows=[{"dimension_values": [{"value": v} for v in dims], "metric_values": [{"value": v} for v in values]}
+                  for dims, values in rows],
+            row_count=len(rows),
+        )
+
+    def filtered(self) -> list:
+        return ["dimension_filter" in r for r in self.requests]
+
+
+class _AsyncGA4:
+    def __init__(self, fake):
+        self._fake = fake
+
+    async def run_report(self, request):
+        return self._fake.run_report(request)
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    monkeypatch.delenv("GA4_FACT_STORE_PATH", raising=False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    monkeypatch.setattr(ga4_utils, "_credentials", None)
+    monkeypatch.setattr(ga4_utils, "_credentials_source", "test")
+    monkeypatch.setattr(ga4_async, "BetaAnalyticsDataAsyncClient", lambda **kwargs: _AsyncGA4(fake))
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def _country_rows(request):
+    dims = [d.name for d in request.dimensions]
+    table = [("google / organic", "Australia", "30"), ("google / organic", "New Zealand", "5"), ("(direct) / (none)", "United States", "50")]
+    return [([source, country] if "country" in dims else [source], [value]) for source, country, value in table]
+
+
+def test_split_scope_rows_sums_au_slice_and_global_total():
+    value = {
+        "complete": True,
+        "rows": [
+            {"city": "Sydney", "country": "Australia", "sessions": "10", "sessions_compare": "4"},
+            {"city": "(not set)", "country": "Australia", "sessions": "3"},
+            {"city": "(not set)", "country": "United States", "sessions": "20", "sessions_compare": "1"},
+        ],
+    }
+    split = split_scope_rows(value, ["city"], ["sessions"], 10, ["au", "all"])
+    assert split["au"] == [
+        {"city": "Sydney", "sessions": "10", "sessions_compare": "4"},
+        {"city": "(not set)", "sessions": "3"},
+    ]
+    assert split["all"] == [
+        {"city": "(not set)", "sessions": "23", "sessions_compare": "1"},
+        {"city": "Sydney", "sessions": "10", "sessions_compare": "4"},
+    ]
+
+
+def test_split_scope_rows_refuses_a_truncated_report():
+    assert split_scope_rows({"complete": False, "rows": []}, ["city"], ["sessions"], 10, ["au", "all"]) is None
+
+
+def test_additive_scopes_share_one_country_split_report(ga4):
+    ga4.rows = _country_rows
+    data = fetch_analytics_data("2025-01-01", "2025-01-31", ["sessionSourceMedium"], ["sessions"], scopes=["au", "all"])
+    assert len(ga4.requests) == 1
+    assert [d.name for d in ga4.requests[0].dimensions] == ["sessionSourceMedium", "country"]
+    assert data["au"] == [{"sessionSourceMedium": "google / organic", "sessions": "30"}]
+    assert data["all"] == [
+        {"sessionSourceMedium": "(direct) / (none)", "sessions": "50"},
+        {"sessionSourceMedium": "google / organic", "sessions": "35"},
+    ]
+
+
+def test_non_additive_metrics_query_each_scope(ga4):
+    ga4.rows = lambda request: [([], ["12"])]
+    data = fetch_analytics_data("2025-01-01", "2025-01-31", [], ["totalUsers"], scopes=["au", "all"])
+    assert ga4.filtered() == [True, False]
+    assert data == {"au": [{"totalUsers": "12"}], "all": [{"totalUsers": "12"}]}
+
+
+@pytest.mark.parametrize("run", ["sync", "async"])
+def test_only_scopes_without_a_local_answer_reach_ga4(ga4, monkeypatch, run):
+    local = [{"sessionSourceMedium": "local", "sessions": "1"}]
+
+    def facts_answer(*args, **kwargs):
+        au_only = args[7]
+        return None if au_only else local
+
+    monkeypatch.setattr(ga4_utils, "facts_answer", facts_answer)
+    monkeypatch.setattr(ga4_async, "facts_answer", facts_answer)
+    ga4.rows = lambda request: [(["google / organic"], ["30"])]
+    args = ("2025-01-01", "2025-01-31", ["sessionSourceMedium"], ["sessions"])
+    if run == "sync":
+        data = ga4_utils.fetch_analytics_scopes(*args, scopes=["au", "all"])
+    else:
+        data = asyncio.run(ga4_async.fetch_analytics_scopes_async(*args, scopes=["au", "all"]))
+    assert ga4.filtered() == [True]
+    assert data == {"au": [{"sessionSourceMedium": "google / organic", "sessions": "30"}], "all": local}
+
+
+def test_routes_accept_scopes(ga4):
+    ga4.rows = _country_rows
+    client = TestClient(app)
+    params = {"start_date": "2025-01-01", "end_date": "2025-01-31"}
+
+    res = client.get("/api/analytics/sources", params={**params, "scopes": "au,all"})
+    assert res.status_code == 200
+    assert set(res.json()["data"]) == {"au", "all"}
+    assert len(ga4.requests) == 1
+
+    assert client.get("/api/analytics/sources", params={**params, "scopes": "mars"}).status_code == 400
+    assert client.get("/api/analytics/cities", params={**params, "scopes": "au,all", "cities": "Sydney"}).status_code == 400
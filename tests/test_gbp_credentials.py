@@ -0,0 +1,99 @@
+import datetime
+import pickle
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import gbp
+from api.gbp import GBPCredentials, GBPCredentialsUnavailable
+from api.index import app
+
+
+def _in(seconds):
+    return gbp._utcnow() + datetime.timedelta(seconds=seconds)
+
+
+class _Creds:
+    """OAuth credentials stand-in: refresh() issues a token valid for an hour, or raises `error`."""
+
+    def __init__(self, token="t0", expires_in=3600, refresh_token="r", error=None):
+        self.token = token
+        self.expiry = _in(expires_in)
+        self.refresh_token = refresh_token
+        self.error = error
+        self.refresh_threads = []
+
+    @property
+    def valid(self):
+        return bool(self.token) and self.expiry > gbp._utcnow()
+
+    def refresh(self, request):
+        self.refresh_threads.append(threading.get_ident())
+        if self.error is not None:
+            raise self.error
+        self.token = f"t{len(self.refresh_threads)}"
+        self.expiry = _in(3600)
+
+    def __getstate__(self):
+        return {"token": self.token, "expiry": self.expiry}
+
+
+def _manager(creds, pickle_path=None):
+    manager = GBPCredentials(refresh_ahead=300)
+    manager._creds, manager._pickle_path, manager.source, manager._loaded = creds, pickle_path, "test", True
+    return manager
+
+
+def test_a_fresh_token_is_handed_out_without_refreshing():
+    creds = _Creds()
+    assert _manager(creds).get() is creds
+    assert creds.refresh_threads == []
+
+
+def test_a_token_near_expiry_refreshes_in_the_background(tmp_path):
+    creds = _Creds(expires_in=60)
+    path = tmp_path / "token.pickle"
+    manager = _manager(creds, str(path))
+    assert manager.get() is creds
+    manager._refresh_thread.join(5)
+    assert creds.refresh_threads and creds.refresh_threads[0] != threading.get_ident()
+    assert creds.token == "t1" and manager.refreshes == 1
+    assert pickle.loads(path.read_bytes()).token == "t1"
+    assert [p.name for p in tmp_path.iterdir()] == ["token.pickle"]
+
+
+def test_an_expired_token_waits_for_the_refresh():
+    creds = _Creds(expires_in=-5)
+    assert _manager(creds).get().token == "t1"
+
+
+def test_a_failed_refresh_raises_instead_of_handing_out_a_dead_token():
+    creds = _Creds(expires_in=-5, error=RuntimeError("invalid_grant"))
+    manager = _manager(creds)
+    with pytest.raises(GBPCredentialsUnavailable, match="invalid_grant") as info:
+        manager.get()
+    assert info.value.retry_after >= 1
+
+    # Backing off: no new refresh attempt, same error
+    with pytest.raises(GBPCredentialsUnavailable, match="invalid_grant"):
+        manager.get()
+    assert len(creds.refresh_threads) == 1
+    assert manager.stats()["refreshErrors"] == 1
+
+
+def test_a_token_that_cannot_be_refreshed_says_so():
+    manager = _manager(_Creds(token=None, refresh_token=None))
+    with pytest.raises(GBPCredentialsUnavailable, match="gbp_oauth_login"):
+        manager.get()
+
+
+def test_gbp_routes_answer_503_with_retry_after(monkeypatch):
+    manager = _manager(_Creds(expires_in=-5, error=RuntimeError("invalid_grant")))
+    monkeypatch.setattr(gbp, "gbp_credentials", manager)
+    client = TestClient(app)
+    for path in ("/api/gbp/insights", "/api/gbp/reviews", "/api/gbp/ratings"):
+        res = client.get(path)
+        assert res.status_code == 503
+        assert "invalid_grant" in res.json()["detail"]
+        assert int(res.headers["retry-after"]) >= 1
@@ -0,0 +1,86 @@
+import asyncio
+import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import gbp
+from api.index import app
+
+
+def _series(start, end):
+    """WEBSITE_CLICKS equal to the day of the month on every day of [start, end]."""
+    day, points = start, []
+    while day <= end:
+        points.append({"date": {"year": day.year, "month": day.month, "day": day.day}, "value": str(day.day)})
+        day += datetime.timedelta(days=1)
+    data = [{"dailyMetricTimeSeries": [{"dailyMetric": "WEBSITE_CLICKS", "timeSeries": {"datedValues": points}}]}]
+    return {"success": True, "data": data, "summary": gbp._aggregate_insights_timeseries(data), "location": "locations/2"}
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    """Date ranges the (faked) insights fetch was asked for."""
+    calls = []
+
+    async def get_insights_async(start_date=None, end_date=None):
+        calls.append((start_date, end_date))
+        return _series(datetime.date.fromisoformat(start_date), datetime.date.fromisoformat(end_date))
+
+    monkeypatch.setattr(gbp, "get_insights_async", get_insights_async)
+    return calls
+
+
+def _clicks(result):
+    return result["summary"]["customerActions"]["websiteClicks"]
+
+
+def test_pair_plan_covers_nearby_periods_only(monkeypatch):
+    monkeypatch.setattr(gbp, "GBP_COMPARE_MAX_GAP_DAYS", 31)
+    d = datetime.date
+    assert gbp._insights_pair_plan("2025-02-01", "2025-02-07", "2025-01-25", "2025-01-31") == (
+        (d(2025, 1, 25), d(2025, 2, 7)), (d(2025, 2, 1), d(2025, 2, 7)), (d(2025, 1, 25), d(2025, 1, 31)),
+    )
+    assert gbp._insights_pair_plan("2025-03-01", "2025-03-07", "2025-01-01", "2025-01-07") is None
+    assert gbp._insights_pair_plan("2025-02-01", "2025-02-07", None, None) is None
+    assert gbp._insights_pair_plan("2025-02-07", "2025-02-01", "2025-01-25", "2025-01-31") is None
+    assert gbp._insights_pair_plan("2025-02-01", "soon", "2025-01-25", "2025-01-31") is None
+
+
+def test_slices_recompute_the_summary_per_period():
+    result = _series(datetime.date(2025, 1, 25), datetime.date(2025, 2, 7))
+    current = gbp._insights_slice(result, datetime.date(2025, 2, 1), datetime.date(2025, 2, 7))
+    assert _clicks(current) == sum(range(1, 8))
+    assert len(current["data"][0]["dailyMetricTimeSeries"][0]["timeSeries"]["datedValues"]) == 7
+    assert current["location"] == "locations/2"
+
+
+def test_nearby_periods_cost_one_fetch(fetched):
+    current, compare = asyncio.run(gbp.get_insights_pair_async("2025-02-01", "2025-02-07", "2025-01-25", "2025-01-31"))
+    assert fetched == [("2025-01-25", "2025-02-07")]
+    assert (_clicks(current), _clicks(compare)) == (sum(range(1, 8)), sum(range(25, 32)))
+
+
+def test_far_apart_periods_are_fetched_separately(fetched):
+    current, compare = asyncio.run(gbp.get_insights_pair_async("2025-03-01", "2025-03-07", "2024-03-01", "2024-03-07"))
+    assert sorted(fetched) == [("2024-03-01", "2024-03-07"), ("2025-03-01", "2025-03-07")]
+    assert _clicks(current) == _clicks(compare) == sum(range(1, 8))
+
+
+def test_an_error_applies_to_both_periods(monkeypatch):
+    async def failing(start_date=None, end_date=None):
+        return {"error": "API Error (403): denied"}
+
+    monkeypatch.setattr(gbp, "get_insights_async", failing)
+    current, compare = asyncio.run(gbp.get_insights_pair_async("2025-02-01", "2025-02-07", "2025-01-25", "2025-01-31"))
+    assert current == compare == {"error": "API Error (403): denied"}
+
+
+def test_insights_route_merges_the_compare_summary(fetched):
+    res = TestClient(app).get("/api/gbp/insights", params={
+        "start_date": "2025-02-01", "end_date": "2025-02-07",
+        "compare_start_date": "2025-01-25", "compare_end_date": "2025-01-31",
+    })
+    actions = res.json()["summary"]["customerActions"]
+    assert (actions["websiteClicks"], actions["websiteClicks_compare"]) == (sum(range(1, 8)), sum(range(25, 32)))
+    assert fetched == [("2025-01-25", "2025-02-07")]
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from api import gbp
+from utils import gbp_store
+from utils.gbp_store import GBPMetricsStore
+
+LOCATION = "locations/1"
+
+
+def _series(days, value="3"):
+    points = [{"date": {"year": d.year, "month": d.month, "day": d.day}, "value": value} for d in days]
+    return {"multiDailyMetricTimeSeries": [{"dailyMetricTimeSeries": [
+        {"dailyMetric": "WEBSITE_CLICKS", "timeSeries": {"datedValues": points}},
+    ]}]}
+
+
+def test_write_days_replaces_days_and_marks_them_synced(tmp_path):
+    store = GBPMetricsStore(str(tmp_path / "gbp.sqlite"))
+    days = [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)]
+    store.write_days(LOCATION, days, [("2024-01-01", "CALL_CLICKS", 2), ("2024-01-02", "CALL_CLICKS", 5)])
+    store.write_days(LOCATION, days[:1], [("2024-01-01", "CALL_CLICKS", 4)])
+
+    assert store.days_to_sync(LOCATION, days[0], date(2024, 1, 5)) == [date(2024, 1, 4), date(2024, 1, 5)]
+    assert store.totals(LOCATION, days[0], days[-1]) == {"CALL_CLICKS": 9}
+    assert store.daily(LOCATION, days[0], days[-1]) == {"CALL_CLICKS": [("2024-01-01", 4), ("2024-01-02", 5)]}
+
+
+def test_settling_days_are_synced_again_once_stale(tmp_path, monkeypatch):
+    store = GBPMetricsStore(str(tmp_path / "gbp.sqlite"))
+    today = gbp_store.location_today()
+    store.write_days(LOCATION, [today], [])
+    assert store.days_to_sync(LOCATION, today, today) == []
+
+    monkeypatch.setattr(gbp_store, "GBP_METRICS_OPEN_MAX_AGE", -1)
+    assert store.days_to_sync(LOCATION, today, today) == [today]
+
+
+def test_days_settle_in_the_location_time_zone(monkeypatch):
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            # 02:00 UTC on 11 March is still the evening of 10 March in Los Angeles
+            return datetime(2025, 3, 11, 2, 0, tzinfo=timezone.utc).astimezone(tz)
+
+    monkeypatch.setattr(gbp_store, "datetime", Clock)
+    monkeypatch.setattr(gbp_store, "GBP_LOCATION_TIMEZONE", ZoneInfo("America/Los_Angeles"))
+    monkeypatch.setattr(gbp_store, "GBP_METRICS_SETTLE_DAYS", 5)
+    assert gbp_store.location_today() == date(2025, 3, 10)
+    assert gbp_store.is_final_day(date(2025, 3, 4))
+    assert not gbp_store.is_final_day(date(2025, 3, 5))
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def test_async_insights_sync_once_then_answer_locally_off_the_loop(tmp_path, monkeypatch):
+    store = GBPMetricsStore(str(tmp_path / "gbp.sqlite"))
+    start, end = date(2024, 3, 1), date(2024, 3, 3)
+    calls, store_threads = [], set()
+
+    original = store.days_to_sync
+
+    def days_to_sync(*args):
+        store_threads.add(threading.get_ident())
+        return original(*args)
+
+    async def get_async():
+        return object()
+
+    async def resolve(creds):
+        return "accounts/1", LOCATION, None
+
+    async def async_get(creds, url, params=None):
+        calls.append(params)
+        return _Response(_series([start + timedelta(days=i) for i in range(3)]))
+
+    monkeypatch.setattr(store, "days_to_sync", days_to_sync)
+    monkeypatch.setattr(gbp, "get_gbp_metrics_store", lambda: store)
+    monkeypatch.setattr(gbp.gbp_credentials, "get_async", get_async)
+    monkeypatch.setattr(gbp, "_resolve_location_async", resolve)
+    monkeypatch.setattr(gbp, "_async_get", async_get)
+
+    async def run():
+        loop_thread = threading.get_ident()
+        first = await gbp._fetch_insights_async(start.isoformat(), end.isoformat())
+        second = await gbp._fetch_insights_async(start.isoformat(), end.isoformat())
+        return loop_thread, first, second
+
+    loop_thread, first, second = asyncio.run(run())
+    assert len(calls) == 1
+    assert first == second
+    assert first["summary"] == gbp._summary_from_totals({"WEBSITE_CLICKS": 9})
+    assert store.local_answers == 1
+    assert store_threads and loop_thread not in store_threads
@@ -0,0 +1,156 @@
+import asyncio
+import threading
+
+import pytest
+
+from api import gbp
+from utils import gbp_review_store
+from utils.gbp_review_store import GBPReviewStore, star_value
+
+LOCATION = "accounts/1/locations/2"
+
+
+def _review(n, star="FIVE", updated=None):
+    return {"reviewId": f"r{n}", "starRating": star, "updateTime": updated or f"2024-01-{n:02d}T00:00:00Z"}
+
+
+@pytest.mark.parametrize("review, expected", [
+    ({"starRating": "FIVE"}, 5),
+    ({"starRating": "two"}, 2),
+    ({"rating": 4}, 4),
+    ({"starRating": "STAR_RATING_UNSPECIFIED"}, None),
+    ({"rating": 9}, None),
+    ({}, None),
+])
+def test_star_value(review, expected):
+    assert star_value(review) == expected
+
+
+@pytest.fixture(params=["memory", "file"])
+def store(request, tmp_path):
+    return GBPReviewStore("" if request.param == "memory" else str(tmp_path / "reviews.sqlite"))
+
+
+def test_apply_keeps_running_counts_through_updates_and_deletes(store):
+    store.apply(LOCATION, [_review(1), _review(2, "FOUR"), _review(3, "ONE")], 3.3, 3, full=True)
+    assert store.distribution(LOCATION) == {"1": 1, "2": 0, "3": 0, "4": 1, "5": 1}
+
+    # r2 edited to three stars; r1 unchanged (same updateTime) is skipped
+    changed = store.apply(LOCATION, [_review(2, "THREE", "2024-02-01T00:00:00Z"), _review(1)], 3.0, 3, full=False)
+    assert changed == 1
+    assert store.distribution(LOCATION) == {"1": 1, "2": 0, "3": 1, "4": 0, "5": 1}
+
+    # A full pass without r3 drops it
+    store.apply(LOCATION, [_review(1), _review(2, "THREE", "2024-02-01T00:00:00Z")], 4.0, 2, full=True)
+    assert store.distribution(LOCATION) == {"1": 0, "2": 0, "3": 1, "4": 0, "5": 1}
+    assert [r["reviewId"] for r in store.recent(LOCATION, 10)] == ["r2", "r1"]
+    assert store.sync_state(LOCATION)["totalReviewCount"] == 2
+    assert (store.full_syncs, store.incremental_syncs) == (2, 1)
+
+
+def test_sync_plan(store, monkeypatch):
+    assert store.sync_plan(LOCATION) == (True, True, None)
+    store.apply(LOCATION, [_review(1)], 5, 1, full=True)
+    assert store.sync_plan(LOCATION) == (False, False, "2024-01-01T00:00:00Z")
+    monkeypatch.setattr(gbp_review_store, "GBP_REVIEWS_SYNC_INTERVAL", -1)
+    assert store.sync_plan(LOCATION) == (True, False, "2024-01-01T00:00:00Z")
+    monkeypatch.setattr(gbp_review_store, "GBP_REVIEWS_FULL_SYNC_AGE", -1)
+    assert store.sync_plan(LOCATION) == (True, True, None)
+
+
+def test_in_memory_store_serves_readers_during_a_sync():
+    store = GBPReviewStore()
+    store.apply(LOCATION, [_review(i % 28 + 1) for i in range(28)], 5, 28, full=True)
+    errors, stop = [], threading.Event()
+
+    def writer():
+        try:
+            for i in range(30):
+                batch = [_review(n, "FOUR" if i % 2 else "FIVE", f"2024-03-{i % 28 + 1:02d}T{n:02d}:00:00Z") for n in range(1, 29)]
+                store.apply(LOCATION, batch, 4.5, 28, full=i % 5 == 0)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            stop.set()
+
+    def reader(read):
+        try:
+            while not stop.is_set():
+                read()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [
+        threading.Thread(target=reader, args=(read,))
+        for read in (lambda: store.recent(LOCATION, 10), lambda: store.distribution(LOCATION), store.stats)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert sum(store.distribution(LOCATION).values()) == 28
+
+
+def test_review_pages_stop_at_the_watermark():
+    pages = gbp._ReviewPages(full=False, watermark="2024-01-05")
+    first = {"averageRating": 4.2, "totalReviewCount": 9, "nextPageToken": "p2",
+             "reviews": [{"reviewId": "a", "updateTime": "2024-01-09"}, {"reviewId": "b", "updateTime": "2024-01-06"}]}
+    second = {"nextPageToken": "p3",
+              "reviews": [{"reviewId": "c", "updateTime": "2024-01-05"}, {"reviewId": "d", "updateTime": "2024-01-02"}]}
+    assert pages.add(first) == "p2"
+    assert pages.add(second) is None
+    assert [r["reviewId"] for r in pages.reviews] == ["a", "b", "c"]
+    assert (pages.average_rating, pages.total_review_count) == (4.2, 9)
+    assert pages.params("p2") == {"pageSize": gbp.GBP_REVIEWS_PAGE_SIZE, "orderBy": "updateTime desc", "pageToken": "p2"}
+
+
+def test_full_review_pages_keep_every_page():
+    pages = gbp._ReviewPages(full=True, watermark="2024-01-05")
+    assert pages.add({"nextPageToken": "p2", "reviews": [{"reviewId": "old", "updateTime": "2023-01-01"}]}) == "p2"
+    assert pages.add({"reviews": []}) is None
+    assert [r["reviewId"] for r in pages.reviews] == ["old"]
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def test_async_review_sync_uses_the_index_off_the_loop(monkeypatch):
+    store = GBPReviewStore()
+    store_threads = set()
+    original_apply = store.apply
+
+    def apply(*args, **kwargs):
+        store_threads.add(threading.get_ident())
+        return original_apply(*args, **kwargs)
+
+    async def get_async():
+        return object()
+
+    async def resolve(creds):
+        return "accounts/1", "locations/2", None
+
+    async def async_get(creds, url, params=None):
+        return _Response({"averageRating": 4.5, "totalReviewCount": 2, "reviews": [_review(2, "FOUR"), _review(1)]})
+
+    monkeypatch.setattr(store, "apply", apply)
+    monkeypatch.setattr(gbp, "get_gbp_review_store", lambda: store)
+    monkeypatch.setattr(gbp.gbp_credentials, "get_async", get_async)
+    monkeypatch.setattr(gbp, "_resolve_location_async", resolve)
+    monkeypatch.setattr(gbp, "_async_get", async_get)
+
+    async def run():
+        return threading.get_ident(), await gbp.get_reviews_async(), await gbp.get_ratings_async()
+
+    loop_thread, reviews, ratings = asyncio.run(run())
+    assert [r["reviewId"] for r in reviews["reviews"]] == ["r2", "r1"]
+    assert ratings["data"] == {"averageRating": 4.5, "totalReviews": 2,
+                               "ratingDistribution": {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1}}
+    assert store_threads and loop_thread not in store_threads
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from api import gbp
+from api.gbp import GBPSession
+
+
+class _Call:
+    def __init__(self, result, delay=0):
+        self._result, self._delay = result, delay
+
+    def execute(self):
+        time.sleep(self._delay)
+        return self._result
+
+
+class _Service:
+    """accounts().list() and accounts().locations().list() of the two discovery services."""
+
+    def __init__(self, api, directory):
+        self.api = api
+        self.directory = directory
+
+    def accounts(self):
+        return self
+
+    def locations(self):
+        return self
+
+    def list(self, **kwargs):
+        self.directory.calls.append((self.api, kwargs))
+        if self.api == "mybusinessaccountmanagement":
+            return _Call({"accounts": [{"name": "accounts/1"}]}, self.directory.delay)
+        return _Call({"locations": [{"name": name} for name in self.directory.locations]})
+
+
+class _Directory:
+    def __init__(self):
+        self.calls = []
+        self.built = []
+        self.locations = ["locations/2"]
+        self.delay = 0
+
+    def build(self, name, version, credentials=None, static_discovery=None, cache_discovery=None):
+        assert static_discovery is True
+        self.built.append(name)
+        return _Service(name, self)
+
+
+@pytest.fixture
+def directory(monkeypatch):
+    directory = _Directory()
+    monkeypatch.setattr(gbp, "build", directory.build)
+    return directory
+
+
+def test_location_is_resolved_once_and_reused(directory):
+    session = GBPSession(ttl=60)
+    assert session.location("creds") == ("accounts/1", "locations/2", None)
+    assert session.location("creds") == ("accounts/1", "locations/2", None)
+    assert sorted(directory.built) == ["mybusinessaccountmanagement", "mybusinessbusinessinformation"]
+    assert len(directory.calls) == 2
+    assert directory.calls[1][1] == {"parent": "accounts/1", "readMask": "name", "pageSize": 100}
+    assert (session.lookups, session.hits) == (1, 1)
+
+
+def test_concurrent_callers_share_one_lookup(directory):
+    directory.delay = 0.05
+    session = GBPSession(ttl=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(session.location("creds"))) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [("accounts/1", "locations/2", None)] * 6
+    assert session.lookups == 1 and len(directory.calls) == 2
+
+
+def test_errors_are_not_cached(directory):
+    directory.locations = []
+    session = GBPSession(ttl=60)
+    account, location, error = session.location("creds")
+    assert (account, location) == ("accounts/1", None) and "No locations found" in error
+    directory.locations = ["locations/2"]
+    assert session.location("creds") == ("accounts/1", "locations/2", None)
+    assert session.lookups == 2
+
+
+def test_expiry_and_refresh_look_the_location_up_again(directory):
+    session = GBPSession(ttl=0)
+    session.location("creds")
+    session.location("creds")
+    assert session.lookups == 2 and directory.built.count("mybusinessaccountmanagement") == 1
+
+    session = GBPSession(ttl=60)
+    session.location("creds")
+    session.refresh()
+    assert session.stats()["location"] is None
+    session.location("creds")
+    assert session.lookups == 2 and directory.built.count("mybusinessaccountmanagement") == 3
+
+
+@pytest.mark.parametrize("status, dropped", [(404, True), (500, False)])
+def test_a_404_from_the_data_api_drops_the_cached_location(directory, monkeypatch, status, dropped):
+    session = GBPSession(ttl=60)
+    monkeypatch.setattr(gbp, "gbp_session", session)
+    session.location("creds")
+    gbp._on_location_error(type("Response", (), {"status_code": status})())
+    assert (session.stats()["location"] is None) is dropped
@@ -0,0 +1,53 @@
+import copy
+
+import pytest
+from google.analytics.data_v1beta.types import MetricType, RunReportResponse
+
+from utils import ga4_utils
+from utils.ga4_utils import fetch_monthly_series
+from utils.report_cache import report_cache
+
+
+class _GA4:
+    """yearMonth report with rows for March and January 2025 only (GA4 omits empty months)."""
+
+    def __init__(self):
+        self.requests = []
+
+    def run_report(self, request):
+        self.requests.append(copy.deepcopy(request))
+        rows = [("202503", ["30", "3"]), ("202501", ["10", "1"])]
+        return RunReportResponse(
+            dimension_headers=[{"name": d.name} for d in request.dimensions],
+            metric_headers=[{"name": m.name, "type_": MetricType.TYPE_INTEGER} for m in request.metrics],
+            rows=[{"dimension_values": [{"value": ym}], "metric_values": [{"value": v} for v in values]}
+                  for ym, values in rows],
+            row_count=len(rows),
+        )
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def test_one_year_month_report_zero_fills_missing_months(ga4):
+    series = fetch_monthly_series(2025, [3, 1, 2, 13], ["sessions", "totalUsers"])
+    assert series == [
+        {"yearMonth": "202501", "month": 1, "sessions": "10", "totalUsers": "1"},
+        {"yearMonth": "202502", "month": 2, "sessions": "0", "totalUsers": "0"},
+        {"yearMonth": "202503", "month": 3, "sessions": "30", "totalUsers": "3"},
+    ]
+    (request,) = ga4.requests
+    assert [d.name for d in request.dimensions] == ["yearMonth"]
+    assert (request.date_ranges[0].start_date, request.date_ranges[0].end_date) == ("2025-01-01", "2025-03-31")
+
+
+def test_no_valid_months_means_no_report(ga4):
+    assert fetch_monthly_series(2025, [0, 13], ["sessions"]) == []
+    assert ga4.requests == []
@@ -0,0 +1,108 @@
+import copy
+from datetime import timedelta
+
+import pytest
+from google.analytics.data_v1beta.types import (
+    DateRange, Dimension, Metric, MetricType, RunReportRequest, RunReportResponse,
+)
+
+from utils import ga4_utils
+from utils import report_cache as report_cache_module
+from utils.ga4_utils import build_report_request, fetch_ga4_data
+from utils.report_cache import (
+    CACHE_CLOSED_TTL, CACHE_OPEN_TTL, ReportCache, is_closed_range, property_today, report_cache, request_cache_key,
+    ttl_for_request,
+)
+
+
+class _GA4:
+    """Answers every report with one Sydney row and keeps the requests it was sent."""
+
+    def __init__(self):
+        self.requests = []
+
+    def run_report(self, request):
+        self.requests.append(copy.deepcopy(request))
+        return RunReportResponse(
+            dimension_headers=[{"name": "city"}],
+            metric_headers=[{"name": "sessions", "type_": MetricType.TYPE_INTEGER}],
+            rows=[{"dimension_values": [{"value": "Sydney"}], "metric_values": [{"value": "4"}]}],
+            row_count=1,
+        )
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def _ranges(*ends):
+    return [DateRange(start_date="2020-01-01", end_date=end) for end in ends]
+
+
+def test_ranges_are_closed_only_once_every_end_is_past_the_settle_window():
+    today = property_today()
+    settled = (today - timedelta(days=report_cache_module.CACHE_SETTLE_DAYS + 1)).isoformat()
+    settling = (today - timedelta(days=report_cache_module.CACHE_SETTLE_DAYS)).isoformat()
+    assert is_closed_range(_ranges(settled))
+    assert not is_closed_range(_ranges(settling))
+    assert not is_closed_range(_ranges(settled, settling))
+    assert not is_closed_range(_ranges("yesterday"))
+    assert not is_closed_range([])
+
+    assert ttl_for_request(RunReportRequest(date_ranges=_ranges("2020-01-31"))) == CACHE_CLOSED_TTL
+    assert ttl_for_request(RunReportRequest(date_ranges=_ranges("today"))) == CACHE_OPEN_TTL
+
+
+def test_cache_key_ignores_field_order_but_not_content():
+    a = RunReportRequest(dimensions=[Dimension(name="city")], metrics=[Metric(name="sessions")], date_ranges=_ranges("2020-01-31"))
+    b = RunReportRequest(date_ranges=_ranges("2020-01-31"), metrics=[Metric(name="sessions")], dimensions=[Dimension(name="city")])
+    c = RunReportRequest(dimensions=[Dimension(name="city")], metrics=[Metric(name="sessions")], date_ranges=_ranges("2020-02-29"))
+    assert request_cache_key(a) == request_cache_key(b) != request_cache_key(c)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ReportCache(max_entries=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    assert cache.get("a") == 1
+    cache.set("c", 3, ttl=60)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert cache.evictions == 1
+
+
+def test_expired_and_open_entries_are_dropped(monkeypatch):
+    cache = ReportCache(max_entries=4)
+    cache.set("closed", 1, ttl=60, closed=True)
+    cache.set("open", 2, ttl=60)
+    cache.set("never", 3, ttl=0)
+    assert cache.get("never") is None
+    assert cache.invalidate(open_only=True) == 1
+    assert cache.get("closed") == 1
+
+    now = report_cache_module.time.time()
+    monkeypatch.setattr(report_cache_module.time, "time", lambda: now + 61)
+    assert cache.get("closed") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ReportCache(max_entries=0)
+    cache.set("a", 1, ttl=60)
+    assert cache.get("a") is None
+    assert cache.stats()["enabled"] is False
+
+
+def test_repeat_reports_are_served_from_cache(ga4):
+    args = ("2020-01-01", "2020-01-31", ["city"], ["sessions"])
+    first = fetch_ga4_data(*args)
+    first[0]["sessions"] = "mutated"
+    assert fetch_ga4_data(*args) == [{"city": "Sydney", "sessions": "4"}]
+    assert len(ga4.requests) == 1
+    assert fetch_ga4_data(*args, use_cache=False) == [{"city": "Sydney", "sessions": "4"}]
+    assert len(ga4.requests) == 2
+    assert request_cache_key(build_report_request(*args, 10000)) == request_cache_key(ga4.requests[0])
@@ -0,0 +1,86 @@
+import copy
+import threading
+
+import pytest
+from google.analytics.data_v1beta.types import MetricType, RunReportResponse
+
+from utils import ga4_utils, report_store
+from utils.ga4_utils import fetch_ga4_data
+from utils.report_cache import report_cache
+from utils.report_store import ReportStore, get_report_store
+
+
+class _GA4:
+    """Answers every report with one Sydney row and keeps the requests it was sent."""
+
+    def __init__(self):
+        self.requests = []
+
+    def run_report(self, request):
+        self.requests.append(copy.deepcopy(request))
+        return RunReportResponse(
+            dimension_headers=[{"name": "city"}],
+            metric_headers=[{"name": "sessions", "type_": MetricType.TYPE_INTEGER}],
+            rows=[{"dimension_values": [{"value": "Sydney"}], "metric_values": [{"value": "4"}]}],
+            row_count=1,
+        )
+
+
+@pytest.fixture
+def shared_store(monkeypatch, tmp_path):
+    """GA4_REPORT_STORE_PATH points at a fresh file; the GA4 client is a fake."""
+    monkeypatch.setenv("GA4_REPORT_STORE_PATH", str(tmp_path / "reports.sqlite"))
+    monkeypatch.setattr(report_store, "_store", None)
+    monkeypatch.setattr(report_store, "_store_failed", False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def test_values_round_trip_across_threads(tmp_path):
+    store = ReportStore(str(tmp_path / "reports.sqlite"))
+    store.set("k", {"rows": [1, 2]}, {"dims": ["city"]})
+    seen = []
+    t = threading.Thread(target=lambda: seen.append(store.get("k")))
+    t.start()
+    t.join()
+    assert seen == [{"rows": [1, 2]}]
+    assert store.get("missing") is None
+    stats = store.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["writes"], stats["errors"]) == (1, 1, 1, 1, 0)
+    assert store.invalidate("k") == 1 and store.get("k") is None
+
+
+def test_sqlite_errors_are_misses_and_skipped_writes(tmp_path):
+    store = ReportStore(str(tmp_path))  # a directory: SQLite cannot open it
+    assert store.get("k") is None
+    store.set("k", 1)
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["writes"]) == (0, 1, 0)
+    assert stats["entries"] is None
+    assert stats["errors"] == 3 and stats["lastError"]
+
+
+def test_store_is_off_without_a_path(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    assert get_report_store() is None
+    assert report_store.report_store_stats() == {"enabled": False}
+
+
+def test_closed_ranges_survive_a_cold_cache(shared_store):
+    args = ("2020-01-01", "2020-01-31", ["city"], ["sessions"])
+    assert fetch_ga4_data(*args) == [{"city": "Sydney", "sessions": "4"}]
+    report_cache.invalidate()
+    assert fetch_ga4_data(*args) == [{"city": "Sydney", "sessions": "4"}]
+    assert len(shared_store.requests) == 1
+    assert get_report_store().stats()["entries"] == 1
+
+
+def test_open_ranges_are_never_stored(shared_store):
+    fetch_ga4_data("2020-01-01", "today", ["city"], ["sessions"])
+    report_cache.invalidate()
+    fetch_ga4_data("2020-01-01", "today", ["city"], ["sessions"])
+    assert len(shared_store.requests) == 2
+    assert get_report_store().stats()["entries"] == 0
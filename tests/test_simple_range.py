@@ -0,0 +1,102 @@
+import copy
+
+import pytest
+from fastapi.testclient import TestClient
+from google.analytics.data_v1beta.types import MetricType, RunReportResponse
+
+from api.index import app
+from utils import ga4_async, ga4_utils
+from utils.report_cache import report_cache
+from utils.simple_stats import OVERVIEW_METRICS, resolve_oar_featured
+
+BUNDLE_KEYS = {
+    "start_date", "end_date", "ymKey", "oarFeaturedSlug", "oarFeaturedTitle", "oarStoryMonthShort",
+    "oarUsedPriorMonthStory", "overview", "sources", "pagesMerge", "pathFeature", "cities", "events",
+}
+
+
+class _GA4:
+    """Only the yearMonth overview report has rows (January 2025); every other report is empty."""
+
+    def __init__(self):
+        self.requests = []
+
+    def run_report(self, request):
+        self.requests.append(copy.deepcopy(request))
+        dims = [d.name for d in request.dimensions]
+        metrics = [m.name for m in request.metrics]
+        rows = []
+        if dims == ["yearMonth"]:
+            rows = [{"dimension_values": [{"value": "202501"}],
+                     "metric_values": [{"value": str(10 * (i + 1))} for i in range(len(metrics))]}]
+        return RunReportResponse(
+            dimension_headers=[{"name": d} for d in dims],
+            metric_headers=[{"name": m, "type_": MetricType.TYPE_INTEGER} for m in metrics],
+            rows=rows,
+            row_count=len(rows),
+        )
+
+
+class _AsyncGA4:
+    def __init__(self, fake):
+        self._fake = fake
+
+    async def run_report(self, request):
+        return self._fake.run_report(request)
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    monkeypatch.setattr(ga4_utils, "_credentials", None)
+    monkeypatch.setattr(ga4_utils, "_credentials_source", "test")
+    monkeypatch.setattr(ga4_async, "BetaAnalyticsDataAsyncClient", lambda **kwargs: _AsyncGA4(fake))
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def test_featured_story_falls_back_to_the_newest_prior_month():
+    paths = {"2024-11-01": "x", "2024-11": "/on-a-roll/nov/", "2025-02": "/on-a-roll/feb/"}
+    titles = {"2024-11": "November"}
+    assert resolve_oar_featured(paths, titles, 2025, 2) == {
+        "slug": "/on-a-roll/feb/", "title": "", "sourceMonthNum": 2, "usedPriorMonth": False,
+    }
+    assert resolve_oar_featured(paths, titles, 2025, 1) == {
+        "slug": "/on-a-roll/nov/", "title": "November", "sourceMonthNum": 11, "usedPriorMonth": True,
+    }
+    assert resolve_oar_featured({}, {}, 2025, 1)["slug"] == ""
+
+
+def test_bundles_have_the_month_bundle_shape(ga4):
+    res = TestClient(app).get("/api/analytics/simple-range", params={
+        "year": 2025, "months": "2,1", "featured": "/on-a-roll/jan/,",
+    })
+    assert res.status_code == 200
+    data = res.json()["data"]
+    assert (data["year"], data["monthIndices"]) == (2025, [1, 2])
+
+    jan, feb = data["bundles"]
+    assert set(jan) == set(feb) == BUNDLE_KEYS
+    assert (jan["ymKey"], jan["start_date"], jan["end_date"]) == ("2025-01", "2025-01-01", "2025-01-31")
+    assert (feb["ymKey"], feb["start_date"], feb["end_date"]) == ("2025-02", "2025-02-01", "2025-02-28")
+    assert jan["overview"] == {met: str(10 * (i + 1)) for i, met in enumerate(OVERVIEW_METRICS)}
+    assert feb["overview"] == {met: "0" for met in OVERVIEW_METRICS}
+
+    assert (jan["oarFeaturedSlug"], jan["oarStoryMonthShort"], jan["oarUsedPriorMonthStory"]) == ("/on-a-roll/jan/", "Jan", False)
+    assert jan["pathFeature"]["data"]["screenPageViews"] == 0
+    assert jan["pathFeature"]["data"]["path"] == "/on-a-roll/jan/"
+    assert (feb["oarFeaturedSlug"], feb["pathFeature"]) == (None, {"success": True, "data": {"screenPageViews": 0}})
+    for bundle in (jan, feb):
+        for name in ("sources", "pagesMerge", "cities", "events"):
+            assert bundle[name]["success"] is True and isinstance(bundle[name]["data"], list)
+        assert {"generate_lead_by_context", "generate_lead_breakdown_error"} <= set(bundle["events"])
+
+
+def test_route_rejects_bad_months(ga4):
+    client = TestClient(app)
+    for months in ("", "0", "13", "1,x"):
+        assert client.get("/api/analytics/simple-range", params={"year": 2025, "months": months}).status_code == 400
+    assert ga4.requests == []
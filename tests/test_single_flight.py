@@ -0,0 +1,124 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_threads_share_one_call():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def fn():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return {"rows": 1}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", fn)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", fn))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    while flight.stats()["collapsed"] < 3:
+        threading.Event().wait(0.001)
+    release.set()
+    for t in [leader] + followers:
+        t.join()
+
+    assert runs == [1]
+    assert len(results) == 4 and all(r is results[0] for r in results)
+    assert flight.stats() == {"calls": 4, "executions": 1, "collapsed": 3, "inFlight": 0}
+    assert flight.do("k", lambda: "again") == "again"
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError("quota")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("k", fail)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.stats()["collapsed"] < 1:
+        threading.Event().wait(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+    assert len(errors) == 2 and errors[0] is errors[1]
+    assert flight.do("k", lambda: 1) == 1
+
+
+def test_coroutines_share_one_task():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def fn():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "rows"
+
+    async def run():
+        return await asyncio.gather(*(flight.do_async("k", fn) for _ in range(5)), flight.do_async("other", fn))
+
+    assert asyncio.run(run()) == ["rows"] * 6
+    assert runs == [1, 1]
+    assert flight.stats() == {"calls": 6, "executions": 2, "collapsed": 4, "inFlight": 0}
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_shared_call():
+    flight = SingleFlight("test")
+
+    async def fn():
+        await asyncio.sleep(0.02)
+        return "rows"
+
+    async def run():
+        first = asyncio.create_task(flight.do_async("k", fn))
+        second = asyncio.create_task(flight.do_async("k", fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "rows"
+    assert flight.stats()["executions"] == 1
+
+
+def test_a_call_every_waiter_abandoned_still_finishes_and_leaves_the_registry():
+    flight = SingleFlight("test")
+    finished = []
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        finished.append(1)
+        raise ValueError("nobody is listening")
+
+    async def run():
+        waiter = asyncio.create_task(flight.do_async("k", fn))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0.03)
+        return flight.stats()["inFlight"]
+
+    assert asyncio.run(run()) == 0
+    assert finished == [1]
@@ -0,0 +1,105 @@
+import copy
+
+import pytest
+from fastapi.testclient import TestClient
+from google.analytics.data_v1beta.types import MetricType, RunReportResponse
+
+from api.index import app
+from utils import ga4_async, ga4_utils
+from utils.ga4_utils import TOP_PAGES_MAX_K, check_top_pages_k, fetch_top_pages_matrix, top_pages_matrix_from_response
+from utils.report_cache import report_cache
+
+# (yearMonth, pagePath, screenPageViews), most viewed first like the ordered report
+ROWS = [
+    ("202501", "/a/", 50), ("202502", "/b/", 40), ("202501", "/b/", 30), ("202501", "/c/", 30),
+    ("202501", "/d/", 10), ("202502", "/a/", 5),
+]
+
+
+def _response(rows, row_count=None):
+    return RunReportResponse(
+        dimension_headers=[{"name": "yearMonth"}, {"name": "pagePath"}, {"name": "pageTitle"}],
+        metric_headers=[{"name": "screenPageViews", "type_": MetricType.TYPE_INTEGER}],
+        rows=[{"dimension_values": [{"value": ym}, {"value": path}, {"value": path.strip("/").upper()}],
+               "metric_values": [{"value": str(views)}]} for ym, path, views in rows],
+        row_count=len(rows) if row_count is None else row_count,
+    )
+
+
+class _GA4:
+    """Answers every report with ROWS and keeps the requests it was sent."""
+
+    def __init__(self):
+        self.requests = []
+
+    def run_report(self, request):
+        self.requests.append(copy.deepcopy(request))
+        return _response(ROWS)
+
+
+class _AsyncGA4:
+    def __init__(self, fake):
+        self._fake = fake
+
+    async def run_report(self, request):
+        return self._fake.run_report(request)
+
+
+@pytest.fixture
+def ga4(monkeypatch):
+    monkeypatch.delenv("GA4_REPORT_STORE_PATH", raising=False)
+    fake = _GA4()
+    monkeypatch.setattr(ga4_utils, "_client", fake)
+    monkeypatch.setattr(ga4_utils, "_credentials", None)
+    monkeypatch.setattr(ga4_utils, "_credentials_source", "test")
+    monkeypatch.setattr(ga4_async, "BetaAnalyticsDataAsyncClient", lambda **kwargs: _AsyncGA4(fake))
+    report_cache.invalidate()
+    yield fake
+    report_cache.invalidate()
+
+
+def _paths(month):
+    return [p["pagePath"] for p in month["pages"]]
+
+
+def test_top_k_per_month_keeps_ga4_order_on_ties():
+    months = top_pages_matrix_from_response(_response(ROWS), k=2)
+    assert [m["yearMonth"] for m in months] == ["202501", "202502"]
+    assert [_paths(m) for m in months] == [["/a/", "/b/"], ["/b/", "/a/"]]
+    assert months[0]["pages"][0] == {"pagePath": "/a/", "pageTitle": "A", "screenPageViews": 50}
+    assert all(m["complete"] for m in months)
+
+
+def test_truncated_months_short_of_k_are_incomplete():
+    months = top_pages_matrix_from_response(_response(ROWS, row_count=100), k=3)
+    assert [(m["yearMonth"], m["complete"]) for m in months] == [("202501", True), ("202502", False)]
+
+
+@pytest.mark.parametrize("k, ok", [(0, False), (1, True), (TOP_PAGES_MAX_K, True), (TOP_PAGES_MAX_K + 1, False)])
+def test_k_bounds(k, ok):
+    if ok:
+        assert check_top_pages_k(k) == k
+    else:
+        with pytest.raises(ValueError):
+            check_top_pages_k(k)
+
+
+def test_one_report_serves_every_k_and_fills_empty_months(ga4):
+    months = fetch_top_pages_matrix("2025-01-01", "2025-03-31", k=1)
+    assert [(m["yearMonth"], _paths(m)) for m in months] == [("202501", ["/a/"]), ("202502", ["/b/"]), ("202503", [])]
+    assert len(fetch_top_pages_matrix("2025-01-01", "2025-03-31", k=4)[0]["pages"]) == 4
+    assert len(ga4.requests) == 2  # each k is its own cache variant
+    assert fetch_top_pages_matrix("2025-01-01", "2025-03-31", k=1) == months
+    assert len(ga4.requests) == 2
+    (order,) = ga4.requests[0].order_bys
+    assert (order.metric.metric_name, order.desc) == ("screenPageViews", True)
+
+
+def test_route_rejects_k_out_of_bounds(ga4):
+    client = TestClient(app)
+    params = {"start_date": "2025-01-01", "end_date": "2025-02-28"}
+    for k in (0, TOP_PAGES_MAX_K + 1):
+        assert client.get("/api/analytics/top-pages-matrix", params={**params, "k": k}).status_code == 400
+    assert ga4.requests == []
+    data = client.get("/api/analytics/top-pages-matrix", params={**params, "k": TOP_PAGES_MAX_K}).json()["data"]
+    assert [len(m["pages"]) for m in data] == [4, 2]
@@ -0,0 +1,225 @@
+"""
+Optional local warehouse (SQLite) of daily-grain GA4 facts for the dashboard's dimensions.
+
+Once the days are synced, additive metrics summed over days answer any range locally:
+sources, cities, countries, devices and top events stop costing GA4 queries.
+Event counts and page views sum exactly. Session metrics are an approximation: GA4 counts a
+session that crosses midnight on both days, and each daily report rolls its own low-volume
+tail into `(other)`, so summed sessions can run slightly above GA4's whole-range figure.
+Non-additive metrics (totalUsers, activeUsers, engagementRate, bounceRate, …) can't be
+summed across days; those reports still go to GA4.
+
+Enable with GA4_FACT_STORE_PATH (e.g. .cache/ga4_facts.sqlite) and fill it with
+scripts/sync_fact_store.py; each run fetches only days that are missing or still settling.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from typing import Optional
+
+from utils.report_cache import CACHE_SETTLE_DAYS, property_today
+
+# Fact sets: dimensions stored per day (plus the implicit `date`) and their additive metrics.
+FACT_SETS = {
+    "sessionSourceMedium": {"dimensions": ["sessionSourceMedium"], "metrics": ["sessions", "engagedSessions"]},
+    "pagePath": {"dimensions": ["pagePath", "pageTitle"], "metrics": ["screenPageViews"]},
+    "city": {"dimensions": ["city"], "metrics": ["sessions"]},
+    "country": {"dimensions": ["country"], "metrics": ["sessions"]},
+    "eventName": {"dimensions": ["eventName"], "metrics": ["eventCount"]},
+    "deviceCategory": {"dimensions": ["deviceCategory"], "metrics": ["sessions"]},
+}
+SCOPES = ("all", "au")
+
+# Days still inside GA4's settling window are only trusted for this long after a sync
+FACT_STORE_OPEN_MAX_AGE = int(os.environ.get('GA4_FACT_STORE_OPEN_MAX_AGE', '900'))
+
+# Dimension values are joined with the unit separator (never present in GA4 values)
+_SEP = "\x1f"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS facts (
+    fact TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    date TEXT NOT NULL,
+    dims TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (fact, scope, date, dims, metric)
+);
+CREATE TABLE IF NOT EXISTS synced_days (
+    fact TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    date TEXT NOT NULL,
+    final INTEGER NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (fact, scope, date)
+);
+"""
+
+
+def fact_set_for(dimensions: list, metrics: list) -> Optional[str]:
+    """Name of the fact set that can answer (dimensions, metrics) by summing days, else None."""
+    for name, spec in FACT_SETS.items():
+        if list(dimensions) == spec["dimensions"] and metrics and set(metrics) <= set(spec["metrics"]):
+            return name
+    return None
+
+
+def day_range(start: date, end: date) -> list:
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def is_final_day(day: date) -> bool:
+    """True once GA4 has finished processing the day (same settle window as the report cache)."""
+    return day < property_today() - timedelta(days=CACHE_SETTLE_DAYS)
+
+
+class FactStore:
+    """Daily facts + per-day sync log in SQLite (WAL); one connection per thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialised = False
+        self._stats_lock = threading.Lock()
+        self.local_answers = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout=10000')
+        with self._init_lock:
+            if not self._initialised:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(_SCHEMA)
+                self._initialised = True
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn = conn
+        return conn
+
+    # --- sync bookkeeping --------------------------------------------------------------
+
+    def days_to_sync(self, fact: str, scope: str, start: date, end: date) -> list:
+        """Days in [start, end] that are missing, or were synced before they were final."""
+        rows = self._conn().execute(
+            'SELECT date FROM synced_days WHERE fact = ? AND scope = ? AND date BETWEEN ? AND ? AND final = 1',
+            (fact, scope, start.isoformat(), end.isoformat()),
+        ).fetchall()
+        done = {r[0] for r in rows}
+        return [d for d in day_range(start, end) if d.isoformat() not in done]
+
+    def write_days(self, fact: str, scope: str, days: list, rows) -> int:
+        """
+        Replace the facts for `days` with `rows` ((date 'YYYY-MM-DD', dims tuple, {metric: value}))
+        in one transaction, and mark every day synced (days without rows are zero days).
+        """
+        conn = self._conn()
+        now = time.time()
+        count = 0
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for d in days:
+                conn.execute('DELETE FROM facts WHERE fact = ? AND scope = ? AND date = ?', (fact, scope, d.isoformat()))
+            for day, dims, values in rows:
+                key = _SEP.join(dims)
+                conn.executemany(
+                    'INSERT OR REPLACE INTO facts (fact, scope, date, dims, metric, value) VALUES (?, ?, ?, ?, ?, ?)',
+                    [(fact, scope, day, key, metric, value) for metric, value in values.items()],
+                )
+                count += 1
+            conn.executemany(
+                'INSERT OR REPLACE INTO synced_days (fact, scope, date, final, synced_at) VALUES (?, ?, ?, ?, ?)',
+                [(fact, scope, d.isoformat(), int(is_final_day(d)), now) for d in days],
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return count
+
+    def covers(self, fact: str, scope: str, start: date, end: date) -> bool:
+        """Every day of the range is synced (settling days only if synced recently)."""
+        fresh_after = time.time() - FACT_STORE_OPEN_MAX_AGE
+        row = self._conn().execute(
+            'SELECT COUNT(*) FROM synced_days WHERE fact = ? AND scope = ? AND date BETWEEN ? AND ? '
+            'AND (final = 1 OR synced_at >= ?)',
+            (fact, scope, start.isoformat(), end.isoformat(), fresh_after),
+        ).fetchone()
+        return row[0] == (end - start).days + 1
+
+    # --- queries -----------------------------------------------------------------------
+
+    def count_local_answer(self) -> None:
+        """Counted from request threads and asyncio.to_thread workers alike."""
+        with self._stats_lock:
+            self.local_answers += 1
+
+    def totals(self, fact: str, scope: str, start: date, end: date, metrics: list) -> dict:
+        """{dims tuple: {metric: summed value}} over [start, end]."""
+        placeholders = ",".join("?" * len(metrics))
+        cur = self._conn().execute(
+            f'SELECT dims, metric, SUM(value) FROM facts WHERE fact = ? AND scope = ? AND date BETWEEN ? AND ? '
+            f'AND metric IN ({placeholders}) GROUP BY dims, metric',
+            (fact, scope, start.isoformat(), end.isoformat(), *metrics),
+        )
+        out: dict = {}
+        for dims, metric, value in cur:
+            out.setdefault(tuple(dims.split(_SEP)), {})[metric] = value
+        return out
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        synced = conn.execute(
+            'SELECT fact, scope, COUNT(*), MIN(date), MAX(date), SUM(final) FROM synced_days GROUP BY fact, scope'
+        ).fetchall()
+        return {
+            "enabled": True,
+            "path": self.path,
+            "facts": conn.execute('SELECT COUNT(*) FROM facts').fetchone()[0],
+            "localAnswers": self.local_answers,
+            "synced": [
+                {"fact": f, "scope": s, "days": n, "from": lo, "to": hi, "finalDays": final}
+                for f, s, n, lo, hi, final in synced
+            ],
+        }
+
+
+_store: Optional[FactStore] = None
+_store_failed = False
+_store_lock = threading.Lock()
+
+
+def get_fact_store() -> Optional[FactStore]:
+    """Shared store when GA4_FACT_STORE_PATH is set, else None. Errors opening it disable it."""
+    global _store, _store_failed
+    path = os.environ.get('GA4_FACT_STORE_PATH', '').strip()
+    if not path or _store_failed:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None and not _store_failed:
+                try:
+                    store = FactStore(path)
+                    store._conn()
+                    _store = store
+                except (OSError, sqlite3.Error) as e:
+                    print(f"GA4 fact store unavailable at {path}: {e}")
+                    _store_failed = True
+    return _store
+
+
+def fact_store_stats() -> dict:
+    store = get_fact_store()
+    if store is None:
+        return {"enabled": False}
+    return store.stats()
@@ -0,0 +1,397 @@
+"""
+Async GA4 data layer (BetaAnalyticsDataAsyncClient) for `async def` FastAPI routes.
+
+Same requests, row shapes, report cache and SQLite store as utils.ga4_utils, but an
+endpoint can await several reports concurrently instead of holding a threadpool worker
+per blocking run_report. SQLite reads and writes (report store, fact store) run in a worker
+thread so a busy database never stalls the event loop; in-process cache hits stay inline.
+In-flight RPCs, token reserves and RESOURCE_EXHAUSTED backoff come from the shared
+utils.ga4_quota scheduler, whose concurrency slots are the same ones sync callers use.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import threading
+import weakref
+from typing import Optional
+
+from google.analytics.data_v1beta import BetaAnalyticsDataAsyncClient
+from google.analytics.data_v1beta.types import FilterExpression, RunReportRequest
+
+from utils import ga4_utils
+from utils.ga4_utils import (
+    GA4_BATCH_SIZE,
+    SCOPES,
+    _DIM_FORM_CONTEXT,
+    _apply_batch_response,
+    _batch_request,
+    _first_metric_int,
+    _format_batch_results,
+    _format_rows,
+    _monthly_series_rows,
+    _monthly_series_span,
+    _plan_batch,
+    _remember,
+    _stored_value,
+    _variant_key,
+    analytics_dimension_filter,
+    build_event_counts_request,
+    build_path_months_request,
+    build_path_views_request,
+    build_paths_views_request,
+    build_report_request,
+    build_top_pages_matrix_request,
+    can_split_scopes,
+    check_scopes,
+    check_top_pages_k,
+    event_counts_from_response,
+    event_names,
+    facts_answer,
+    form_context_rows,
+    ga4_flight,
+    generate_lead_filter_expression,
+    get_ga4_credentials,
+    is_closed_range,
+    path_patterns,
+    paths_views_from_response,
+    paths_views_result,
+    report_cache,
+    rows_from_response,
+    scopes_report_request,
+    scopes_rows_from_response,
+    split_scope_rows,
+    top_pages_matrix_from_response,
+    top_pages_months,
+    views_by_month_from_response,
+)
+from utils.ga4_columnar import ColumnarReport, check_format
+from utils.ga4_quota import quota_scheduler
+
+# grpc.aio channels belong to the event loop that created them: one client per loop
+_loop_state: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_state_lock = threading.Lock()
+# Close tasks for replaced clients (held so they are not collected mid-close)
+_closing: set = set()
+
+
+async def _close_client(client) -> None:
+    try:
+        await client.transport.close()
+    except Exception as e:
+        print(f"Error closing replaced GA4 async client: {e}")
+
+
+def _state():
+    """(async client, generation) for the running loop; rebuilt (and the old one closed) after reset_ga4_client()."""
+    loop = asyncio.get_running_loop()
+    generation = ga4_utils._client_generation
+    st = _loop_state.get(loop)
+    if st is None or st[1] != generation:
+        with _state_lock:
+            st = _loop_state.get(loop)
+            if st is None or st[1] != generation:
+                creds = get_ga4_credentials()
+                client = BetaAnalyticsDataAsyncClient(credentials=creds) if creds else BetaAnalyticsDataAsyncClient()
+                if st is not None:
+                    task = loop.create_task(_close_client(st[0]))
+                    _closing.add(task)
+                    task.add_done_callback(_closing.discard)
+                st = (client, generation)
+                _loop_state[loop] = st
+    return st
+
+
+def get_ga4_async_client() -> BetaAnalyticsDataAsyncClient:
+    """Shared async client for the running event loop."""
+    return _state()[0]
+
+
+async def _run_report(request: RunReportRequest):
+    client = get_ga4_async_client()
+
+    async def call():
+        response = await client.run_report(request=request)
+        quota_scheduler.observe(response.property_quota)
+        return response
+
+    return await quota_scheduler.call_async(call)
+
+
+async def run_report_cached_async(request: RunReportRequest, convert, use_cache: bool = True, variant: str = ""):
+    """Async twin of ga4_utils.run_report_cached (same cache keys, store and single-flight counters)."""
+    key = _variant_key(request, variant)
+    if use_cache:
+        value = report_cache.get(key)
+        if value is None and is_closed_range(request.date_ranges):
+            value = await asyncio.to_thread(_stored_value, request, key)
+        if value is not None:
+            return value
+
+    async def fetch():
+        fresh = convert(await _run_report(request))
+        if use_cache:
+            await asyncio.to_thread(_remember, request, key, fresh)
+        return fresh
+
+    return await ga4_flight.do_async(key, fetch)
+
+
+async def fetch_ga4_data_async(
+    start_date: str,
+    end_date: str,
+    dimensions: list,
+    metrics: list,
+    limit: int = 10000,
+    compare_start_date: str = None,
+    compare_end_date: str = None,
+    dimension_filter: Optional[FilterExpression] = None,
+    use_cache: bool = True,
+    typed_metrics: bool = False,
+    format: str = "rows",
+):
+    """Async fetch_ga4_data: list of dicts, *_compare keys for the compare range (or a ColumnarReport)."""
+    fmt = check_format(format)
+    request = build_report_request(
+        start_date,
+        end_date,
+        dimensions,
+        metrics,
+        limit,
+        compare_start_date,
+        compare_end_date,
+        dimension_filter=dimension_filter,
+    )
+    is_compare = len(request.date_ranges) > 1
+    rows = await run_report_cached_async(
+        request,
+        lambda response: rows_from_response(response, dimensions, metrics, is_compare, typed=typed_metrics),
+        use_cache=use_cache,
+        variant="typed" if typed_metrics else "",
+    )
+    if fmt == "columnar":
+        return ColumnarReport.from_rows(rows, dimensions, metrics, is_compare)
+    return [dict(r) for r in rows]
+
+
+async def fetch_analytics_data_async(
+    start_date: str,
+    end_date: str,
+    dimensions: list,
+    metrics: list,
+    limit: int = 10000,
+    compare_start_date: str = None,
+    compare_end_date: str = None,
+    au_only: bool = False,
+    format: str = "rows",
+    scopes: Optional[list] = None,
+    cities: Optional[list] = None,
+):
+    """Async fetch_analytics_data (same signature, same local fact-store answers)."""
+    if scopes:
+        if cities:
+            raise ValueError("cities cannot be combined with scopes")
+        return await fetch_analytics_scopes_async(start_date, end_date, dimensions, metrics, limit,
+                                                  compare_start_date, compare_end_date, scopes=scopes, format=format)
+    local = await asyncio.to_thread(
+        facts_answer, start_date, end_date, dimensions, metrics, limit, compare_start_date, compare_end_date, au_only,
+        dimension_values={"city": cities} if cities else None,
+    )
+    if local is not None:
+        return _format_rows(local, dimensions, metrics, bool(compare_start_date and compare_end_date), format)
+    return await fetch_ga4_data_async(
+        start_date,
+        end_date,
+        dimensions,
+        metrics,
+        limit,
+        compare_start_date,
+        compare_end_date,
+        dimension_filter=analytics_dimension_filter(au_only, cities),
+        format=format,
+    )
+
+
+async def fetch_analytics_scopes_async(
+    start_date: str,
+    end_date: str,
+    dimensions: list,
+    metrics: list,
+    limit: int = 10000,
+    compare_start_date: str = None,
+    compare_end_date: str = None,
+    scopes: list = SCOPES,
+    format: str = "rows",
+) -> dict:
+    """Async fetch_analytics_scopes; the per-scope fallback queries run concurrently."""
+    scopes = check_scopes(scopes)
+    compare = bool(compare_start_date and compare_end_date)
+    answers = await asyncio.gather(*(
+        asyncio.to_thread(facts_answer, start_date, end_date, dimensions, metrics, limit,
+                          compare_start_date, compare_end_date, s == "au")
+        for s in scopes
+    ))
+    out = {s: _format_rows(rows, dimensions, metrics, compare, format) for s, rows in zip(scopes, answers) if rows is not None}
+    missing = [s for s in scopes if s not in out]
+    if can_split_scopes(metrics, missing):
+        request, query_dims = scopes_report_request(start_date, end_date, dimensions, metrics, compare_start_date, compare_end_date)
+        value = await run_report_cached_async(
+            request,
+            lambda response: scopes_rows_from_response(response, query_dims, metrics, compare),
+            variant="scopes",
+        )
+        split = split_scope_rows(value, dimensions, metrics, limit, missing)
+        if split is not None:
+            out.update({s: _format_rows(split[s], dimensions, metrics, compare, format) for s in missing})
+            missing = []
+    results = await asyncio.gather(*(
+        fetch_ga4_data_async(start_date, end_date, dimensions, metrics, limit, compare_start_date, compare_end_date,
+                             dimension_filter=analytics_dimension_filter(s == "au"), format=format)
+        for s in missing
+    ))
+    out.update(zip(missing, results))
+    return {s: out[s] for s in scopes}
+
+
+async def fetch_path_screen_page_views_total_async(
+    start_date: str,
+    end_date: str,
+    path_value: str,
+    match_type: str = "contains",
+    au_only: bool = False,
+) -> int:
+    """Async fetch_path_screen_page_views_total."""
+    request = build_path_views_request(start_date, end_date, path_value, match_type, au_only)
+    if request is None:
+        return 0
+    return await run_report_cached_async(request, _first_metric_int)
+
+
+async def fetch_path_views_by_month_async(
+    start_date: str,
+    end_date: str,
+    path_value: str,
+    match_type: str = "contains",
+    au_only: bool = False,
+) -> dict:
+    """Async fetch_path_views_by_month."""
+    request = build_path_months_request(start_date, end_date, path_value, match_type, au_only)
+    if request is None:
+        return {}
+    return dict(await run_report_cached_async(request, views_by_month_from_response))
+
+
+async def fetch_paths_screen_page_views_totals_async(
+    start_date: str,
+    end_date: str,
+    paths: list,
+    match_type: str = "contains",
+    au_only: bool = False,
+    by_month: bool = False,
+) -> list:
+    """Async fetch_paths_screen_page_views_totals (the truncation fallback runs concurrently)."""
+    patterns = path_patterns(paths, match_type)
+    if not patterns:
+        return []
+    request = build_paths_views_request(start_date, end_date, patterns, au_only, by_month)
+    value = await run_report_cached_async(request, lambda response: paths_views_from_response(response, patterns, by_month))
+    if not value["complete"]:
+        if by_month:
+            months = await asyncio.gather(*(
+                fetch_path_views_by_month_async(start_date, end_date, p, m, au_only) for p, m in patterns
+            ))
+            value = {"totals": [sum(m.values()) for m in months], "byMonth": list(months)}
+        else:
+            totals = await asyncio.gather(*(
+                fetch_path_screen_page_views_total_async(start_date, end_date, p, m, au_only) for p, m in patterns
+            ))
+            value = {"totals": list(totals), "byMonth": None}
+    return paths_views_result(patterns, value)
+
+
+async def fetch_event_counts_async(
+    start_date: str,
+    end_date: str,
+    names: list,
+    au_only: bool = False,
+    by_month: bool = False,
+) -> list:
+    """Async fetch_event_counts."""
+    names = event_names(names)
+    if not names:
+        return []
+    request = build_event_counts_request(start_date, end_date, names, au_only, by_month)
+    rows = await run_report_cached_async(request, lambda response: event_counts_from_response(response, names, by_month))
+    return copy.deepcopy(rows)
+
+
+async def fetch_top_pages_matrix_async(start_date: str, end_date: str, k: int = 5, au_only: bool = False) -> list:
+    """Async fetch_top_pages_matrix."""
+    k = check_top_pages_k(k)
+    request = build_top_pages_matrix_request(start_date, end_date, au_only)
+    months = await run_report_cached_async(
+        request, lambda response: top_pages_matrix_from_response(response, k), variant=f"top{k}"
+    )
+    return top_pages_months(start_date, end_date, copy.deepcopy(months))
+
+
+async def fetch_blog_screen_page_views_total_async(
+    start_date: str, end_date: str, path_contains: str = "blog", au_only: bool = False
+) -> int:
+    return await fetch_path_screen_page_views_total_async(
+        start_date, end_date, path_contains, match_type="contains", au_only=au_only
+    )
+
+
+async def fetch_generate_lead_by_form_context_async(
+    start_date: str,
+    end_date: str,
+    limit: int = 25,
+    compare_start_date: str = None,
+    compare_end_date: str = None,
+    au_only: bool = False,
+):
+    """Async fetch_generate_lead_by_form_context."""
+    raw = await fetch_ga4_data_async(
+        start_date,
+        end_date,
+        [_DIM_FORM_CONTEXT],
+        ["eventCount"],
+        limit,
+        compare_start_date,
+        compare_end_date,
+        dimension_filter=generate_lead_filter_expression(au_only),
+    )
+    return form_context_rows(raw)
+
+
+async def fetch_monthly_series_async(year: int, months: list, metrics: list, au_only: bool = False) -> list:
+    """Async fetch_monthly_series (one yearMonth report, zero-filled)."""
+    months, start, end = _monthly_series_span(year, months)
+    if not months:
+        return []
+    rows = await fetch_analytics_data_async(start, end, ["yearMonth"], metrics, limit=12, au_only=au_only)
+    return _monthly_series_rows(year, months, metrics, rows)
+
+
+async def fetch_ga4_batch_async(specs: list, use_cache: bool = True) -> list:
+    """Async fetch_ga4_batch: BatchRunReports chunks of GA4_BATCH_SIZE run concurrently."""
+    results, pending = await asyncio.to_thread(_plan_batch, specs, use_cache)
+    client = get_ga4_async_client()
+    chunks = [pending[i:i + GA4_BATCH_SIZE] for i in range(0, len(pending), GA4_BATCH_SIZE)]
+
+    async def call(chunk):
+        return await client.batch_run_reports(request=_batch_request(chunk))
+
+    async def run_chunk(chunk):
+        try:
+            response = await quota_scheduler.call_async(lambda: call(chunk))
+        except Exception as e:
+            for item in chunk:
+                results[item[0]] = {"success": False, "error": str(e)}
+            return
+        await asyncio.to_thread(_apply_batch_response, chunk, response, results)
+
+    await asyncio.gather(*(run_chunk(c) for c in chunks))
+    return _format_batch_results(specs, results)
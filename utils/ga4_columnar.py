@@ -0,0 +1,105 @@
+"""
+Columnar encoding of GA4 row lists (the opt-in `format=columnar` of the analytics routes).
+
+Row dicts repeat every key name per row and carry metrics as strings. Here each dimension is
+dictionary-encoded (unique values once + one small int code per row) and each metric is one
+typed `array` ('q' when every value is an integer, else 'd'). Metric keys include the
+`<metric>_compare` columns of compare reports.
+
+JSON shape (ColumnarReport.to_json()):
+  {"format": "columnar", "rowCount": n,
+   "dimensions": {"city": {"values": ["Sydney", ...], "codes": [0, 1, 0, ...]}},
+   "metrics": {"sessions": [120, 80, ...], "sessions_compare": [...]}}
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Optional
+
+FORMATS = ("rows", "columnar")
+
+
+def check_format(format: Optional[str]) -> str:
+    """Normalised format name; raises ValueError for anything but rows / columnar."""
+    fmt = (format or "rows").strip().lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    return fmt
+
+
+def _number(value):
+    if isinstance(value, (int, float)):
+        return value
+    if value is None or value == "":
+        return 0
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def _metric_array(values: list) -> array:
+    numbers = [_number(v) for v in values]
+    if all(isinstance(n, int) for n in numbers):
+        try:
+            return array('q', numbers)
+        except OverflowError:
+            pass
+    return array('d', numbers)
+
+
+def _code_array(count: int) -> str:
+    if count <= 0xFF:
+        return 'B'
+    if count <= 0xFFFF:
+        return 'H'
+    return 'L'
+
+
+class ColumnarReport:
+    """Dictionary-encoded dimensions + typed metric arrays for one report."""
+
+    __slots__ = ("row_count", "dimensions", "metrics")
+
+    def __init__(self, row_count: int, dimensions: dict, metrics: dict):
+        self.row_count = row_count
+        self.dimensions = dimensions  # name -> (values list, codes array)
+        self.metrics = metrics  # name -> array
+
+    @classmethod
+    def from_rows(cls, rows: list, dimensions: list, metrics: list, compare: bool = False) -> "ColumnarReport":
+        """
+        Encode row dicts (as returned by fetch_ga4_data). Metrics missing from a row (GA4 omits
+        all-zero rows of the compare range) become 0.
+        """
+        dims = {}
+        for dim in dimensions:
+            lookup: dict = {}
+            raw_codes = [lookup.setdefault(row.get(dim, ""), len(lookup)) for row in rows]
+            dims[dim] = (list(lookup), array(_code_array(len(lookup)), raw_codes))
+
+        metric_keys = list(metrics) + ([f"{m}_compare" for m in metrics] if compare else [])
+        mets = {key: _metric_array([row.get(key) for row in rows]) for key in metric_keys}
+        return cls(len(rows), dims, mets)
+
+    def rows(self) -> list:
+        """Decode back to row dicts (numbers instead of strings)."""
+        out = []
+        for i in range(self.row_count):
+            row = {name: values[codes[i]] for name, (values, codes) in self.dimensions.items()}
+            for name, column in self.metrics.items():
+                row[name] = column[i]
+            out.append(row)
+        return out
+
+    def to_json(self) -> dict:
+        return {
+            "format": "columnar",
+            "rowCount": self.row_count,
+            "dimensions": {
+                name: {"values": values, "codes": codes.tolist()}
+                for name, (values, codes) in self.dimensions.items()
+            },
+            "metrics": {name: column.tolist() for name, column in self.metrics.items()},
+        }
@@ -0,0 +1,361 @@
+"""
+GA4 property quota scheduler.
+
+Every report asks GA4 for `return_property_quota`; the scheduler keeps the latest token
+balances (per day / per hour / per project per hour) and refuses new reports once a balance
+drops below a reserve, instead of letting the property hit RESOURCE_EXHAUSTED mid-load.
+It also caps concurrent requests with one process-wide set of slots shared by the sync and
+async paths (callers queue for a slot and are served in arrival order), and retries quota
+errors with jittered exponential backoff when waiting can help (concurrency, not daily tokens).
+
+State is visible from /api/health (ga4_quota).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from google.api_core import exceptions as gexc
+
+# GA4 resets daily token quotas at midnight Pacific time; hourly ones on the hour.
+_QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+
+# Refuse new reports when the remaining balance falls below these reserves
+MIN_TOKENS_PER_DAY = int(os.environ.get('GA4_QUOTA_MIN_TOKENS_PER_DAY', '1000'))
+MIN_TOKENS_PER_HOUR = int(os.environ.get('GA4_QUOTA_MIN_TOKENS_PER_HOUR', '250'))
+MIN_TOKENS_PER_PROJECT_HOUR = int(os.environ.get('GA4_QUOTA_MIN_TOKENS_PER_PROJECT_HOUR', '100'))
+# GA4 standard properties allow 10 concurrent requests; keep headroom for other clients
+MAX_CONCURRENT = int(os.environ.get('GA4_QUOTA_MAX_CONCURRENT', '8'))
+# How long a caller may queue for a concurrency slot before being rejected
+QUEUE_TIMEOUT = float(os.environ.get('GA4_QUOTA_QUEUE_TIMEOUT', '30'))
+MAX_RETRIES = int(os.environ.get('GA4_QUOTA_MAX_RETRIES', '3'))
+BACKOFF_BASE = float(os.environ.get('GA4_QUOTA_BACKOFF_BASE', '0.5'))
+BACKOFF_MAX = float(os.environ.get('GA4_QUOTA_BACKOFF_MAX', '8'))
+
+_QUOTA_FIELDS = (
+    "tokens_per_day",
+    "tokens_per_hour",
+    "tokens_per_project_per_hour",
+    "concurrent_requests",
+    "server_errors_per_project_per_hour",
+    "potentially_thresholded_requests_per_hour",
+)
+
+
+class QuotaExhaustedError(Exception):
+    """A report was refused (or GA4 refused it) because the property quota is used up."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _next_hour(now: float) -> float:
+    return (int(now) // 3600 + 1) * 3600
+
+
+def _next_pacific_midnight(now: float) -> float:
+    local = datetime.fromtimestamp(now, _QUOTA_TZ)
+    midnight = (local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight.timestamp()
+
+
+def _window_end(field: str, observed_at: float) -> float:
+    """When an observed balance stops being meaningful (its quota window resets)."""
+    if field == "tokens_per_day":
+        return _next_pacific_midnight(observed_at)
+    return _next_hour(observed_at)
+
+
+def _quota_error_text(err: Exception) -> str:
+    """
+    Lower-cased text naming the exhausted quota. Structured details come first (QuotaFailure
+    violations, ErrorInfo reason/metadata); GA4 does not put the token bucket in a dedicated
+    field, so the human-readable message ("Exhausted property tokens per day…") is the fallback.
+    """
+    parts = []
+    for detail in getattr(err, "details", None) or []:
+        for violation in getattr(detail, "violations", None) or []:
+            parts += [getattr(violation, "subject", ""), getattr(violation, "description", "")]
+    parts.append(getattr(err, "reason", None) or "")
+    parts += [str(v) for v in (getattr(err, "metadata", None) or {}).values()]
+    text = " ".join(p for p in parts if p).lower()
+    if "per day" in text or "per hour" in text:
+        return text
+    return str(err).lower()
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted")
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+
+
+class _Slots:
+    """
+    Counting semaphore shared by threads and event loops. A released slot is handed straight to
+    the longest waiter (a thread's Event or a loop's Future), so waiters are served in arrival
+    order and an async waiter costs no wakeups until it is its turn.
+    """
+
+    def __init__(self, size: int):
+        self._lock = threading.Lock()
+        self._free = size
+        self._waiters: deque = deque()
+
+    def _enter(self, wake) -> Optional[_Waiter]:
+        """Take a free slot (None) or join the queue (the waiter)."""
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return None
+            waiter = _Waiter(wake)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _withdraw(self, waiter: _Waiter) -> bool:
+        """Leave the queue; False if the slot was handed over first (the caller now holds it)."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._waiters.remove(waiter)
+            return True
+
+    def acquire(self, timeout: float) -> bool:
+        event = threading.Event()
+        waiter = self._enter(event.set)
+        if waiter is None or event.wait(timeout):
+            return True
+        return not self._withdraw(waiter)
+
+    async def acquire_async(self, timeout: float) -> bool:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enter(wake)
+        if waiter is None:
+            return True
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return not self._withdraw(waiter)
+        except BaseException:
+            if not self._withdraw(waiter):
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                try:
+                    waiter.wake()
+                    return
+                except RuntimeError:
+                    # Its event loop has closed; nobody will take this slot
+                    waiter.granted = False
+            self._free += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"free": self._free, "queued": len(self._waiters)}
+
+
+class QuotaScheduler:
+    """Tracks GA4 property quota and admits, queues or rejects new reports."""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT):
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._slots = _Slots(max_concurrent)
+        self._quota: dict = {}  # field -> {"consumed", "remaining", "observedAt"}
+        self._blocked_until = 0.0
+        self._blocked_reason = ""
+        self.admitted = 0
+        self.rejected = 0
+        self.retries = 0
+        self.quota_errors = 0
+
+    # --- observation -------------------------------------------------------------------
+
+    def observe(self, property_quota) -> None:
+        """Record the PropertyQuota block GA4 returned with a report."""
+        if property_quota is None:
+            return
+        now = time.time()
+        with self._lock:
+            for field in _QUOTA_FIELDS:
+                if field not in property_quota:
+                    continue
+                status = getattr(property_quota, field)
+                self._quota[field] = {
+                    "consumed": int(status.consumed),
+                    "remaining": int(status.remaining),
+                    "observedAt": now,
+                }
+
+    def _remaining(self, field: str, now: float) -> Optional[int]:
+        q = self._quota.get(field)
+        if q is None or now >= _window_end(field, q["observedAt"]):
+            return None
+        return q["remaining"]
+
+    # --- admission ---------------------------------------------------------------------
+
+    def admit(self, count: bool = True) -> None:
+        """
+        Raise QuotaExhaustedError if a report now would dip into the reserve.
+        Retries of an admitted report pass count=False so each report is counted once.
+        """
+        now = time.time()
+        with self._lock:
+            reason, retry_at = None, None
+            if now < self._blocked_until:
+                reason, retry_at = self._blocked_reason, self._blocked_until
+            else:
+                for field, reserve in (
+                    ("tokens_per_day", MIN_TOKENS_PER_DAY),
+                    ("tokens_per_hour", MIN_TOKENS_PER_HOUR),
+                    ("tokens_per_project_per_hour", MIN_TOKENS_PER_PROJECT_HOUR),
+                ):
+                    remaining = self._remaining(field, now)
+                    if remaining is not None and remaining < reserve:
+                        reason = f"GA4 {field.replace('_', ' ')} nearly exhausted ({remaining} left, reserve {reserve})"
+                        retry_at = _window_end(field, self._quota[field]["observedAt"])
+                        break
+            if reason:
+                if count:
+                    self.rejected += 1
+                raise QuotaExhaustedError(reason, retry_after=max(1.0, retry_at - now))
+            if count:
+                self.admitted += 1
+
+    def _queue_timeout(self) -> QuotaExhaustedError:
+        with self._lock:
+            self.rejected += 1
+        return QuotaExhaustedError(
+            f"GA4 concurrent request limit ({self.max_concurrent}) busy for {QUEUE_TIMEOUT:.0f}s",
+            retry_after=1.0,
+        )
+
+    @contextmanager
+    def slot(self):
+        """Concurrency slot for a sync caller; queues up to QUEUE_TIMEOUT seconds."""
+        if not self._slots.acquire(QUEUE_TIMEOUT):
+            raise self._queue_timeout()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        """The same slots as slot(), awaited without blocking the event loop."""
+        if not await self._slots.acquire_async(QUEUE_TIMEOUT):
+            raise self._queue_timeout()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    # --- quota errors and backoff ------------------------------------------------------
+
+    def _on_quota_error(self, err: Exception) -> bool:
+        """Record a RESOURCE_EXHAUSTED; returns True if waiting and retrying can help."""
+        msg = _quota_error_text(err)
+        now = time.time()
+        with self._lock:
+            self.quota_errors += 1
+            if "per day" in msg:
+                self._blocked_until = _next_pacific_midnight(now)
+                self._blocked_reason = "GA4 daily token quota exhausted"
+                return False
+            if "per hour" in msg:
+                self._blocked_until = _next_hour(now)
+                self._blocked_reason = "GA4 hourly token quota exhausted"
+                return False
+        return True
+
+    def _backoff(self, attempt: int) -> float:
+        with self._lock:
+            self.retries += 1
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+    def _exhausted(self, err: Exception) -> QuotaExhaustedError:
+        with self._lock:
+            retry_at = self._blocked_until
+        return QuotaExhaustedError(str(err), retry_after=max(1.0, retry_at - time.time()) if retry_at else None)
+
+    def call(self, fn):
+        """Run a sync GA4 call under admission, a concurrency slot and jittered backoff."""
+        for attempt in range(MAX_RETRIES + 1):
+            self.admit(count=attempt == 0)
+            try:
+                with self.slot():
+                    return fn()
+            except gexc.ResourceExhausted as e:
+                if not self._on_quota_error(e) or attempt == MAX_RETRIES:
+                    raise self._exhausted(e) from e
+                time.sleep(self._backoff(attempt))
+
+    async def call_async(self, fn):
+        """Async twin of call(); takes a slot from the same process-wide pool as call()."""
+        for attempt in range(MAX_RETRIES + 1):
+            self.admit(count=attempt == 0)
+            try:
+                async with self.slot_async():
+                    return await fn()
+            except gexc.ResourceExhausted as e:
+                if not self._on_quota_error(e) or attempt == MAX_RETRIES:
+                    raise self._exhausted(e) from e
+                await asyncio.sleep(self._backoff(attempt))
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            quota = {}
+            for field, q in self._quota.items():
+                stale = now >= _window_end(field, q["observedAt"])
+                quota[field] = {
+                    "consumed": q["consumed"],
+                    "remaining": q["remaining"],
+                    "ageSeconds": round(now - q["observedAt"], 1),
+                    "stale": stale,
+                }
+            return {
+                "quota": quota,
+                "blocked": now < self._blocked_until,
+                "blockedReason": self._blocked_reason if now < self._blocked_until else None,
+                "blockedForSeconds": round(self._blocked_until - now, 1) if now < self._blocked_until else 0,
+                "maxConcurrent": self.max_concurrent,
+                "slots": self._slots.stats(),
+                "reserves": {
+                    "tokens_per_day": MIN_TOKENS_PER_DAY,
+                    "tokens_per_hour": MIN_TOKENS_PER_HOUR,
+                    "tokens_per_project_per_hour": MIN_TOKENS_PER_PROJECT_HOUR,
+                },
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "retries": self.retries,
+                "quotaErrors": self.quota_errors,
+            }
+
+
+# Process-wide instance shared by the sync and async GA4 paths
+quota_scheduler = QuotaScheduler()
@@ -3,19 +3,43 @@ Reusable GA4 data fetching utilities
 Save this as utils/ga4_utils.py
 """
 
+import base64
+import calendar
+import copy
+import heapq
+import json
 import os
+import threading
+from datetime import date, timedelta
 from typing import Optional
 
 from google.analytics.data_v1beta import BetaAnalyticsDataClient
 from google.analytics.data_v1beta.types import (
+    BatchRunReportsRequest,
     DateRange,
     Dimension,
     Filter,
     FilterExpression,
     FilterExpressionList,
     Metric,
+    MetricType,
+    OrderBy,
     RunReportRequest,
 )
+from google.oauth2 import service_account
+
+from utils.report_cache import (
+    describe_request,
+    is_closed_range,
+    report_cache,
+    request_cache_key,
+    ttl_for_request,
+)
+from utils.ga4_columnar import ColumnarReport, check_format
+from utils.fact_store import FACT_SETS, fact_set_for, get_fact_store
+from utils.ga4_quota import quota_scheduler
+from utils.report_store import get_report_store
+from utils.single_flight import SingleFlight
 
 # GA4 `country` dimension uses English names (e.g. "Australia").
 GA4_COUNTRY_NAME_AUSTRALIA = "Australia"
@@ -28,41 +52,89 @@ _utils_dir = os.path.dirname(os.path.abspath(__file__))
 CREDENTIALS_FILE = os.path.join(os.path.dirname(_utils_dir), _CREDENTIALS_NAME)
 
 
-def setup_credentials():
-    """Sets up GA4 authentication."""
-    # 1. Check for Base64 Env Var (Vercel Production)
+_GA4_SCOPES = ["https://www.googleapis.com/auth/analytics.readonly"]
+
+# Process-wide client + credentials: built once on first use, shared by every helper.
+# A gRPC channel (and its TLS session) is expensive; one Simple-tab load fans out dozens of reports.
+_client_lock = threading.Lock()
+_client: Optional[BetaAnalyticsDataClient] = None
+_credentials = None
+_credentials_source: Optional[str] = None
+# Identical GA4 reports already in flight are shared rather than re-run (keyed on the cache key)
+ga4_flight = SingleFlight("ga4")
+# Bumped by reset_ga4_client() so per-event-loop async clients (utils.ga4_async) rebuild too
+_client_generation = 0
+
+
+def _load_credentials():
+    """
+    Resolve GA4 credentials in memory. Returns (credentials or None, source label).
+    None means "let the client library use Application Default Credentials".
+    """
+    # 1. Check for Base64 Env Var (Vercel Production) — decoded in memory, no temp file
     b64_creds = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS_B64')
     if b64_creds:
         try:
-            import base64
-            import tempfile
-            
-            # Decode to JSON
-            creds_json = base64.b64decode(b64_creds).decode('utf-8')
-            
-            # Write to temp file because Python GA4 library expects a file path env var
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json') as f:
-                f.write(creds_json)
-                temp_path = f.name
-                
-            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = temp_path
-            return "Service Account (Env Var)"
+            info = json.loads(base64.b64decode(b64_creds).decode('utf-8'))
+            creds = service_account.Credentials.from_service_account_info(info, scopes=_GA4_SCOPES)
+            return creds, "Service Account (Env Var)"
         except Exception as e:
             print(f"Error decoding GA4 credentials from env: {e}")
 
     # 2. Check for local file
     if os.path.exists(CREDENTIALS_FILE):
-        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = CREDENTIALS_FILE
-        return "Service Account (credentials.json)"
-        
-    return "gcloud Application Default Credentials"
+        creds = service_account.Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=_GA4_SCOPES)
+        return creds, "Service Account (credentials.json)"
+
+    return None, "gcloud Application Default Credentials"
+
+
+def get_ga4_credentials():
+    """Returns the shared GA4 credentials (None for ADC), loading them on first use."""
+    global _credentials, _credentials_source
+    if _credentials_source is None:
+        with _client_lock:
+            if _credentials_source is None:
+                _credentials, _credentials_source = _load_credentials()
+    return _credentials
+
+
+def setup_credentials():
+    """Sets up GA4 authentication; returns a label describing where credentials came from."""
+    get_ga4_credentials()
+    return _credentials_source
 
 
 def get_ga4_client():
-    """Returns authenticated GA4 client."""
-    # Ensure credentials are set up (File or Env Var)
-    setup_credentials()
-    return BetaAnalyticsDataClient()
+    """Returns the shared, authenticated GA4 client (created lazily, thread-safe)."""
+    global _client
+    client = _client
+    if client is not None:
+        return client
+    creds = get_ga4_credentials()
+    with _client_lock:
+        if _client is None:
+            _client = BetaAnalyticsDataClient(credentials=creds) if creds else BetaAnalyticsDataClient()
+        return _client
+
+
+def reset_ga4_client():
+    """
+    Drop the shared client and credentials (e.g. after rotating GOOGLE_APPLICATION_CREDENTIALS_B64).
+    The next call rebuilds both.
+    """
+    global _client, _credentials, _credentials_source, _client_generation
+    with _client_lock:
+        old = _client
+        _client_generation += 1
+        _client = None
+        _credentials = None
+        _credentials_source = None
+    if old is not None:
+        try:
+            old.transport.close()
+        except Exception as e:
+            print(f"Error closing GA4 client transport: {e}")
 
 
 def australia_country_filter_expression() -> FilterExpression:
@@ -108,7 +180,20 @@ def event_name_filter_expression(event_name: str) -> FilterExpression:
     )
 
 
-def fetch_ga4_data(
+def in_list_filter_expression(field_name: str, values: list, case_sensitive: bool = False) -> FilterExpression:
+    """Restrict rows to a set of dimension values (GA4 in-list filter)."""
+    values = [v.strip() for v in values or [] if v and v.strip()]
+    if not values:
+        raise ValueError(f"at least one {field_name} value is required")
+    return FilterExpression(
+        filter=Filter(
+            field_name=field_name,
+            in_list_filter=Filter.InListFilter(values=values, case_sensitive=case_sensitive),
+        ),
+    )
+
+
+def build_report_request(
     start_date: str,
     end_date: str,
     dimensions: list,
@@ -117,117 +202,713 @@ def fetch_ga4_data(
     compare_start_date: str = None,
     compare_end_date: str = None,
     dimension_filter: Optional[FilterExpression] = None,
-):
-    """Fetches data from GA4 API and returns a list of dicts (no pandas needed)."""
-    client = get_ga4_client()
-    
+) -> RunReportRequest:
+    """RunReportRequest for the shared property (optional compare range as a second date range)."""
     date_ranges = [DateRange(start_date=start_date, end_date=end_date)]
     if compare_start_date and compare_end_date:
         date_ranges.append(DateRange(start_date=compare_start_date, end_date=compare_end_date))
 
-    request = RunReportRequest(
+    return RunReportRequest(
         property=f"properties/{PROPERTY_ID}",
         dimensions=[Dimension(name=dim) for dim in dimensions],
         metrics=[Metric(name=met) for met in metrics],
         date_ranges=date_ranges,
         limit=limit,
         dimension_filter=dimension_filter,
+        return_property_quota=True,
     )
-    
-    response = client.run_report(request=request)
-    
-    is_compare = len(date_ranges) > 1
-    num_metrics = len(metrics)
+
+
+def _variant_key(request: RunReportRequest, variant: str = "") -> str:
+    """Cache key for a request; `variant` separates different conversions of the same response."""
+    key = request_cache_key(request)
+    return f"{key}:{variant}" if variant else key
+
+
+def _cached_value(request: RunReportRequest, variant: str = ""):
+    """Returns (key, value or None): in-process cache first, then the SQLite store for closed ranges."""
+    key = _variant_key(request, variant)
+    value = report_cache.get(key)
+    if value is None and is_closed_range(request.date_ranges):
+        value = _stored_value(request, key)
+    return key, value
+
+
+def _stored_value(request: RunReportRequest, key: str):
+    """SQLite store lookup for a closed range (promoted into the in-process cache on a hit)."""
+    store = get_report_store()
+    if store is None:
+        return None
+    value = store.get(key)
+    if value is not None:
+        report_cache.set(key, value, ttl_for_request(request), closed=True, meta=describe_request(request))
+    return value
+
+
+def _remember(request: RunReportRequest, key: str, value) -> None:
+    """Store a freshly fetched value in the cache (and the SQLite store when the range is closed)."""
+    closed = is_closed_range(request.date_ranges)
+    meta = describe_request(request)
+    if closed:
+        store = get_report_store()
+        if store is not None:
+            store.set(key, value, meta)
+    report_cache.set(key, value, ttl_for_request(request), closed=closed, meta=meta)
+
+
+def _run_report(request: RunReportRequest):
+    """Blocking run_report under the quota scheduler; records the returned property quota."""
+    def call():
+        response = get_ga4_client().run_report(request=request)
+        quota_scheduler.observe(response.property_quota)
+        return response
+
+    return quota_scheduler.call(call)
+
+
+def run_report_cached(request: RunReportRequest, convert, use_cache: bool = True, variant: str = ""):
+    """
+    run_report through the in-process report cache; `convert(response)` builds the cached value.
+    The key is the canonical request, so query-string noise (e.g. `_t`) cannot defeat it.
+    Closed ranges also go through the optional SQLite store (GA4_REPORT_STORE_PATH), so final
+    months are served without touching the network after a restart.
+    Identical requests already in flight on another thread share that call (ga4_flight).
+    The RPC itself goes through quota_scheduler (reserve check, concurrency slot, backoff).
+    Pass a distinct `variant` when `convert` produces a different value for the same request.
+    """
+    if use_cache:
+        key, value = _cached_value(request, variant)
+        if value is not None:
+            return value
+    else:
+        key = _variant_key(request, variant)
+
+    def fetch():
+        fresh = convert(_run_report(request))
+        if use_cache:
+            _remember(request, key, fresh)
+        return fresh
+
+    return ga4_flight.do(key, fetch)
+
+
+# MetricType -> parser for typed rows; everything but integers comes back as a decimal string
+_INTEGER_METRIC_TYPES = {MetricType.TYPE_INTEGER}
+
+
+def _metric_parsers(response, count: int) -> list:
+    parsers = []
+    for header in list(response.metric_headers)[:count]:
+        parsers.append(int if header.type_ in _INTEGER_METRIC_TYPES else float)
+    return parsers + [float] * (count - len(parsers))
+
+
+def _typed(parse, value: str):
+    try:
+        return parse(value)
+    except ValueError:
+        return value
+
+
+def rows_from_response(
+    response,
+    dimensions: list,
+    metrics: list,
+    is_compare: bool = False,
+    typed: bool = False,
+) -> list:
+    """
+    Converts a RunReportResponse into the list-of-dicts shape the API returns.
+
+    Reads the underlying protobuf directly (no proto-plus wrapper per cell). Compare reports
+    are merged per dimension tuple with `<metric>_compare` keys. typed=True parses metric
+    values using the response's metric_headers types (int for TYPE_INTEGER, else float)
+    instead of returning GA4's strings.
+    """
+    pb = type(response).pb(response)
     num_dimensions = len(dimensions)
+    num_metrics = len(metrics)
+    parsers = _metric_parsers(response, num_metrics) if typed else None
+
+    def metric_values(row):
+        values = [v.value for v in row.metric_values][:num_metrics]
+        if parsers:
+            return [_typed(p, v) for p, v in zip(parsers, values)]
+        return values
 
-    # GA4 often appends a 'date_range' dimension if multiple ranges are requested
-    # Let's check if the last dimension value in the first row looks like 'date_range_X'
-    has_auto_date_dim = False
-    actual_num_dims = len(response.dimension_headers)
-    if is_compare and actual_num_dims > num_dimensions:
-        has_auto_date_dim = True
-
-    # Dictionary to group rows by dimension values
-    # Key: tuple of dimension values, Value: dict of metrics
-    grouped_data = {}
-
-    for row in response.rows:
-        # Extract dimension values (excluding the auto-added date_range if present)
-        row_dims = tuple(row.dimension_values[i].value for i in range(num_dimensions))
-        
-        # Determine if this row is for the current period or comparison period
-        is_current = True
-        if has_auto_date_dim:
-            date_range_val = row.dimension_values[actual_num_dims - 1].value
-            is_current = (date_range_val == 'date_range_0')
-        elif num_dimensions == 0:
-            is_current = (len(grouped_data) == 0 or row_dims not in grouped_data or "_is_done" not in grouped_data[row_dims])
-
-        if row_dims not in grouped_data:
-            grouped_data[row_dims] = {}
-            for i, dim in enumerate(dimensions):
-                grouped_data[row_dims][dim] = row.dimension_values[i].value
-
-        if is_current:
-            for i, met in enumerate(metrics):
-                grouped_data[row_dims][met] = row.metric_values[i].value
-            if num_dimensions == 0: grouped_data[row_dims]["_is_done"] = True
+    if not is_compare:
+        keys = list(dimensions) + list(metrics)
+        return [
+            dict(zip(keys, [v.value for v in row.dimension_values][:num_dimensions] + metric_values(row)))
+            for row in pb.rows
+        ]
+
+    # GA4 appends a `dateRange` dimension (date_range_0 / date_range_1) when there are two ranges.
+    # Without it, the first row seen for a dimension tuple is the current period, the next the compare one.
+    has_date_range_dim = len(pb.dimension_headers) > num_dimensions
+    compare_keys = [f"{met}_compare" for met in metrics]
+    grouped = {}
+    for row in pb.rows:
+        dims = [v.value for v in row.dimension_values]
+        row_dims = tuple(dims[:num_dimensions])
+        item = grouped.get(row_dims)
+        is_new = item is None
+        if is_new:
+            item = grouped[row_dims] = dict(zip(dimensions, row_dims))
+        if has_date_range_dim:
+            is_current = dims[-1] == 'date_range_0'
         else:
-            for i, met in enumerate(metrics):
-                grouped_data[row_dims][f"{met}_compare"] = row.metric_values[i].value
+            is_current = is_new
+        item.update(zip(metrics if is_current else compare_keys, metric_values(row)))
+    return list(grouped.values())
 
-    return list(grouped_data.values())
 
+def fetch_ga4_data(
+    start_date: str,
+    end_date: str,
+    dimensions: list,
+    metrics: list,
+    limit: int = 10000,
+    compare_start_date: str = None,
+    compare_end_date: str = None,
+    dimension_filter: Optional[FilterExpression] = None,
+    use_cache: bool = True,
+    typed_metrics: bool = False,
+    format: str = "rows",
+):
+    """
+    Fetches data from GA4 API and returns a list of dicts (no pandas needed).
+    Metric values are GA4's strings unless typed_metrics=True (int / float by metric type).
+    format="columnar" returns a ColumnarReport (dictionary-encoded dimensions, typed metric arrays).
+    """
+    fmt = check_format(format)
+    request = build_report_request(
+        start_date,
+        end_date,
+        dimensions,
+        metrics,
+        limit,
+        compare_start_date,
+        compare_end_date,
+        dimension_filter=dimension_filter,
+    )
+    is_compare = len(request.date_ranges) > 1
+    rows = run_report_cached(
+        request,
+        lambda response: rows_from_response(response, dimensions, metrics, is_compare, typed=typed_metrics),
+        use_cache=use_cache,
+        variant="typed" if typed_metrics else "",
+    )
+    if fmt == "columnar":
+        return ColumnarReport.from_rows(rows, dimensions, metrics, is_compare)
+    # Callers may mutate rows; never hand out the cached dicts themselves
+    return [dict(r) for r in rows]
 
-def fetch_path_screen_page_views_total(
+
+# Rows per GA4 page for iter_ga4_rows (GA4 accepts up to 250000)
+GA4_PAGE_SIZE = int(os.environ.get('GA4_PAGE_SIZE', '10000'))
+
+
+def iter_ga4_rows(
     start_date: str,
     end_date: str,
-    path_value: str,
-    match_type: str = "contains",
-    au_only: bool = False,
-) -> int:
+    dimensions: list,
+    metrics: list,
+    dimension_filter: Optional[FilterExpression] = None,
+    page_size: int = GA4_PAGE_SIZE,
+    max_rows: Optional[int] = None,
+):
     """
-    Total screenPageViews for pagePath filtered by path_value.
+    Yields every row of a report ({dimension: value, metric: value}), one GA4 page at a time.
 
-    match_type:
-      - "contains": substring match, case-insensitive (good for slugs like oar-f701)
-      - "exact": EXACT match on pagePath as stored in GA4 (use e.g. /on-a-roll/ including slashes)
+    Unlike fetch_ga4_data there is no `limit` truncation: pages are requested with `offset`
+    until `row_count` is reached (or max_rows), and only one page is held in memory.
+    Pages bypass the report cache (large exports would evict everything else) but still go
+    through the quota scheduler.
     """
-    path_value = (path_value or "").strip()
-    if not path_value:
-        return 0
+    request = build_report_request(start_date, end_date, dimensions, metrics, page_size,
+                                   dimension_filter=dimension_filter)
+    offset = 0
+    while max_rows is None or offset < max_rows:
+        request.offset = offset
+        if max_rows is not None:
+            request.limit = min(page_size, max_rows - offset)
+        response = _run_report(request)
+        yield from rows_from_response(response, dimensions, metrics)
+        offset += len(response.rows)
+        if not response.rows or offset >= response.row_count:
+            return
+
+
+# GA4 BatchRunReports accepts at most 5 reports per call.
+GA4_BATCH_SIZE = 5
+
+
+def _format_batch_results(specs: list, results: list) -> list:
+    """Columnar-encode the successful results of specs that asked for format="columnar"."""
+    for spec, result in zip(specs, results):
+        if result.get("success") and check_format(spec.get("format")) == "columnar":
+            compare = bool(spec.get("compare_start_date") and spec.get("compare_end_date"))
+            result["data"] = ColumnarReport.from_rows(
+                result["data"], list(spec.get("dimensions") or []), list(spec.get("metrics") or []), compare
+            )
+    return results
+
+
+def _plan_batch(specs: list, use_cache: bool = True):
+    """
+    Builds one request per spec and serves what it can from cache/store.
+    Returns (results with None for pending slots, pending list of (index, request, key, dimensions, metrics, is_compare)).
+    """
+    results: list = [None] * len(specs)
+    pending = []
+    for i, spec in enumerate(specs):
+        dimensions = list(spec.get("dimensions") or [])
+        metrics = list(spec.get("metrics") or [])
+        request = build_report_request(
+            spec["start_date"],
+            spec["end_date"],
+            dimensions,
+            metrics,
+            spec.get("limit") or 10000,
+            spec.get("compare_start_date"),
+            spec.get("compare_end_date"),
+            dimension_filter=australia_country_filter_expression() if spec.get("au_only") else None,
+        )
+        key, value = _cached_value(request) if use_cache else (None, None)
+        if value is not None:
+            results[i] = {"success": True, "data": [dict(r) for r in value]}
+        else:
+            pending.append((i, request, key, dimensions, metrics, len(request.date_ranges) > 1))
+    return results, pending
+
 
+def _batch_request(chunk: list) -> BatchRunReportsRequest:
+    return BatchRunReportsRequest(
+        property=f"properties/{PROPERTY_ID}",
+        requests=[item[1] for item in chunk],
+    )
+
+
+def _observe_batch_quota(response) -> None:
+    """The last report's PropertyQuota is the freshest balance for the whole batch."""
+    if response.reports:
+        quota_scheduler.observe(response.reports[-1].property_quota)
+
+
+def _apply_batch_response(chunk: list, response, results: list) -> None:
+    """Converts each report of a BatchRunReports response into its result slot (and caches it)."""
+    _observe_batch_quota(response)
+    for (i, request, key, dimensions, metrics, is_compare), report in zip(chunk, response.reports):
+        rows = rows_from_response(report, dimensions, metrics, is_compare)
+        if key is not None:
+            _remember(request, key, rows)
+        results[i] = {"success": True, "data": [dict(r) for r in rows]}
+
+
+def fetch_ga4_batch(specs: list, use_cache: bool = True) -> list:
+    """
+    Runs many reports with as few RPCs as possible.
+
+    specs: dicts with start_date, end_date, dimensions, metrics and optional limit,
+    compare_start_date, compare_end_date, au_only, format (same shape as fetch_analytics_data).
+    Cached/stored results are served locally; the rest are packed into BatchRunReports
+    calls of up to GA4_BATCH_SIZE. Returns one entry per spec, in order:
+    {"success": True, "data": rows} or {"success": False, "error": msg}.
+    """
+    results, pending = _plan_batch(specs, use_cache)
+    client = get_ga4_client()
+    for start in range(0, len(pending), GA4_BATCH_SIZE):
+        chunk = pending[start:start + GA4_BATCH_SIZE]
+        try:
+            response = quota_scheduler.call(lambda: client.batch_run_reports(request=_batch_request(chunk)))
+        except Exception as e:
+            for item in chunk:
+                results[item[0]] = {"success": False, "error": str(e)}
+            continue
+        _apply_batch_response(chunk, response, results)
+    return _format_batch_results(specs, results)
+
+
+def _path_filter_expression(path_value: str, match_type: str = "contains") -> FilterExpression:
+    """pagePath filter: exact or substring match, case-insensitive."""
     if match_type == "exact":
         mt = Filter.StringFilter.MatchType.EXACT
-        case_sensitive = False
     else:
         mt = Filter.StringFilter.MatchType.CONTAINS
-        case_sensitive = False
-
-    client = get_ga4_client()
-    path_expr = FilterExpression(
+    return FilterExpression(
         filter=Filter(
             field_name="pagePath",
             string_filter=Filter.StringFilter(
                 match_type=mt,
                 value=path_value,
-                case_sensitive=case_sensitive,
+                case_sensitive=False,
             ),
         )
     )
+
+
+def build_path_views_request(
+    start_date: str,
+    end_date: str,
+    path_value: str,
+    match_type: str = "contains",
+    au_only: bool = False,
+) -> Optional[RunReportRequest]:
+    """Dimensionless screenPageViews report filtered on pagePath (None when path_value is blank)."""
+    path_value = (path_value or "").strip()
+    if not path_value:
+        return None
+
     dim_filter = and_dimension_filters(
-        path_expr,
+        _path_filter_expression(path_value, match_type),
         australia_country_filter_expression() if au_only else None,
     )
-    request = RunReportRequest(
+    return RunReportRequest(
         property=f"properties/{PROPERTY_ID}",
         dimensions=[],
         metrics=[Metric(name="screenPageViews")],
         date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
         dimension_filter=dim_filter,
         limit=1,
+        return_property_quota=True,
     )
-    response = client.run_report(request=request)
+
+
+def fetch_path_screen_page_views_total(
+    start_date: str,
+    end_date: str,
+    path_value: str,
+    match_type: str = "contains",
+    au_only: bool = False,
+) -> int:
+    """
+    Total screenPageViews for pagePath filtered by path_value.
+
+    match_type:
+      - "contains": substring match, case-insensitive (good for slugs like oar-f701)
+      - "exact": EXACT match on pagePath as stored in GA4 (use e.g. /on-a-roll/ including slashes)
+    """
+    request = build_path_views_request(start_date, end_date, path_value, match_type, au_only)
+    if request is None:
+        return 0
+    return run_report_cached(request, _first_metric_int)
+
+
+def build_path_months_request(
+    start_date: str,
+    end_date: str,
+    path_value: str,
+    match_type: str = "contains",
+    au_only: bool = False,
+) -> Optional[RunReportRequest]:
+    """screenPageViews by yearMonth for one pagePath pattern (one row per month; None when blank)."""
+    request = build_path_views_request(start_date, end_date, path_value, match_type, au_only)
+    if request is not None:
+        request.dimensions = [Dimension(name="yearMonth")]
+        request.limit = 10000
+    return request
+
+
+def views_by_month_from_response(response) -> dict:
+    """{"YYYYMM": views} from a yearMonth x screenPageViews report."""
+    out = {}
+    for row in type(response).pb(response).rows:
+        try:
+            out[row.dimension_values[0].value] = int(float(row.metric_values[0].value))
+        except ValueError:
+            continue
+    return out
+
+
+def fetch_path_views_by_month(
+    start_date: str,
+    end_date: str,
+    path_value: str,
+    match_type: str = "contains",
+    au_only: bool = False,
+) -> dict:
+    """screenPageViews per month ({"YYYYMM": views}) for pagePath filtered by path_value."""
+    request = build_path_months_request(start_date, end_date, path_value, match_type, au_only)
+    if request is None:
+        return {}
+    return dict(run_report_cached(request, views_by_month_from_response))
+
+
+# Row cap for the multi-path report; a truncated result falls back to one report per path
+PATHS_QUERY_LIMIT = 100000
+
+
+def path_patterns(paths: list, match_type: str = "contains") -> list:
+    """Non-blank, de-duplicated (value, match) pairs in input order."""
+    match_type = "exact" if match_type == "exact" else "contains"
+    out = []
+    for value in paths or []:
+        value = (value or "").strip()
+        if value and (value, match_type) not in out:
+            out.append((value, match_type))
+    return out
+
+
+def build_paths_views_request(
+    start_date: str,
+    end_date: str,
+    patterns: list,
+    au_only: bool = False,
+    by_month: bool = False,
+) -> RunReportRequest:
+    """screenPageViews by pagePath (and yearMonth) for pages matching any of the (value, match) patterns."""
+    expressions = [_path_filter_expression(value, match) for value, match in patterns]
+    paths_expr = expressions[0] if len(expressions) == 1 else FilterExpression(
+        or_group=FilterExpressionList(expressions=expressions),
+    )
+    dimensions = ["pagePath"] + (["yearMonth"] if by_month else [])
+    return build_report_request(
+        start_date,
+        end_date,
+        dimensions,
+        ["screenPageViews"],
+        PATHS_QUERY_LIMIT,
+        dimension_filter=and_dimension_filters(
+            paths_expr,
+            australia_country_filter_expression() if au_only else None,
+        ),
+    )
+
+
+def _path_matches(path: str, value: str, match_type: str) -> bool:
+    path, value = path.lower(), value.lower()
+    return path == value if match_type == "exact" else value in path
+
+
+def paths_views_from_response(response, patterns: list, by_month: bool = False) -> dict:
+    """
+    Buckets pagePath rows into the requested patterns (a page matching several counts for each,
+    exactly as separate reports would). Cacheable: {"complete", "totals", "byMonth"}.
+    """
+    pb = type(response).pb(response)
+    totals = [0] * len(patterns)
+    by_month_totals = [{} for _ in patterns]
+    for row in pb.rows:
+        path = row.dimension_values[0].value
+        try:
+            views = int(float(row.metric_values[0].value))
+        except ValueError:
+            continue
+        for i, (value, match) in enumerate(patterns):
+            if _path_matches(path, value, match):
+                totals[i] += views
+                if by_month:
+                    ym = row.dimension_values[1].value
+                    by_month_totals[i][ym] = by_month_totals[i].get(ym, 0) + views
+    return {
+        "complete": response.row_count <= len(response.rows),
+        "totals": totals,
+        "byMonth": by_month_totals if by_month else None,
+    }
+
+
+def paths_views_result(patterns: list, value: dict) -> list:
+    """[{"path", "match", "screenPageViews"[, "byMonth"]}] in pattern order."""
+    out = []
+    for i, (path, match) in enumerate(patterns):
+        item = {"path": path, "match": match, "screenPageViews": value["totals"][i]}
+        if value["byMonth"] is not None:
+            item["byMonth"] = dict(value["byMonth"][i])
+        out.append(item)
+    return out
+
+
+def fetch_paths_screen_page_views_totals(
+    start_date: str,
+    end_date: str,
+    paths: list,
+    match_type: str = "contains",
+    au_only: bool = False,
+    by_month: bool = False,
+) -> list:
+    """
+    screenPageViews totals for many pagePath patterns from one report (pagePath dimension with an
+    or-group filter, rows bucketed locally) instead of one report per pattern.
+    by_month=True adds `byMonth` ({"YYYYMM": views}) per pattern from a yearMonth dimension.
+    If that report is truncated, each pattern gets its own report (yearMonth-only when by_month).
+    """
+    patterns = path_patterns(paths, match_type)
+    if not patterns:
+        return []
+    request = build_paths_views_request(start_date, end_date, patterns, au_only, by_month)
+    value = run_report_cached(request, lambda response: paths_views_from_response(response, patterns, by_month))
+    if not value["complete"]:
+        if by_month:
+            months = [fetch_path_views_by_month(start_date, end_date, p, m, au_only) for p, m in patterns]
+            value = {"totals": [sum(m.values()) for m in months], "byMonth": months}
+        else:
+            value = {
+                "totals": [fetch_path_screen_page_views_total(start_date, end_date, p, m, au_only) for p, m in patterns],
+                "byMonth": None,
+            }
+    return paths_views_result(patterns, value)
+
+
+def build_event_counts_request(
+    start_date: str,
+    end_date: str,
+    names: list,
+    au_only: bool = False,
+    by_month: bool = False,
+) -> RunReportRequest:
+    """eventCount by eventName (and yearMonth) for just the named events."""
+    dimensions = ["eventName"] + (["yearMonth"] if by_month else [])
+    return build_report_request(
+        start_date,
+        end_date,
+        dimensions,
+        ["eventCount"],
+        dimension_filter=and_dimension_filters(
+            in_list_filter_expression("eventName", names),
+            australia_country_filter_expression() if au_only else None,
+        ),
+    )
+
+
+def event_counts_from_response(response, names: list, by_month: bool = False) -> list:
+    """
+    [{"eventName", "eventCount"[, "byMonth"]}] in the order asked for; events with no rows are 0.
+    Names match case-insensitively, like the in-list filter.
+    """
+    index = {name.lower(): i for i, name in enumerate(names)}
+    out = [{"eventName": name, "eventCount": 0, **({"byMonth": {}} if by_month else {})} for name in names]
+    for row in type(response).pb(response).rows:
+        i = index.get(row.dimension_values[0].value.lower())
+        if i is None:
+            continue
+        try:
+            count = int(float(row.metric_values[0].value))
+        except ValueError:
+            continue
+        out[i]["eventCount"] += count
+        if by_month:
+            ym = row.dimension_values[1].value
+            out[i]["byMonth"][ym] = out[i]["byMonth"].get(ym, 0) + count
+    return out
+
+
+def event_names(names: list) -> list:
+    """Non-blank, de-duplicated event names in input order."""
+    out = []
+    for name in names or []:
+        name = (name or "").strip()
+        if name and name.lower() not in {n.lower() for n in out}:
+            out.append(name)
+    return out
+
+
+def fetch_event_counts(
+    start_date: str,
+    end_date: str,
+    names: list,
+    au_only: bool = False,
+    by_month: bool = False,
+) -> list:
+    """
+    eventCount for specific events from one report filtered server-side (eventName in-list),
+    instead of scanning a top-N events list. by_month=True adds byMonth ({"YYYYMM": count}).
+    """
+    names = event_names(names)
+    if not names:
+        return []
+    request = build_event_counts_request(start_date, end_date, names, au_only, by_month)
+    rows = run_report_cached(request, lambda response: event_counts_from_response(response, names, by_month))
+    return copy.deepcopy(rows)
+
+
+# Row cap for the month x page report; pages are ordered by views, so a cut only drops the tail
+TOP_PAGES_QUERY_LIMIT = 100000
+TOP_PAGES_MAX_K = 50
+
+
+def build_top_pages_matrix_request(start_date: str, end_date: str, au_only: bool = False) -> RunReportRequest:
+    """screenPageViews by yearMonth x pagePath x pageTitle, most viewed first."""
+    request = build_report_request(
+        start_date,
+        end_date,
+        ["yearMonth", "pagePath", "pageTitle"],
+        ["screenPageViews"],
+        TOP_PAGES_QUERY_LIMIT,
+        dimension_filter=australia_country_filter_expression() if au_only else None,
+    )
+    request.order_bys = [OrderBy(metric=OrderBy.MetricOrderBy(metric_name="screenPageViews"), desc=True)]
+    return request
+
+
+def top_pages_matrix_from_response(response, k: int) -> list:
+    """
+    [{"yearMonth", "pages": [{"pagePath", "pageTitle", "screenPageViews"}], "complete"}] by month,
+    keeping a k-sized min-heap per month while scanning the rows (ties keep GA4's order).
+    Rows arrive most viewed first, so when the report is truncated a month's top k is still
+    exact if it kept k rows; months with fewer are marked complete=False.
+    """
+    heaps: dict = {}
+    for seq, row in enumerate(type(response).pb(response).rows):
+        try:
+            views = int(float(row.metric_values[0].value))
+        except ValueError:
+            continue
+        ym, path, title = (v.value for v in row.dimension_values)
+        item = (views, -seq, path, title)
+        heap = heaps.setdefault(ym, [])
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+    truncated = response.row_count > len(response.rows)
+    return [
+        {
+            "yearMonth": ym,
+            "pages": [
+                {"pagePath": path, "pageTitle": title, "screenPageViews": views}
+                for views, _, path, title in sorted(heaps[ym], reverse=True)
+            ],
+            "complete": not truncated or len(heaps[ym]) >= k,
+        }
+        for ym in sorted(heaps)
+    ]
+
+
+def top_pages_months(start_date: str, end_date: str, months: list) -> list:
+    """Fill in calendar months of an ISO range that had no page views (empty page lists)."""
+    start, end = _iso_date(start_date), _iso_date(end_date)
+    if start is None or end is None or start > end:
+        return months
+    by_month = {m["yearMonth"]: m for m in months}
+    out = []
+    y, m = start.year, start.month
+    while (y, m) <= (end.year, end.month):
+        ym = f"{y}{m:02d}"
+        out.append(by_month.pop(ym, {"yearMonth": ym, "pages": [], "complete": True}))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out + [by_month[ym] for ym in sorted(by_month)]
+
+
+def check_top_pages_k(k: int) -> int:
+    if not 1 <= k <= TOP_PAGES_MAX_K:
+        raise ValueError(f"k must be between 1 and {TOP_PAGES_MAX_K}")
+    return k
+
+
+def fetch_top_pages_matrix(start_date: str, end_date: str, k: int = 5, au_only: bool = False) -> list:
+    """
+    Top k pages (screenPageViews) per month of the range from one yearMonth x page report,
+    instead of a top-100 pages report per month ranked client-side.
+    """
+    k = check_top_pages_k(k)
+    request = build_top_pages_matrix_request(start_date, end_date, au_only)
+    months = run_report_cached(request, lambda response: top_pages_matrix_from_response(response, k), variant=f"top{k}")
+    return top_pages_months(start_date, end_date, copy.deepcopy(months))
+
+
+def _first_metric_int(response) -> int:
+    """First metric of the first row as int (0 when the report is empty)."""
     if not response.rows:
         return 0
     try:
@@ -271,9 +952,27 @@ def fetch_analytics_data(
     compare_start_date: str = None,
     compare_end_date: str = None,
     au_only: bool = False,
+    format: str = "rows",
+    scopes: Optional[list] = None,
+    cities: Optional[list] = None,
 ):
-    """Returns list of dicts for API (same signature as fetch_ga4_data)."""
-    dim_filt = australia_country_filter_expression() if au_only else None
+    """
+    Returns list of dicts for API (same signature as fetch_ga4_data); a ColumnarReport for format="columnar".
+    Additive reports over days already in the local fact store (GA4_FACT_STORE_PATH) are answered locally.
+    scopes=["au", "all"] returns {scope: rows} instead (see fetch_analytics_scopes; au_only is ignored).
+    cities=["Sydney", ...] keeps only those cities (in-list `city` filter applied by GA4, so a
+    city is reported whatever its rank; add `yearMonth` to the dimensions for many months at once).
+    """
+    if scopes:
+        if cities:
+            raise ValueError("cities cannot be combined with scopes")
+        return fetch_analytics_scopes(start_date, end_date, dimensions, metrics, limit,
+                                      compare_start_date, compare_end_date, scopes=scopes, format=format)
+    local = facts_answer(start_date, end_date, dimensions, metrics, limit, compare_start_date, compare_end_date, au_only,
+                         dimension_values={"city": cities} if cities else None)
+    if local is not None:
+        return _format_rows(local, dimensions, metrics, bool(compare_start_date and compare_end_date), format)
+    dim_filt = analytics_dimension_filter(au_only, cities)
     return fetch_ga4_data(
         start_date,
         end_date,
@@ -283,13 +982,324 @@ def fetch_analytics_data(
         compare_start_date,
         compare_end_date,
         dimension_filter=dim_filt,
+        format=format,
+    )
+
+
+def analytics_dimension_filter(au_only: bool = False, cities: Optional[list] = None) -> Optional[FilterExpression]:
+    """Filter for fetch_analytics_data: Australia only and / or a city in-list."""
+    return and_dimension_filters(
+        australia_country_filter_expression() if au_only else None,
+        in_list_filter_expression("city", cities) if cities else None,
     )
 
 
+# Metrics that can be summed across countries (a session / view / event has exactly one country)
+ADDITIVE_METRICS = frozenset({"sessions", "engagedSessions", "screenPageViews", "eventCount", "keyEvents"})
+SCOPES = ("au", "all")
+# Row cap for the combined country-split query; a truncated result falls back to per-scope queries
+SCOPE_QUERY_LIMIT = 100000
+
+
+def check_scopes(scopes) -> list:
+    """Validated, de-duplicated scope names ("au" = Australia only, "all" = every location)."""
+    out = []
+    for scope in scopes or []:
+        scope = str(scope).strip().lower()
+        if scope not in SCOPES:
+            raise ValueError(f"scopes must be drawn from: {', '.join(SCOPES)}")
+        if scope not in out:
+            out.append(scope)
+    if not out:
+        raise ValueError("scopes must not be empty")
+    return out
+
+
+def can_split_scopes(metrics: list, scopes: list) -> bool:
+    """One country-dimension query can serve every scope only when all metrics are additive."""
+    return len(scopes) > 1 and bool(metrics) and set(metrics) <= ADDITIVE_METRICS
+
+
+def scopes_report_request(start_date, end_date, dimensions, metrics, compare_start_date=None, compare_end_date=None):
+    """Unfiltered report with `country` added as the last dimension (unless already requested)."""
+    query_dims = list(dimensions) if "country" in dimensions else list(dimensions) + ["country"]
+    request = build_report_request(
+        start_date, end_date, query_dims, metrics, SCOPE_QUERY_LIMIT, compare_start_date, compare_end_date
+    )
+    return request, query_dims
+
+
+def scopes_rows_from_response(response, query_dims: list, metrics: list, is_compare: bool) -> dict:
+    """Cacheable form of the country-split report: rows plus whether GA4 returned all of them."""
+    return {
+        "rows": rows_from_response(response, query_dims, metrics, is_compare),
+        "complete": response.row_count <= len(response.rows),
+    }
+
+
+def split_scope_rows(value: dict, dimensions: list, metrics: list, limit: int, scopes: list) -> Optional[dict]:
+    """{scope: rows} summed from the country-split report, or None if it was truncated."""
+    if not value["complete"]:
+        return None
+    au = GA4_COUNTRY_NAME_AUSTRALIA.lower()
+    totals = {scope: ({}, {}) for scope in scopes}
+    for row in value["rows"]:
+        key = tuple(row.get(d, "") for d in dimensions)
+        in_scope = ["all"] + (["au"] if str(row.get("country", "")).lower() == au else [])
+        for scope in in_scope:
+            if scope not in totals:
+                continue
+            current, previous = totals[scope]
+            for met in metrics:
+                if met in row:
+                    bucket = current.setdefault(key, {})
+                    bucket[met] = bucket.get(met, 0) + float(row[met])
+                if f"{met}_compare" in row:
+                    bucket = previous.setdefault(key, {})
+                    bucket[met] = bucket.get(met, 0) + float(row[f"{met}_compare"])
+    return {scope: _ranked_rows(cur, prev, dimensions, metrics, limit) for scope, (cur, prev) in totals.items()}
+
+
+def fetch_analytics_scopes(
+    start_date: str,
+    end_date: str,
+    dimensions: list,
+    metrics: list,
+    limit: int = 10000,
+    compare_start_date: str = None,
+    compare_end_date: str = None,
+    scopes: list = SCOPES,
+    format: str = "rows",
+) -> dict:
+    """
+    {scope: rows} for several location scopes. Scopes the local fact store can answer never
+    reach GA4. For the rest, additive metrics come from one report with `country` as an extra
+    dimension, split locally (AU slice + global total); non-additive metrics (users, rates,
+    durations), a single missing scope, or a truncated split report fall back to one query per scope.
+    """
+    scopes = check_scopes(scopes)
+    compare = bool(compare_start_date and compare_end_date)
+    out = {}
+    for s in scopes:
+        rows = facts_answer(start_date, end_date, dimensions, metrics, limit, compare_start_date, compare_end_date, s == "au")
+        if rows is not None:
+            out[s] = _format_rows(rows, dimensions, metrics, compare, format)
+    missing = [s for s in scopes if s not in out]
+    if can_split_scopes(metrics, missing):
+        request, query_dims = scopes_report_request(start_date, end_date, dimensions, metrics, compare_start_date, compare_end_date)
+        value = run_report_cached(
+            request,
+            lambda response: scopes_rows_from_response(response, query_dims, metrics, compare),
+            variant="scopes",
+        )
+        split = split_scope_rows(value, dimensions, metrics, limit, missing)
+        if split is not None:
+            out.update({s: _format_rows(split[s], dimensions, metrics, compare, format) for s in missing})
+            missing = []
+    for s in missing:
+        out[s] = fetch_ga4_data(start_date, end_date, dimensions, metrics, limit, compare_start_date, compare_end_date,
+                                dimension_filter=analytics_dimension_filter(s == "au"), format=format)
+    return {s: out[s] for s in scopes}
+
+
+def _format_rows(rows: list, dimensions: list, metrics: list, compare: bool, format: str = "rows"):
+    if check_format(format) == "columnar":
+        return ColumnarReport.from_rows(rows, dimensions, metrics, compare)
+    return rows
+
+
+def _iso_date(value: str) -> Optional[date]:
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _fact_value(value: float) -> str:
+    """GA4-style string for a summed metric (integers without a decimal point)."""
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def facts_answer(
+    start_date: str,
+    end_date: str,
+    dimensions: list,
+    metrics: list,
+    limit: int = 10000,
+    compare_start_date: str = None,
+    compare_end_date: str = None,
+    au_only: bool = False,
+    dimension_values: Optional[dict] = None,
+) -> Optional[list]:
+    """
+    Rows for an additive report summed from the local fact store, or None when the store is off,
+    the metrics are not additive for those dimensions, or any day of the range(s) is not synced.
+    Event counts and page views match GA4; summed sessions approximate it (see utils.fact_store).
+    Ordered by the first metric (descending) and cut to `limit`, like GA4's default.
+    dimension_values ({dimension: [values]}) keeps only those values, case-insensitively like
+    GA4's in-list filter; the dimension must be one of `dimensions`.
+    """
+    store = get_fact_store()
+    fact = fact_set_for(dimensions, metrics) if store is not None else None
+    if fact is None:
+        return None
+    keep = {}
+    for dim, values in (dimension_values or {}).items():
+        if dim not in dimensions:
+            return None
+        keep[dimensions.index(dim)] = {v.strip().lower() for v in values}
+    scope = "au" if au_only else "all"
+    ranges = [(_iso_date(start_date), _iso_date(end_date))]
+    compare = bool(compare_start_date and compare_end_date)
+    if compare:
+        ranges.append((_iso_date(compare_start_date), _iso_date(compare_end_date)))
+    for start, end in ranges:
+        if start is None or end is None or start > end or not store.covers(fact, scope, start, end):
+            return None
+
+    current = store.totals(fact, scope, *ranges[0], metrics)
+    previous = store.totals(fact, scope, *ranges[1], metrics) if compare else {}
+    if keep:
+        def wanted(key):
+            return all(key[i].lower() in values for i, values in keep.items())
+        current = {k: v for k, v in current.items() if wanted(k)}
+        previous = {k: v for k, v in previous.items() if wanted(k)}
+    store.count_local_answer()
+    return _ranked_rows(current, previous, dimensions, metrics, limit)
+
+
+def _ranked_rows(current: dict, previous: dict, dimensions: list, metrics: list, limit: int) -> list:
+    """
+    Row dicts from locally summed totals ({dims tuple: {metric: number}} per range), ordered by
+    the first metric descending and cut to `limit`, like GA4's default.
+    """
+    first = metrics[0]
+    keys = sorted(set(current) | set(previous), key=lambda k: (-current.get(k, {}).get(first, 0), k))
+    rows = []
+    for key in keys[:limit]:
+        row = dict(zip(dimensions, key))
+        for met, value in current.get(key, {}).items():
+            row[met] = _fact_value(value)
+        for met, value in previous.get(key, {}).items():
+            row[f"{met}_compare"] = _fact_value(value)
+        rows.append(row)
+    return rows
+
+
+# Days per GA4 query when syncing the fact store (bounds rows held in memory per write)
+FACT_SYNC_CHUNK_DAYS = 31
+
+
+def _day_chunks(days: list) -> list:
+    """Contiguous runs of days, each at most FACT_SYNC_CHUNK_DAYS long."""
+    chunks = []
+    for d in days:
+        if chunks and d - chunks[-1][-1] == timedelta(days=1) and len(chunks[-1]) < FACT_SYNC_CHUNK_DAYS:
+            chunks[-1].append(d)
+        else:
+            chunks.append([d])
+    return chunks
+
+
+def sync_fact_store(start: date, end: date, facts: Optional[list] = None, scopes: tuple = ("all", "au")) -> list:
+    """
+    Incrementally fills the fact store for [start, end]: only days that are missing or were
+    still settling when last synced are fetched (one `date` + dimensions report per run of days).
+    Returns [{"fact", "scope", "days", "rows"}] for what was fetched.
+    """
+    store = get_fact_store()
+    if store is None:
+        raise RuntimeError("GA4_FACT_STORE_PATH is not set")
+    done = []
+    for fact in facts or list(FACT_SETS):
+        spec = FACT_SETS[fact]
+        dims, metrics = spec["dimensions"], spec["metrics"]
+        for scope in scopes:
+            dim_filter = australia_country_filter_expression() if scope == "au" else None
+            fetched_days, fetched_rows = 0, 0
+            for chunk in _day_chunks(store.days_to_sync(fact, scope, start, end)):
+                rows = [
+                    (
+                        f"{r['date'][:4]}-{r['date'][4:6]}-{r['date'][6:]}",
+                        tuple(r[d] for d in dims),
+                        {m: float(r[m]) for m in metrics},
+                    )
+                    for r in iter_ga4_rows(
+                        chunk[0].isoformat(), chunk[-1].isoformat(), ["date"] + dims, metrics, dim_filter
+                    )
+                ]
+                fetched_rows += store.write_days(fact, scope, chunk, rows)
+                fetched_days += len(chunk)
+            done.append({"fact": fact, "scope": scope, "days": fetched_days, "rows": fetched_rows})
+    return done
+
+
+def _monthly_series_span(year: int, months: list):
+    """(sorted valid months, start_date, end_date) covering the first to the last requested month."""
+    months = sorted({int(m) for m in months if 1 <= int(m) <= 12})
+    if not months:
+        return months, None, None
+    _, last = calendar.monthrange(year, months[-1])
+    return months, f"{year}-{months[0]:02d}-01", f"{year}-{months[-1]:02d}-{last:02d}"
+
+
+def _monthly_series_rows(year: int, months: list, metrics: list, rows: list) -> list:
+    """One row per month from a yearMonth report, zero-filling months GA4 returned nothing for."""
+    by_ym = {r.get("yearMonth"): r for r in rows}
+    series = []
+    for m in months:
+        ym = f"{year}{m:02d}"
+        row = by_ym.get(ym) or {}
+        series.append({"yearMonth": ym, "month": m, **{met: row.get(met, "0") for met in metrics}})
+    return series
+
+
+def fetch_monthly_series(
+    year: int,
+    months: list,
+    metrics: list,
+    au_only: bool = False,
+) -> list:
+    """
+    One report keyed by `yearMonth` for all requested months (instead of one report per month).
+
+    Returns one dict per requested month, ascending: {"yearMonth": "YYYYMM", "month": m, <metric>: value}.
+    Months GA4 returns no row for are filled with "0" for every metric.
+    """
+    months, start, end = _monthly_series_span(year, months)
+    if not months:
+        return []
+    rows = fetch_analytics_data(start, end, ["yearMonth"], metrics, limit=12, au_only=au_only)
+    return _monthly_series_rows(year, months, metrics, rows)
+
+
 # GA4 event-scoped custom dimension for gtag param `form_context` (register in GA4 Admin if missing).
 _DIM_FORM_CONTEXT = "customEvent:form_context"
 
 
+def generate_lead_filter_expression(au_only: bool = False) -> FilterExpression:
+    """generate_lead events only (optionally Australia only)."""
+    return and_dimension_filters(
+        australia_country_filter_expression() if au_only else None,
+        event_name_filter_expression("generate_lead"),
+    )
+
+
+def form_context_rows(raw: list) -> list:
+    """Maps raw customEvent:form_context rows to {form_context, eventCount[, eventCount_compare]}."""
+    rows = []
+    for r in raw:
+        fc_raw = r.get(_DIM_FORM_CONTEXT) or ""
+        label = fc_raw.strip() if isinstance(fc_raw, str) else str(fc_raw)
+        if not label:
+            label = "(not set)"
+        row = {"form_context": label, "eventCount": r.get("eventCount", 0)}
+        if "eventCount_compare" in r:
+            row["eventCount_compare"] = r.get("eventCount_compare", 0)
+        rows.append(row)
+    return rows
+
+
 def fetch_generate_lead_by_form_context(
     start_date: str,
     end_date: str,
@@ -302,10 +1312,6 @@ def fetch_generate_lead_by_form_context(
     Counts of generate_lead broken down by customEvent:form_context
     (e.g. contact vs product_enquire from Contact Form 7 mail-sent tracking).
     """
-    dim_filt = and_dimension_filters(
-        australia_country_filter_expression() if au_only else None,
-        event_name_filter_expression("generate_lead"),
-    )
     raw = fetch_ga4_data(
         start_date,
         end_date,
@@ -314,16 +1320,6 @@ def fetch_generate_lead_by_form_context(
         limit,
         compare_start_date,
         compare_end_date,
-        dimension_filter=dim_filt,
+        dimension_filter=generate_lead_filter_expression(au_only),
     )
-    rows = []
-    for r in raw:
-        fc_raw = r.get(_DIM_FORM_CONTEXT) or ""
-        label = fc_raw.strip() if isinstance(fc_raw, str) else str(fc_raw)
-        if not label:
-            label = "(not set)"
-        row = {"form_context": label, "eventCount": r.get("eventCount", 0)}
-        if "eventCount_compare" in r:
-            row["eventCount_compare"] = r.get("eventCount_compare", 0)
-        rows.append(row)
-    return rows
+    return form_context_rows(raw)
@@ -0,0 +1,303 @@
+"""
+Local index (SQLite) of Google Business Profile reviews, kept in sync incrementally.
+
+The v4 `reviews` list is paged (50 per page, newest update first). The first sync pages
+through every review; later syncs stop at the first page that reaches reviews already stored
+(by `updateTime`), and a periodic full pass drops deleted reviews. Reviews are indexed by
+`reviewId` and `updateTime`, and the star-rating distribution is kept as running counts
+updated in the same transaction, so ratings are served without scanning reviews.
+
+Set GBP_REVIEW_STORE_PATH (e.g. .cache/gbp_reviews.sqlite) to keep the index across restarts;
+without it the index lives in process memory: one in-memory SQLite connection that every thread
+uses under a lock (shared-cache mode would fail readers with "table is locked" during a sync).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from typing import Optional
+
+# Reviews are re-synced (new / updated only) at most this often per location (seconds)
+GBP_REVIEWS_SYNC_INTERVAL = int(os.environ.get('GBP_REVIEWS_SYNC_INTERVAL', '300'))
+# A full pass (which also drops deleted reviews) once the last one is older than this (seconds)
+GBP_REVIEWS_FULL_SYNC_AGE = int(os.environ.get('GBP_REVIEWS_FULL_SYNC_AGE', '86400'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    location TEXT NOT NULL,
+    review_id TEXT NOT NULL,
+    update_time TEXT NOT NULL,
+    star INTEGER,
+    body TEXT NOT NULL,
+    PRIMARY KEY (location, review_id)
+);
+CREATE INDEX IF NOT EXISTS reviews_by_update ON reviews (location, update_time DESC);
+CREATE TABLE IF NOT EXISTS rating_counts (
+    location TEXT NOT NULL,
+    star INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (location, star)
+);
+CREATE TABLE IF NOT EXISTS review_sync (
+    location TEXT PRIMARY KEY,
+    average_rating REAL NOT NULL,
+    total_review_count INTEGER NOT NULL,
+    latest_update TEXT,
+    synced_at REAL NOT NULL,
+    full_synced_at REAL NOT NULL
+);
+"""
+
+# v4 starRating enum -> stars (numeric ratings pass through)
+_STAR_NAMES = {"ONE": 1, "TWO": 2, "THREE": 3, "FOUR": 4, "FIVE": 5}
+
+
+def star_value(review: dict) -> Optional[int]:
+    """1–5 from a review's starRating ("FIVE" or 5) / rating, else None (e.g. STAR_RATING_UNSPECIFIED)."""
+    star = review.get("starRating")
+    if star is None:
+        star = review.get("rating")
+    if isinstance(star, str):
+        star = _STAR_NAMES.get(star.upper(), star)
+    try:
+        star = int(star)
+    except (TypeError, ValueError):
+        return None
+    return star if 1 <= star <= 5 else None
+
+
+class GBPReviewStore:
+    """Reviews by (location, reviewId) + running rating counts + per-location sync state."""
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self._memory = not path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialised = False
+        # In memory: the single connection, and the lock every query and transaction holds
+        self._shared: Optional[sqlite3.Connection] = None
+        self._memory_lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+        self.local_answers = 0
+
+    def _locked(self):
+        """Held around every query / transaction when in memory (file stores: one connection per thread)."""
+        return self._memory_lock if self._memory else nullcontext()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._memory:
+            with self._init_lock:
+                if self._shared is None:
+                    conn = sqlite3.connect(":memory:", isolation_level=None, check_same_thread=False)
+                    conn.executescript(_SCHEMA)
+                    self._shared = conn
+            return self._shared
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout=10000')
+        with self._init_lock:
+            if not self._initialised:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(_SCHEMA)
+                self._initialised = True
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn = conn
+        return conn
+
+    # --- sync --------------------------------------------------------------------------
+
+    def sync_state(self, location: str) -> Optional[dict]:
+        with self._locked():
+            row = self._conn().execute(
+                'SELECT average_rating, total_review_count, latest_update, synced_at, full_synced_at '
+                'FROM review_sync WHERE location = ?',
+                (location,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "averageRating": row[0],
+            "totalReviewCount": row[1],
+            "latestUpdate": row[2],
+            "syncedAt": row[3],
+            "fullSyncedAt": row[4],
+        }
+
+    def sync_plan(self, location: str):
+        """
+        (sync, full, watermark): whether to call the API now, whether to page through everything,
+        and the newest stored updateTime an incremental sync can stop at.
+        """
+        state = self.sync_state(location)
+        now = time.time()
+        if state is None or now - state["fullSyncedAt"] >= GBP_REVIEWS_FULL_SYNC_AGE:
+            return True, True, None
+        if now - state["syncedAt"] < GBP_REVIEWS_SYNC_INTERVAL:
+            return False, False, state["latestUpdate"]
+        return True, False, state["latestUpdate"]
+
+    def apply(self, location: str, reviews: list, average_rating, total_review_count, full: bool) -> int:
+        """
+        Upsert `reviews` and adjust the rating counts in one transaction. full=True means `reviews`
+        is every review the API returned: anything else stored for the location is deleted.
+        Returns the number of reviews inserted or changed.
+        """
+        with self._locked():
+            changed = self._apply(location, reviews, average_rating, total_review_count, full)
+        with self._stats_lock:
+            if full:
+                self.full_syncs += 1
+            else:
+                self.incremental_syncs += 1
+        return changed
+
+    def count_local_answer(self) -> None:
+        with self._stats_lock:
+            self.local_answers += 1
+
+    def _apply(self, location: str, reviews: list, average_rating, total_review_count, full: bool) -> int:
+        conn = self._conn()
+        now = time.time()
+        delta: dict = {}
+        changed = 0
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for review in reviews:
+                review_id = review.get("reviewId") or review.get("name")
+                if not review_id:
+                    continue
+                update_time = review.get("updateTime") or review.get("createTime") or ""
+                star = star_value(review)
+                old = conn.execute(
+                    'SELECT update_time, star FROM reviews WHERE location = ? AND review_id = ?',
+                    (location, review_id),
+                ).fetchone()
+                if old is not None and old[0] == update_time:
+                    continue
+                if old is not None and old[1] is not None:
+                    delta[old[1]] = delta.get(old[1], 0) - 1
+                if star is not None:
+                    delta[star] = delta.get(star, 0) + 1
+                conn.execute(
+                    'INSERT OR REPLACE INTO reviews (location, review_id, update_time, star, body) VALUES (?, ?, ?, ?, ?)',
+                    (location, review_id, update_time, star, json.dumps(review)),
+                )
+                changed += 1
+            if full:
+                keep = {r.get("reviewId") or r.get("name") for r in reviews}
+                for review_id, star in conn.execute(
+                    'SELECT review_id, star FROM reviews WHERE location = ?', (location,)
+                ).fetchall():
+                    if review_id not in keep:
+                        conn.execute('DELETE FROM reviews WHERE location = ? AND review_id = ?', (location, review_id))
+                        if star is not None:
+                            delta[star] = delta.get(star, 0) - 1
+                        changed += 1
+            for star, diff in delta.items():
+                conn.execute(
+                    'INSERT INTO rating_counts (location, star, count) VALUES (?, ?, ?) '
+                    'ON CONFLICT (location, star) DO UPDATE SET count = count + excluded.count',
+                    (location, star, diff),
+                )
+            latest = conn.execute(
+                'SELECT MAX(update_time) FROM reviews WHERE location = ?', (location,)
+            ).fetchone()[0]
+            previous = self.sync_state(location)
+            conn.execute(
+                'INSERT OR REPLACE INTO review_sync '
+                '(location, average_rating, total_review_count, latest_update, synced_at, full_synced_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (
+                    location,
+                    float(average_rating or 0),
+                    int(total_review_count or 0),
+                    latest,
+                    now,
+                    now if full or previous is None else previous["fullSyncedAt"],
+                ),
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return changed
+
+    # --- queries -----------------------------------------------------------------------
+
+    def recent(self, location: str, limit: int) -> list:
+        """Newest-updated reviews first (as the API orders them)."""
+        with self._locked():
+            rows = self._conn().execute(
+                'SELECT body FROM reviews WHERE location = ? ORDER BY update_time DESC LIMIT ?',
+                (location, limit),
+            ).fetchall()
+        return [json.loads(body) for (body,) in rows]
+
+    def distribution(self, location: str) -> dict:
+        """{"1": n, …, "5": n} from the running counts."""
+        dist = {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
+        with self._locked():
+            rows = self._conn().execute(
+                'SELECT star, count FROM rating_counts WHERE location = ?', (location,)
+            ).fetchall()
+        for star, count in rows:
+            dist[str(star)] = count
+        return dist
+
+    def stats(self) -> dict:
+        with self._locked():
+            conn = self._conn()
+            reviews = conn.execute('SELECT COUNT(*) FROM reviews').fetchone()[0]
+            synced = conn.execute(
+                'SELECT location, total_review_count, latest_update, synced_at FROM review_sync'
+            ).fetchall()
+        return {
+            "enabled": True,
+            "path": self.path or ":memory:",
+            "reviews": reviews,
+            "fullSyncs": self.full_syncs,
+            "incrementalSyncs": self.incremental_syncs,
+            "localAnswers": self.local_answers,
+            "locations": [
+                {"location": loc, "totalReviewCount": total, "latestUpdate": latest,
+                 "ageSeconds": round(time.time() - synced_at, 1)}
+                for loc, total, latest, synced_at in synced
+            ],
+        }
+
+
+_store: Optional[GBPReviewStore] = None
+_store_lock = threading.Lock()
+
+
+def get_gbp_review_store() -> GBPReviewStore:
+    """Shared review index: GBP_REVIEW_STORE_PATH if set and usable, else in process memory."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = os.environ.get('GBP_REVIEW_STORE_PATH', '').strip()
+                store = GBPReviewStore(path)
+                try:
+                    store._conn()
+                except (OSError, sqlite3.Error) as e:
+                    print(f"GBP review store unavailable at {path}: {e}; keeping reviews in memory")
+                    store = GBPReviewStore()
+                    store._conn()
+                _store = store
+    return _store
+
+
+def gbp_review_store_stats() -> dict:
+    return get_gbp_review_store().stats()
@@ -0,0 +1,205 @@
+"""
+Optional local store (SQLite) of daily Google Business Profile performance metrics.
+
+fetchMultiDailyMetricsTimeSeries returns one value per day and metric, and every summary
+the dashboard shows is a sum over days, so once a location's days are stored any range (and
+any compare range) is answered locally. Only days that are missing, or still settling and
+not synced recently, are fetched from the Performance API.
+
+Enable with GBP_METRICS_STORE_PATH (e.g. .cache/gbp_metrics.sqlite); fill it ahead of time with
+scripts/sync_gbp_metrics.py, or let /api/gbp/insights sync the days it needs on demand.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+# GBP keeps revising the last few days; days older than this are final
+GBP_METRICS_SETTLE_DAYS = int(os.environ.get('GBP_METRICS_SETTLE_DAYS', '5'))
+# Settling days are fetched again once their last sync is older than this (seconds)
+GBP_METRICS_OPEN_MAX_AGE = int(os.environ.get('GBP_METRICS_OPEN_MAX_AGE', '3600'))
+# GBP dates are the location's local days, whatever the server's clock (UTC on Vercel) says.
+GBP_LOCATION_TIMEZONE = ZoneInfo(os.environ.get('GBP_LOCATION_TIMEZONE', 'Australia/Sydney'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    location TEXT NOT NULL,
+    date TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (location, date, metric)
+);
+CREATE TABLE IF NOT EXISTS synced_days (
+    location TEXT NOT NULL,
+    date TEXT NOT NULL,
+    final INTEGER NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (location, date)
+);
+"""
+
+
+def day_range(start: date, end: date) -> list:
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def location_today() -> date:
+    """Today's date in the GBP location's time zone."""
+    return datetime.now(GBP_LOCATION_TIMEZONE).date()
+
+
+def is_final_day(day: date) -> bool:
+    return day < location_today() - timedelta(days=GBP_METRICS_SETTLE_DAYS)
+
+
+class GBPMetricsStore:
+    """Per-location daily metric values + per-day sync log in SQLite (WAL); one connection per thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialised = False
+        self._stats_lock = threading.Lock()
+        self.local_answers = 0
+        self.days_fetched = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout=10000')
+        with self._init_lock:
+            if not self._initialised:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(_SCHEMA)
+                self._initialised = True
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn = conn
+        return conn
+
+    # --- sync bookkeeping --------------------------------------------------------------
+
+    def days_to_sync(self, location: str, start: date, end: date) -> list:
+        """Days in [start, end] that are missing, or settling and not synced within GBP_METRICS_OPEN_MAX_AGE."""
+        fresh_after = time.time() - GBP_METRICS_OPEN_MAX_AGE
+        rows = self._conn().execute(
+            'SELECT date FROM synced_days WHERE location = ? AND date BETWEEN ? AND ? '
+            'AND (final = 1 OR synced_at >= ?)',
+            (location, start.isoformat(), end.isoformat(), fresh_after),
+        ).fetchall()
+        done = {r[0] for r in rows}
+        return [d for d in day_range(start, end) if d.isoformat() not in done]
+
+    def write_days(self, location: str, days: list, values) -> int:
+        """
+        Replace the values for `days` with `values` ((date 'YYYY-MM-DD', metric, value)) in one
+        transaction, and mark every day synced (days without values are zero days).
+        """
+        conn = self._conn()
+        now = time.time()
+        wanted = {d.isoformat() for d in days}
+        rows = [(location, day, metric, int(value)) for day, metric, value in values if day in wanted]
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'DELETE FROM metrics WHERE location = ? AND date = ?',
+                [(location, d.isoformat()) for d in days],
+            )
+            conn.executemany(
+                'INSERT OR REPLACE INTO metrics (location, date, metric, value) VALUES (?, ?, ?, ?)',
+                rows,
+            )
+            conn.executemany(
+                'INSERT OR REPLACE INTO synced_days (location, date, final, synced_at) VALUES (?, ?, ?, ?)',
+                [(location, d.isoformat(), int(is_final_day(d)), now) for d in days],
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        with self._stats_lock:
+            self.days_fetched += len(days)
+        return len(rows)
+
+    def count_local_answer(self) -> None:
+        with self._stats_lock:
+            self.local_answers += 1
+
+    # --- queries -----------------------------------------------------------------------
+
+    def totals(self, location: str, start: date, end: date) -> dict:
+        """{metric: summed value} over [start, end]."""
+        cur = self._conn().execute(
+            'SELECT metric, SUM(value) FROM metrics WHERE location = ? AND date BETWEEN ? AND ? GROUP BY metric',
+            (location, start.isoformat(), end.isoformat()),
+        )
+        return {metric: int(value) for metric, value in cur}
+
+    def daily(self, location: str, start: date, end: date) -> dict:
+        """{metric: [(date 'YYYY-MM-DD', value), ...]} over [start, end], by date."""
+        cur = self._conn().execute(
+            'SELECT metric, date, value FROM metrics WHERE location = ? AND date BETWEEN ? AND ? ORDER BY metric, date',
+            (location, start.isoformat(), end.isoformat()),
+        )
+        out: dict = {}
+        for metric, day, value in cur:
+            out.setdefault(metric, []).append((day, value))
+        return out
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        synced = conn.execute(
+            'SELECT location, COUNT(*), MIN(date), MAX(date), SUM(final) FROM synced_days GROUP BY location'
+        ).fetchall()
+        return {
+            "enabled": True,
+            "path": self.path,
+            "values": conn.execute('SELECT COUNT(*) FROM metrics').fetchone()[0],
+            "localAnswers": self.local_answers,
+            "daysFetched": self.days_fetched,
+            "synced": [
+                {"location": loc, "days": n, "from": lo, "to": hi, "finalDays": final}
+                for loc, n, lo, hi, final in synced
+            ],
+        }
+
+
+_store: Optional[GBPMetricsStore] = None
+_store_failed = False
+_store_lock = threading.Lock()
+
+
+def get_gbp_metrics_store() -> Optional[GBPMetricsStore]:
+    """Shared store when GBP_METRICS_STORE_PATH is set, else None. Errors opening it disable it."""
+    global _store, _store_failed
+    path = os.environ.get('GBP_METRICS_STORE_PATH', '').strip()
+    if not path or _store_failed:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None and not _store_failed:
+                try:
+                    store = GBPMetricsStore(path)
+                    store._conn()
+                    _store = store
+                except (OSError, sqlite3.Error) as e:
+                    print(f"GBP metrics store unavailable at {path}: {e}")
+                    _store_failed = True
+    return _store
+
+
+def gbp_metrics_store_stats() -> dict:
+    store = get_gbp_metrics_store()
+    if store is None:
+        return {"enabled": False}
+    return store.stats()
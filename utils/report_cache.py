@@ -0,0 +1,178 @@
+"""
+In-process TTL + LRU cache for GA4 report results.
+
+Keys are a canonical form of the RunReportRequest (property, dimensions, metrics,
+date ranges, limit, filter expression), so query-string noise such as the dashboard's
+`_t` cache-buster never reaches the key. Fully closed historical ranges get a long TTL;
+anything touching the last few days (GA4 is still processing) gets a short one.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Optional
+from zoneinfo import ZoneInfo
+
+from google.protobuf.json_format import MessageToDict
+
+# Configuration (env overrides; max entries 0 disables the cache)
+CACHE_MAX_ENTRIES = int(os.environ.get('GA4_REPORT_CACHE_MAX_ENTRIES', '512'))
+CACHE_CLOSED_TTL = int(os.environ.get('GA4_REPORT_CACHE_CLOSED_TTL', str(7 * 24 * 3600)))
+CACHE_OPEN_TTL = int(os.environ.get('GA4_REPORT_CACHE_OPEN_TTL', '300'))
+# GA4 keeps revising the most recent days; a range is "closed" once it ends this many days ago.
+CACHE_SETTLE_DAYS = int(os.environ.get('GA4_REPORT_CACHE_SETTLE_DAYS', '2'))
+# Property reporting time zone decides what "today" means for GA4 dates.
+PROPERTY_TIMEZONE = ZoneInfo(os.environ.get('GA4_PROPERTY_TIMEZONE', 'Australia/Sydney'))
+
+
+def property_today() -> date:
+    """Today's date in the GA4 property time zone."""
+    return datetime.now(PROPERTY_TIMEZONE).date()
+
+
+def canonical_request(request) -> dict:
+    """Plain dict form of a GA4 request message (stable field names, defaults omitted)."""
+    return MessageToDict(type(request).pb(request), preserving_proto_field_name=True)
+
+
+def request_cache_key(request) -> str:
+    """Stable cache key for a RunReportRequest (sha1 of its sorted canonical JSON)."""
+    blob = json.dumps(canonical_request(request), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(blob.encode('utf-8')).hexdigest()
+
+
+def _parse_ga4_date(value: str) -> Optional[date]:
+    """YYYY-MM-DD only; relative GA4 dates (today, 7daysAgo, …) are treated as open."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def is_closed_range(date_ranges, settle_days: int = CACHE_SETTLE_DAYS) -> bool:
+    """True if every date range ends before GA4's still-settling window."""
+    if not date_ranges:
+        return False
+    cutoff = property_today() - timedelta(days=settle_days)
+    for dr in date_ranges:
+        end = _parse_ga4_date(dr.end_date)
+        if end is None or end >= cutoff:
+            return False
+    return True
+
+
+def ttl_for_request(request) -> int:
+    """Long TTL for fully closed historical ranges, short TTL otherwise."""
+    return CACHE_CLOSED_TTL if is_closed_range(request.date_ranges) else CACHE_OPEN_TTL
+
+
+def describe_request(request) -> dict:
+    """Short, human-readable summary of a report request (for the admin endpoint)."""
+    return {
+        "dimensions": [d.name for d in request.dimensions],
+        "metrics": [m.name for m in request.metrics],
+        "dateRanges": [f"{dr.start_date}..{dr.end_date}" for dr in request.date_ranges],
+        "limit": int(request.limit),
+        "filtered": "dimension_filter" in request,
+    }
+
+
+class ReportCache:
+    """Thread-safe, size-bounded LRU with per-entry TTL and hit/miss counters."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (expires_at, stored_at, closed, value, meta)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[3]
+
+    def set(self, key: str, value: Any, ttl: int, closed: bool = False, meta: Optional[dict] = None) -> None:
+        if not self.enabled or ttl <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (now + ttl, now, closed, value, meta or {})
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Optional[str] = None, open_only: bool = False) -> int:
+        """Drop one key, every open-range entry (open_only), or everything. Returns count removed."""
+        with self._lock:
+            if key is not None:
+                return 1 if self._entries.pop(key, None) is not None else 0
+            if open_only:
+                stale = [k for k, e in self._entries.items() if not e[2]]
+                for k in stale:
+                    del self._entries[k]
+                return len(stale)
+            n = len(self._entries)
+            self._entries.clear()
+            return n
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "closedTtlSeconds": CACHE_CLOSED_TTL,
+                "openTtlSeconds": CACHE_OPEN_TTL,
+                "settleDays": CACHE_SETTLE_DAYS,
+            }
+
+    def entries(self) -> list:
+        """Snapshot of live entries, most recently used last."""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "key": k,
+                    "closedRange": e[2],
+                    "ageSeconds": round(now - e[1], 1),
+                    "expiresInSeconds": round(e[0] - now, 1),
+                    **e[4],
+                }
+                for k, e in self._entries.items()
+                if e[0] > now
+            ]
+
+
+# Process-wide instance used by utils.ga4_utils
+report_cache = ReportCache()
@@ -0,0 +1,149 @@
+"""
+Optional persistent (SQLite) store for GA4 report results over closed date ranges.
+
+Second tier behind utils.report_cache: survives Vercel cold starts and `uvicorn --reload`.
+Only fully closed ranges are written (those results can never change), so a hit never needs
+revalidating. WAL mode lets several uvicorn workers read and write the same file.
+The store is best-effort: a SQLite error on a read or write (locked or full disk, corrupt page,
+read-only filesystem) is counted and treated as a miss / skipped write, never a failed request.
+
+Enable with GA4_REPORT_STORE_PATH (e.g. .cache/ga4_reports.sqlite; /tmp/… on Vercel).
+Prewarm with scripts/prewarm_report_store.py.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    meta TEXT NOT NULL DEFAULT '{}',
+    stored_at REAL NOT NULL
+)
+"""
+
+
+class ReportStore:
+    """Key → JSON value table in SQLite; one connection per thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialised = False
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+        self.last_error = None
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout=10000')
+        with self._init_lock:
+            if not self._initialised:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(_SCHEMA)
+                self._initialised = True
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn = conn
+        return conn
+
+    def _count(self, counter: str, error: Optional[Exception] = None) -> None:
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            if error is not None:
+                self.last_error = str(error)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Stored value, or None on a miss or a SQLite error (counted in stats)."""
+        try:
+            row = self._conn().execute('SELECT value FROM reports WHERE key = ?', (key,)).fetchone()
+        except (OSError, sqlite3.Error) as e:
+            self._count("errors", e)
+            row = None
+        if row is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, meta: Optional[dict] = None) -> None:
+        """Store a value; a SQLite error skips the write (counted in stats)."""
+        try:
+            self._conn().execute(
+                'INSERT OR REPLACE INTO reports (key, value, meta, stored_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value, separators=(',', ':')), json.dumps(meta or {}), time.time()),
+            )
+        except (OSError, sqlite3.Error) as e:
+            self._count("errors", e)
+            return
+        self._count("writes")
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        if key is not None:
+            cur = self._conn().execute('DELETE FROM reports WHERE key = ?', (key,))
+        else:
+            cur = self._conn().execute('DELETE FROM reports')
+        return cur.rowcount
+
+    def stats(self) -> dict:
+        try:
+            count = self._conn().execute('SELECT COUNT(*) FROM reports').fetchone()[0]
+        except (OSError, sqlite3.Error) as e:
+            self._count("errors", e)
+            count = None
+        return {
+            "enabled": True,
+            "path": self.path,
+            "entries": count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+            "lastError": self.last_error,
+        }
+
+
+_store: Optional[ReportStore] = None
+_store_failed = False
+_store_lock = threading.Lock()
+
+
+def get_report_store() -> Optional[ReportStore]:
+    """Shared store when GA4_REPORT_STORE_PATH is set, else None. Errors opening it disable it."""
+    global _store, _store_failed
+    path = os.environ.get('GA4_REPORT_STORE_PATH', '').strip()
+    if not path or _store_failed:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None and not _store_failed:
+                try:
+                    store = ReportStore(path)
+                    store._conn()
+                    _store = store
+                except (OSError, sqlite3.Error) as e:
+                    print(f"GA4 report store unavailable at {path}: {e}")
+                    _store_failed = True
+    return _store
+
+
+def report_store_stats() -> dict:
+    store = get_report_store()
+    if store is None:
+        return {"enabled": False}
+    return store.stats()
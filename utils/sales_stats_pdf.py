@@ -17,7 +17,7 @@ from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 
-from utils.ga4_utils import fetch_analytics_data
+from utils.ga4_utils import fetch_analytics_data, fetch_monthly_series
 
 
 def _month_span(year: int, month: int) -> tuple[str, str]:
@@ -40,13 +40,12 @@ def _collect_monthly_series(year: int, months: list[int], au_only: bool = False)
     sessions: list[float] = []
     users: list[float] = []
     engagement_pct: list[float] = []
-    for m in months:
-        sd, ed = _month_span(year, m)
-        rows = fetch_analytics_data(
-            sd, ed, [], ["sessions", "totalUsers", "engagementRate"], limit=1, au_only=au_only
-        )
-        row = rows[0] if rows else {}
-        labels.append(calendar.month_abbr[m])
+    # One yearMonth-keyed report for every month (zero-filled), not one report per month
+    series = fetch_monthly_series(
+        year, months, ["sessions", "totalUsers", "engagementRate"], au_only=au_only
+    )
+    for row in series:
+        labels.append(calendar.month_abbr[row["month"]])
         sessions.append(_float_metric(row, "sessions"))
         users.append(_float_metric(row, "totalUsers"))
         er = _float_metric(row, "engagementRate")
@@ -0,0 +1,239 @@
+"""
+Server-side Sales stats (Jan–Apr tab) bundle: every section for many months in one call.
+Used by GET /api/analytics/simple-range.
+
+Each bundle has the keys and section envelopes `fetchSimpleMonthBundle` builds in
+public/index.html, so the tab renders it unchanged. Two sections only carry what the tab reads:
+`pagesMerge` holds the top SIMPLE_TOP_PAGES pages per month (pagePath, pageTitle,
+screenPageViews; no activeUsers) and `events` only SIMPLE_EVENT_NAMES, without the lead breakdown.
+Sessions / users / engagement, the On a Roll article views, the buy-online clicks, the top
+pages and the capital cities each come from one report grouped by `yearMonth`; the per-month
+sources are awaited concurrently through the same async helpers as the single endpoints (so
+they share the report cache, store and GA4 concurrency slots).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import calendar
+from typing import Optional
+
+from utils.ga4_async import (
+    fetch_analytics_data_async,
+    fetch_event_counts_async,
+    fetch_monthly_series_async,
+    fetch_paths_screen_page_views_totals_async,
+    fetch_top_pages_matrix_async,
+)
+
+OVERVIEW_METRICS = ['sessions', 'totalUsers', 'screenPageViews', 'bounceRate', 'averageSessionDuration', 'engagementRate']
+
+
+def month_span(year: int, month: int) -> tuple[str, str]:
+    _, last = calendar.monthrange(year, month)
+    return f"{year}-{month:02d}-01", f"{year}-{month:02d}-{last:02d}"
+
+
+def _prev_year_month(y: int, m: int) -> tuple[int, int]:
+    if m <= 1:
+        return y - 1, 12
+    return y, m - 1
+
+
+def resolve_oar_featured(paths: dict, titles: dict, year: int, month: int, max_lookback: int = 24) -> dict:
+    """
+    On a Roll slug/title for a column month; if there is no post that month, use the newest
+    prior month that has one (same walk as simpleResolveOarFromConfig in the dashboard).
+    """
+    y, m = year, month
+    for i in range(max_lookback):
+        key = f"{y}-{m:02d}"
+        slug = str((paths or {}).get(key) or "").strip()
+        if slug:
+            return {
+                "slug": slug,
+                "title": str((titles or {}).get(key) or "").strip(),
+                "sourceMonthNum": m,
+                "usedPriorMonth": i > 0,
+            }
+        y, m = _prev_year_month(y, m)
+    return {"slug": "", "title": "", "sourceMonthNum": None, "usedPriorMonth": False}
+
+
+async def fetch_monthly_overview(year: int, months: list, au_only: bool = False) -> dict:
+    """Overview metrics per month from one `yearMonth` report: {month: {metric: value}}."""
+    series = await fetch_monthly_series_async(year, months, OVERVIEW_METRICS, au_only=au_only)
+    return {row["month"]: {met: row[met] for met in OVERVIEW_METRICS} for row in series}
+
+
+async def _section(coro):
+    """Endpoint-style envelope: {"success": True, "data": ...} or a failure with empty data."""
+    try:
+        return {"success": True, "data": await coro}
+    except Exception as e:
+        return {"success": False, "data": [], "error": str(e)}
+
+
+# The tab only reads these events from the events section
+SIMPLE_EVENT_NAMES = ['click_buy_online']
+
+
+async def _events_sections(year: int, months: list, au_only: bool) -> dict:
+    """
+    events envelope per month from one eventName × yearMonth report filtered to
+    SIMPLE_EVENT_NAMES (instead of a top-50 events report plus a lead breakdown per month).
+    """
+    start, _ = month_span(year, months[0])
+    _, end = month_span(year, months[-1])
+    envelope = await _section(fetch_event_counts_async(start, end, SIMPLE_EVENT_NAMES, au_only=au_only, by_month=True))
+    out = {}
+    for m in months:
+        section = {**envelope, "generate_lead_by_context": None, "generate_lead_breakdown_error": None}
+        if envelope["success"]:
+            ym = f"{year}{m:02d}"
+            section["data"] = [
+                {"eventName": item["eventName"], "eventCount": str(item["byMonth"].get(ym, 0))}
+                for item in envelope["data"]
+            ]
+        out[m] = section
+    return out
+
+
+# The tab's "Top pages" subtable shows this many rows per month (SIMPLE_TOP_PAGES_PER_MONTH)
+SIMPLE_TOP_PAGES = 5
+
+
+async def _top_pages_sections(year: int, months: list, au_only: bool) -> dict:
+    """
+    pagesMerge envelope per month from one yearMonth × page report ranked server-side
+    (instead of a top-100 pages report per month sorted in the browser).
+    """
+    start, _ = month_span(year, months[0])
+    _, end = month_span(year, months[-1])
+    envelope = await _section(fetch_top_pages_matrix_async(start, end, k=SIMPLE_TOP_PAGES, au_only=au_only))
+    by_month = {item["yearMonth"]: item["pages"] for item in envelope["data"]} if envelope["success"] else {}
+    out = {}
+    for m in months:
+        section = dict(envelope)
+        if envelope["success"]:
+            section["data"] = [
+                {**page, "screenPageViews": str(page["screenPageViews"])}
+                for page in by_month.get(f"{year}{m:02d}", [])
+            ]
+        out[m] = section
+    return out
+
+
+async def _path_features(year: int, months: list, slugs: dict, au_only: bool) -> dict:
+    """
+    pathFeature envelope per month from one pagePath × yearMonth report covering every
+    featured slug (instead of one path-views report per month).
+    """
+    wanted = sorted({slug for slug in slugs.values() if slug})
+    if not wanted:
+        return {m: {"success": True, "data": {"screenPageViews": 0}} for m in months}
+    start, _ = month_span(year, months[0])
+    _, end = month_span(year, months[-1])
+    envelope = await _section(fetch_paths_screen_page_views_totals_async(
+        start, end, wanted, match_type="contains", au_only=au_only, by_month=True
+    ))
+    by_slug = {item["path"]: item["byMonth"] for item in envelope["data"]} if envelope["success"] else {}
+    out = {}
+    for m in months:
+        slug = slugs.get(m)
+        if not slug:
+            out[m] = {"success": True, "data": {"screenPageViews": 0}}
+        elif not envelope["success"]:
+            out[m] = {**envelope, "data": []}
+        else:
+            views = by_slug.get(slug, {}).get(f"{year}{m:02d}", 0)
+            out[m] = {"success": True, "data": {"screenPageViews": views, "path": slug, "match": "contains"}}
+    return out
+
+
+# The tab's capital-cities table (SIMPLE_STATS_AU_CAPITALS) only reads these cities
+SIMPLE_CITIES = ['Sydney', 'Melbourne', 'Brisbane', 'Adelaide', 'Perth', 'Hobart', 'Canberra', 'Darwin']
+
+
+async def _cities_sections(year: int, months: list, au_only: bool) -> dict:
+    """
+    cities envelope per month from one city × yearMonth report filtered to SIMPLE_CITIES
+    (instead of a top-50 cities report per month, which missed capitals ranked lower).
+    """
+    start, _ = month_span(year, months[0])
+    _, end = month_span(year, months[-1])
+    envelope = await _section(fetch_analytics_data_async(
+        start, end, ['city', 'yearMonth'], ['sessions'], 10000, au_only=au_only, cities=SIMPLE_CITIES
+    ))
+    out = {}
+    for m in months:
+        section = dict(envelope)
+        if envelope["success"]:
+            ym = f"{year}{m:02d}"
+            section["data"] = [
+                {"city": row["city"], "sessions": row["sessions"]}
+                for row in envelope["data"] if row["yearMonth"] == ym
+            ]
+        out[m] = section
+    return out
+
+
+async def build_simple_range_bundles(
+    year: int,
+    months: list,
+    au_only: bool = False,
+    featured: Optional[dict] = None,
+    oar_paths: Optional[dict] = None,
+    oar_titles: Optional[dict] = None,
+) -> list:
+    """
+    One bundle per month (ascending), shaped like fetchSimpleMonthBundle's return value.
+
+    featured: optional {month: slug} chosen by the caller (wins over oar_paths/oar_titles,
+    which are YYYY-MM maps from the On a Roll RSS feed).
+    """
+    months = sorted({m for m in months if 1 <= m <= 12})
+    if not months:
+        raise ValueError("Select at least one month between 1 and 12.")
+
+    oar = {}
+    for m in months:
+        resolved = resolve_oar_featured(oar_paths or {}, oar_titles or {}, year, m)
+        if featured and m in featured:
+            slug = (featured[m] or "").strip()
+            resolved = {"slug": slug, "title": "", "sourceMonthNum": m if slug else None, "usedPriorMonth": False}
+        oar[m] = resolved
+
+    overview, path_features, events, top_pages, cities, *sources = await asyncio.gather(
+        fetch_monthly_overview(year, months, au_only),
+        _path_features(year, months, {m: oar[m]["slug"] for m in months}, au_only),
+        _events_sections(year, months, au_only),
+        _top_pages_sections(year, months, au_only),
+        _cities_sections(year, months, au_only),
+        *(
+            _section(fetch_analytics_data_async(*month_span(year, m), ['sessionSourceMedium'], ['sessions'], 15, au_only=au_only))
+            for m in months
+        ),
+    )
+
+    bundles = []
+    for m, month_sources in zip(months, sources):
+        sd, ed = month_span(year, m)
+        o = oar[m]
+        src_m = o["sourceMonthNum"]
+        bundles.append({
+            "start_date": sd,
+            "end_date": ed,
+            "ymKey": f"{year}-{m:02d}",
+            "oarFeaturedSlug": o["slug"] or None,
+            "oarFeaturedTitle": o["title"] or None,
+            "oarStoryMonthShort": calendar.month_abbr[src_m] if src_m and 1 <= src_m <= 12 else "",
+            "oarUsedPriorMonthStory": o["usedPriorMonth"],
+            "overview": overview[m],
+            "sources": month_sources,
+            "pagesMerge": top_pages[m],
+            "pathFeature": path_features[m],
+            "cities": cities[m],
+            "events": events[m],
+        })
+    return bundles
@@ -0,0 +1,100 @@
+"""
+Single-flight call coalescing: concurrent callers asking for the same key share one upstream call.
+
+Works for both worlds the API runs in: `do()` for threads (sync helpers, PDF builder, scripts)
+and `do_async()` for coroutines (async routes). Results are shared objects; callers that
+mutate them must copy first.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Per-key in-flight registry with counters (calls, executions, collapsed)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self._tasks: dict = {}  # (loop, key) -> asyncio.Task
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn() once for all threads asking for `key` at the same time."""
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() once for all coroutines (on this event loop) asking for `key` at the same time.
+        The shared call runs as its own task, so one caller being cancelled does not cancel it for the rest.
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        with self._lock:
+            self.calls += 1
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = loop.create_task(fn())
+                self._tasks[task_key] = task
+                self.executions += 1
+                task.add_done_callback(lambda t: self._task_done(task_key, t))
+            else:
+                self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def _task_done(self, task_key, task: asyncio.Task) -> None:
+        with self._lock:
+            if self._tasks.get(task_key) is task:
+                del self._tasks[task_key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter was cancelled
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "collapsed": self.collapsed,
+                "inFlight": len(self._calls) + len(self._tasks),
+            }